@@ -1,6 +1,9 @@
 from ._json import json
-from .lru import LRUCache
+from .circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+from .hot_key import HotKeyDetector
+from .lru import LRUCache, TTLLRUCache
 from .middleware import BaseSearchRouteMiddleware
 from .redis_helper import RedisHelper
 from .route_trie import RouteTrie
+from .sharded_redis_helper import ShardedRedisHelper
 from .utils import NAMESPACE, as_first_completed
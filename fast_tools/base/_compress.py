@@ -0,0 +1,26 @@
+import gzip
+from typing import Callable, Dict
+
+# encoding name(the value of `Content-Encoding`) -> compress/decompress func,
+# `br` and `zstd` are only available when `brotli` and `zstandard` are installed
+compress_func_dict: Dict[str, Callable[[bytes], bytes]] = {}
+decompress_func_dict: Dict[str, Callable[[bytes], bytes]] = {}
+
+try:
+    import brotli  # type: ignore
+
+    compress_func_dict["br"] = brotli.compress
+    decompress_func_dict["br"] = brotli.decompress
+except ImportError:
+    pass
+
+try:
+    import zstandard  # type: ignore
+
+    compress_func_dict["zstd"] = zstandard.compress
+    decompress_func_dict["zstd"] = zstandard.decompress
+except ImportError:
+    pass
+
+compress_func_dict["gzip"] = gzip.compress
+decompress_func_dict["gzip"] = gzip.decompress
@@ -0,0 +1,146 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Type
+
+__all__ = ["CircuitBreaker", "CircuitBreakerOpenError"]
+
+
+class CircuitBreakerOpenError(Exception):
+    ...
+
+
+class CircuitBreaker(object):
+    """Stop calling a failing backend, so that the caller can fail fast(or fail open) instead of waiting for timeout.
+
+    closed -> open: in the current window of `window` seconds, at least `min_call_num` calls were made and
+        the rate of failed calls(including the calls slower than `slow_call_time`) reaches `error_rate_threshold`.
+    open -> half-open: after `open_time` seconds, at most `half_open_call_num` probe calls are let through.
+    half-open -> closed if all probe calls succeed, half-open -> open if any probe call fails.
+    """
+
+    CLOSED: str = "closed"
+    OPEN: str = "open"
+    HALF_OPEN: str = "half_open"
+
+    def __init__(
+        self,
+        error_rate_threshold: float = 0.5,
+        slow_call_time: Optional[float] = None,
+        min_call_num: int = 20,
+        window: float = 10,
+        open_time: float = 5,
+        half_open_call_num: int = 1,
+    ):
+        """
+        :param error_rate_threshold: the rate of failed calls(0~1) which opens the circuit
+        :param slow_call_time: If set, the call which takes longer than it(second) is counted as failed
+        :param min_call_num: the min number of calls in a window before the error rate is judged
+        :param window: seconds of the window which the calls are counted in
+        :param open_time: seconds that the circuit stays open before probing
+        :param half_open_call_num: the number of probe calls in half-open state
+        """
+        self.error_rate_threshold: float = error_rate_threshold
+        self.slow_call_time: Optional[float] = slow_call_time
+        self.min_call_num: int = min_call_num
+        self.window: float = window
+        self.open_time: float = open_time
+        self.half_open_call_num: int = half_open_call_num
+
+        self._state: str = self.CLOSED
+        self._window_timestamp: float = time.monotonic()
+        self._call_num: int = 0
+        self._fail_num: int = 0
+        self._open_timestamp: float = 0.0
+        self._probe_num: int = 0
+        self._probe_success_num: int = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._open_timestamp >= self.open_time:
+            self._state = self.HALF_OPEN
+            self._probe_num = 0
+            self._probe_success_num = 0
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True if the call will be rejected, it does not take the probe call of half-open state"""
+        state: str = self.state
+        return state == self.OPEN or (state == self.HALF_OPEN and self._probe_num >= self.half_open_call_num)
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._open_timestamp = time.monotonic()
+
+    def _close(self) -> None:
+        self._state = self.CLOSED
+        self._window_timestamp = time.monotonic()
+        self._call_num = 0
+        self._fail_num = 0
+
+    def _record(self, is_fail: bool) -> None:
+        state: str = self.state
+        if state == self.HALF_OPEN:
+            if is_fail:
+                self._open()
+            else:
+                self._probe_success_num += 1
+                if self._probe_success_num >= self.half_open_call_num:
+                    self._close()
+            return
+        elif state == self.OPEN:
+            # the call started before the circuit was opened
+            return
+
+        now_timestamp: float = time.monotonic()
+        if now_timestamp - self._window_timestamp >= self.window:
+            self._window_timestamp = now_timestamp
+            self._call_num = 0
+            self._fail_num = 0
+        self._call_num += 1
+        if is_fail:
+            self._fail_num += 1
+        if self._call_num >= self.min_call_num and self._fail_num / self._call_num >= self.error_rate_threshold:
+            self._open()
+
+    def before_call(self) -> None:
+        """raise CircuitBreakerOpenError if the call is rejected"""
+        state: str = self.state
+        if state == self.OPEN:
+            raise CircuitBreakerOpenError(f"{self.__class__.__name__} is open")
+        elif state == self.HALF_OPEN:
+            if self._probe_num >= self.half_open_call_num:
+                raise CircuitBreakerOpenError(f"{self.__class__.__name__} is half-open and waiting for probe calls")
+            self._probe_num += 1
+
+    def on_success(self, call_time: float = 0.0) -> None:
+        self._record(self.slow_call_time is not None and call_time > self.slow_call_time)
+
+    def on_failure(self) -> None:
+        self._record(True)
+
+    @contextmanager
+    def guard(self, ignore_exception_tuple: Tuple[Type[Exception], ...] = ()) -> Iterator[None]:
+        """
+        >>> with circuit_breaker.guard():
+        ...     await call()
+
+        :param ignore_exception_tuple: the exceptions that do not mean the backend is failing(like a reply error),
+            the call which raises them is counted as success
+        """
+        self.before_call()
+        start_timestamp: float = time.monotonic()
+        try:
+            yield
+        except ignore_exception_tuple:
+            self.on_success(time.monotonic() - start_timestamp)
+            raise
+        except Exception:
+            self.on_failure()
+            raise
+        except BaseException:
+            # the call is cancelled and has no result, give back the probe call
+            if self._state == self.HALF_OPEN and self._probe_num > 0:
+                self._probe_num -= 1
+            raise
+        self.on_success(time.monotonic() - start_timestamp)
@@ -0,0 +1,905 @@
+"""In-process redis for tests and benchmarks
+
+`FakeRedis` implements the subset of redis commands used by fast-tools(string, hash, set, sorted set, scan,
+pub/sub and the lua scripts bundled in fast-tools), and `FakeRedis.create_pool` returns a pool that can be passed to
+`RedisHelper.init`, so the components built on `RedisHelper` can be run without redis-server:
+
+>>> fake_redis = FakeRedis(clock=VirtualClock())
+>>> redis_helper = RedisHelper()
+>>> redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+>>> fake_redis.clock.advance(10)  # expire keys without sleep
+"""
+import asyncio
+import bisect
+import fnmatch
+import hashlib
+import math
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from aioredis import Channel  # type: ignore
+from aioredis.abc import AbcPool  # type: ignore
+from aioredis.errors import ReplyError  # type: ignore
+from aioredis.util import _NOTSET  # type: ignore
+
+from fast_tools.base.lru import LRUCache
+
+__all__ = ["FakeRedis", "FakeConnection", "FakeConnectionsPool", "VirtualClock"]
+
+_ScriptFuncType = Callable[["FakeRedis", int, List[bytes], List[bytes]], Any]
+_WRONG_TYPE_MSG: str = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+class VirtualClock(object):
+    """Clock that only moves when `advance` is called"""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self._now: float = now
+
+    def __call__(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        self._now += seconds
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    elif isinstance(value, str):
+        return value.encode("utf-8")
+    elif isinstance(value, float):
+        return repr(value).encode("utf-8")
+    elif isinstance(value, int):
+        return str(value).encode("utf-8")
+    raise TypeError(f"Invalid argument type:{type(value)}")
+
+
+def _decode(value: Any, encoding: Optional[str]) -> Any:
+    if encoding is None:
+        return value
+    if isinstance(value, bytes):
+        return value.decode(encoding)
+    elif isinstance(value, list):
+        return [_decode(item, encoding) for item in value]
+    return value
+
+
+def _lua_number(value: float) -> bytes:
+    """lua number to string, like: 1.0 -> b'1'"""
+    return b"%.14g" % value
+
+
+def _parse_score(value: bytes) -> Tuple[float, bool]:
+    """return score and whether the score is exclusive"""
+    exclusive: bool = value.startswith(b"(")
+    if exclusive:
+        value = value[1:]
+    if value in (b"-inf", b"+inf", b"inf"):
+        return float(value.decode()), exclusive
+    return float(value), exclusive
+
+
+class FakeRedis(object):
+    """In-process redis server, the data is shared by all pools created by `create_pool`
+
+    :param clock: return the current timestamp, used by key expiration and `TIME`, default is `time.time`
+    :param latency: the seconds of each round trip(a pipeline is one round trip)
+    :param notify_keyspace_events: publish keyspace notification(`__keyspace@<db>__:<key>`) when a key is changed
+    """
+
+    def __init__(
+        self,
+        clock: Optional[Callable[[], float]] = None,
+        latency: float = 0.0,
+        notify_keyspace_events: bool = False,
+    ) -> None:
+        self.clock: Callable[[], float] = clock or time.time
+        self.latency: float = latency
+        self.notify_keyspace_events: bool = notify_keyspace_events
+
+        self._db_dict: Dict[int, Dict[bytes, Any]] = {}
+        self._expire_dict: Dict[int, Dict[bytes, float]] = {}
+        self._channel_dict: Dict[bytes, List[Channel]] = {}
+        self._pattern_dict: Dict[bytes, List[Channel]] = {}
+        self._script_dict: Dict[str, _ScriptFuncType] = {}
+        self._scan_cursor_id: int = 0
+        self._scan_cursor_cache: LRUCache[int, bytes] = LRUCache(1024)
+
+        # for measure the performance of the component
+        self.command_count: Counter = Counter()
+        self.round_trip_count: int = 0
+
+        for script, func in _get_bundled_script_dict().items():
+            self.register_script(script, func)
+
+    def create_pool(self, db: int = 0, encoding: Optional[str] = None) -> "FakeConnectionsPool":
+        return FakeConnectionsPool(self, db=db, encoding=encoding)
+
+    def register_script(self, script: str, func: _ScriptFuncType) -> str:
+        """use python function to emulate lua script, return the sha1 of the script"""
+        sha: str = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        self._script_dict[sha] = func
+        return sha
+
+    def reset_stats(self) -> None:
+        self.command_count.clear()
+        self.round_trip_count = 0
+
+    ###############
+    # key helpers #
+    ###############
+    def _get_db(self, db: int) -> Dict[bytes, Any]:
+        return self._db_dict.setdefault(db, {})
+
+    def _get_expire_db(self, db: int) -> Dict[bytes, float]:
+        return self._expire_dict.setdefault(db, {})
+
+    def _is_expired(self, db: int, key: bytes) -> bool:
+        expire_timestamp: Optional[float] = self._get_expire_db(db).get(key, None)
+        if expire_timestamp is not None and expire_timestamp <= self.clock():
+            self._delete(db, key)
+            self._notify(db, key, "expired")
+            return True
+        return False
+
+    def _get(self, db: int, key: bytes, value_type: Optional[type] = None) -> Any:
+        if self._is_expired(db, key):
+            return None
+        value: Any = self._get_db(db).get(key, None)
+        if value is not None and value_type is not None and type(value) is not value_type:
+            raise ReplyError(_WRONG_TYPE_MSG)
+        return value
+
+    def _get_or_create(self, db: int, key: bytes, value_type: type) -> Any:
+        value: Any = self._get(db, key, value_type)
+        if value is None:
+            value = value_type()
+            self._get_db(db)[key] = value
+        return value
+
+    def _delete(self, db: int, key: bytes) -> bool:
+        self._get_expire_db(db).pop(key, None)
+        return self._get_db(db).pop(key, None) is not None
+
+    def _remove_if_empty(self, db: int, key: bytes) -> None:
+        if not self._get_db(db).get(key, True):
+            self._delete(db, key)
+
+    def _keys(self, db: int, pattern: Optional[bytes] = None) -> List[bytes]:
+        key_list: List[bytes] = []
+        for key in sorted(self._get_db(db).keys()):
+            if self._is_expired(db, key):
+                continue
+            if pattern is None or fnmatch.fnmatchcase(key.decode("latin1"), pattern.decode("latin1")):
+                key_list.append(key)
+        return key_list
+
+    def _notify(self, db: int, key: bytes, event: str) -> None:
+        if self.notify_keyspace_events:
+            self._publish(b"__keyspace@%d__:" % db + key, event.encode("utf-8"))
+
+    ###########
+    # execute #
+    ###########
+    def execute(self, db: int, command: Union[str, bytes], *args: Any) -> Any:
+        """execute command and return the raw(not decoded) result"""
+        if isinstance(command, bytes):
+            command = command.decode("utf-8")
+        command = command.upper()
+        self.command_count[command] += 1
+        func: Optional[Callable] = getattr(self, f"_cmd_{command.replace('.', '_').lower()}", None)
+        if func is None:
+            raise ReplyError(f"ERR unknown command '{command}'")
+        return func(db, *[_to_bytes(arg) for arg in args])
+
+    def _scan(self, item_list: Sequence[Any], cursor: bytes, option_list: Sequence[bytes]) -> Tuple[bytes, List[Any]]:
+        """
+        `item_list` must be sorted. The cursor is mapped to the last item it returned,
+        so like redis, the items that exist during the whole iteration are always returned.
+        """
+        pattern: Optional[bytes] = None
+        count: int = 10
+        for index in range(0, len(option_list) - 1, 2):
+            option: bytes = option_list[index].upper()
+            if option == b"MATCH":
+                pattern = option_list[index + 1]
+            elif option == b"COUNT":
+                count = int(option_list[index + 1])
+
+        start: int = 0
+        if cursor != b"0":
+            last_key: Optional[bytes] = self._scan_cursor_cache.get(int(cursor), None)
+            if last_key is None:
+                raise ReplyError("ERR invalid cursor")
+            start = bisect.bisect_right([item[0] if isinstance(item, tuple) else item for item in item_list], last_key)
+        end: int = start + count
+        next_cursor: bytes = b"0"
+        if end < len(item_list):
+            last_item: Any = item_list[end - 1]
+            self._scan_cursor_id += 1
+            self._scan_cursor_cache.set(
+                self._scan_cursor_id, last_item[0] if isinstance(last_item, tuple) else last_item
+            )
+            next_cursor = str(self._scan_cursor_id).encode()
+
+        result_list: List[Any] = []
+        for item in item_list[start:end]:
+            key: bytes = item[0] if isinstance(item, tuple) else item
+            if pattern is None or fnmatch.fnmatchcase(key.decode("latin1"), pattern.decode("latin1")):
+                result_list.append(item)
+        return next_cursor, result_list
+
+    ##########
+    # server #
+    ##########
+    def _cmd_ping(self, db: int, *args: bytes) -> bytes:
+        return args[0] if args else b"PONG"
+
+    def _cmd_time(self, db: int) -> List[bytes]:
+        now: float = self.clock()
+        return [str(int(now)).encode(), str(int((now - int(now)) * 1000000)).encode()]
+
+    def _cmd_flushdb(self, db: int) -> bytes:
+        self._get_db(db).clear()
+        self._get_expire_db(db).clear()
+        return b"OK"
+
+    def _cmd_flushall(self, db: int) -> bytes:
+        self._db_dict.clear()
+        self._expire_dict.clear()
+        return b"OK"
+
+    def _cmd_dbsize(self, db: int) -> int:
+        return len(self._keys(db))
+
+    #######
+    # key #
+    #######
+    def _cmd_del(self, db: int, *key_list: bytes) -> int:
+        deleted_num: int = 0
+        for key in key_list:
+            if not self._is_expired(db, key) and self._delete(db, key):
+                deleted_num += 1
+                self._notify(db, key, "del")
+        return deleted_num
+
+    _cmd_unlink = _cmd_del
+
+    def _cmd_exists(self, db: int, *key_list: bytes) -> int:
+        return sum(1 for key in key_list if self._get(db, key) is not None)
+
+    def _cmd_type(self, db: int, key: bytes) -> bytes:
+        value: Any = self._get(db, key)
+        type_dict: Dict[type, bytes] = {bytes: b"string", dict: b"hash", set: b"set", _ZSet: b"zset"}
+        return type_dict.get(type(value), b"none")
+
+    def _cmd_pexpire(self, db: int, key: bytes, millisecond: bytes) -> int:
+        if self._get(db, key) is None:
+            return 0
+        self._get_expire_db(db)[key] = self.clock() + int(millisecond) / 1000
+        self._notify(db, key, "expire")
+        return 1
+
+    def _cmd_expire(self, db: int, key: bytes, second: bytes) -> int:
+        return self._cmd_pexpire(db, key, str(int(second) * 1000).encode())
+
+    def _cmd_persist(self, db: int, key: bytes) -> int:
+        if self._get(db, key) is None:
+            return 0
+        return int(self._get_expire_db(db).pop(key, None) is not None)
+
+    def _cmd_pttl(self, db: int, key: bytes) -> int:
+        if self._get(db, key) is None:
+            return -2
+        expire_timestamp: Optional[float] = self._get_expire_db(db).get(key, None)
+        if expire_timestamp is None:
+            return -1
+        return int(round((expire_timestamp - self.clock()) * 1000))
+
+    def _cmd_ttl(self, db: int, key: bytes) -> int:
+        pttl: int = self._cmd_pttl(db, key)
+        if pttl < 0:
+            return pttl
+        return int((pttl + 500) / 1000)
+
+    def _cmd_keys(self, db: int, pattern: bytes) -> List[bytes]:
+        return self._keys(db, pattern)
+
+    def _cmd_scan(self, db: int, cursor: bytes, *option_list: bytes) -> List[Any]:
+        next_cursor, key_list = self._scan(self._keys(db), cursor, option_list)
+        return [next_cursor, key_list]
+
+    ##########
+    # string #
+    ##########
+    def _cmd_get(self, db: int, key: bytes) -> Optional[bytes]:
+        return self._get(db, key, bytes)
+
+    def _cmd_mget(self, db: int, *key_list: bytes) -> List[Optional[bytes]]:
+        result_list: List[Optional[bytes]] = []
+        for key in key_list:
+            value: Any = self._get(db, key)
+            result_list.append(value if isinstance(value, bytes) else None)
+        return result_list
+
+    def _cmd_set(self, db: int, key: bytes, value: bytes, *option_list: bytes) -> Optional[bytes]:
+        expire_timestamp: Optional[float] = None
+        is_nx: bool = False
+        is_xx: bool = False
+        keep_ttl: bool = False
+        index: int = 0
+        while index < len(option_list):
+            option: bytes = option_list[index].upper()
+            if option == b"EX":
+                expire_timestamp = self.clock() + int(option_list[index + 1])
+                index += 1
+            elif option == b"PX":
+                expire_timestamp = self.clock() + int(option_list[index + 1]) / 1000
+                index += 1
+            elif option == b"NX":
+                is_nx = True
+            elif option == b"XX":
+                is_xx = True
+            elif option == b"KEEPTTL":
+                keep_ttl = True
+            else:
+                raise ReplyError("ERR syntax error")
+            index += 1
+
+        exists: bool = self._get(db, key) is not None
+        if (is_nx and exists) or (is_xx and not exists):
+            return None
+        self._get_db(db)[key] = value
+        if expire_timestamp is not None:
+            self._get_expire_db(db)[key] = expire_timestamp
+        elif not keep_ttl:
+            self._get_expire_db(db).pop(key, None)
+        self._notify(db, key, "set")
+        return b"OK"
+
+    def _cmd_setex(self, db: int, key: bytes, second: bytes, value: bytes) -> Optional[bytes]:
+        return self._cmd_set(db, key, value, b"EX", second)
+
+    def _cmd_incrby(self, db: int, key: bytes, increment: bytes) -> int:
+        value: Optional[bytes] = self._get(db, key, bytes)
+        try:
+            result: int = int(value or b"0") + int(increment)
+        except ValueError:
+            raise ReplyError("ERR value is not an integer or out of range")
+        self._get_db(db)[key] = str(result).encode()
+        self._notify(db, key, "incrby")
+        return result
+
+    def _cmd_incr(self, db: int, key: bytes) -> int:
+        return self._cmd_incrby(db, key, b"1")
+
+    def _cmd_decr(self, db: int, key: bytes) -> int:
+        return self._cmd_incrby(db, key, b"-1")
+
+    ########
+    # hash #
+    ########
+    def _cmd_hset(self, db: int, key: bytes, *field_value_list: bytes) -> int:
+        if not field_value_list or len(field_value_list) % 2:
+            raise ReplyError("ERR wrong number of arguments for 'hset' command")
+        hash_dict: Dict[bytes, bytes] = self._get_or_create(db, key, dict)
+        new_num: int = 0
+        for index in range(0, len(field_value_list), 2):
+            if field_value_list[index] not in hash_dict:
+                new_num += 1
+            hash_dict[field_value_list[index]] = field_value_list[index + 1]
+        self._notify(db, key, "hset")
+        return new_num
+
+    def _cmd_hmset(self, db: int, key: bytes, *field_value_list: bytes) -> bytes:
+        self._cmd_hset(db, key, *field_value_list)
+        return b"OK"
+
+    def _cmd_hget(self, db: int, key: bytes, field: bytes) -> Optional[bytes]:
+        return (self._get(db, key, dict) or {}).get(field, None)
+
+    def _cmd_hmget(self, db: int, key: bytes, *field_list: bytes) -> List[Optional[bytes]]:
+        hash_dict: Dict[bytes, bytes] = self._get(db, key, dict) or {}
+        return [hash_dict.get(field, None) for field in field_list]
+
+    def _cmd_hgetall(self, db: int, key: bytes) -> List[bytes]:
+        result_list: List[bytes] = []
+        for field, value in (self._get(db, key, dict) or {}).items():
+            result_list.extend([field, value])
+        return result_list
+
+    def _cmd_hdel(self, db: int, key: bytes, *field_list: bytes) -> int:
+        hash_dict: Dict[bytes, bytes] = self._get(db, key, dict) or {}
+        deleted_num: int = sum(1 for field in field_list if hash_dict.pop(field, None) is not None)
+        self._remove_if_empty(db, key)
+        if deleted_num:
+            self._notify(db, key, "hdel")
+        return deleted_num
+
+    def _cmd_hlen(self, db: int, key: bytes) -> int:
+        return len(self._get(db, key, dict) or {})
+
+    def _cmd_hscan(self, db: int, key: bytes, cursor: bytes, *option_list: bytes) -> List[Any]:
+        item_list: List[Tuple[bytes, bytes]] = sorted((self._get(db, key, dict) or {}).items())
+        next_cursor, result_list = self._scan(item_list, cursor, option_list)
+        field_value_list: List[bytes] = []
+        for field, value in result_list:
+            field_value_list.extend([field, value])
+        return [next_cursor, field_value_list]
+
+    #######
+    # set #
+    #######
+    def _cmd_sadd(self, db: int, key: bytes, *member_list: bytes) -> int:
+        member_set: set = self._get_or_create(db, key, set)
+        new_num: int = len(set(member_list) - member_set)
+        member_set.update(member_list)
+        self._notify(db, key, "sadd")
+        return new_num
+
+    def _cmd_srem(self, db: int, key: bytes, *member_list: bytes) -> int:
+        member_set: set = self._get(db, key, set) or set()
+        removed_num: int = len(member_set & set(member_list))
+        member_set.difference_update(member_list)
+        self._remove_if_empty(db, key)
+        if removed_num:
+            self._notify(db, key, "srem")
+        return removed_num
+
+    def _cmd_smembers(self, db: int, key: bytes) -> List[bytes]:
+        return sorted(self._get(db, key, set) or set())
+
+    def _cmd_scard(self, db: int, key: bytes) -> int:
+        return len(self._get(db, key, set) or set())
+
+    def _cmd_sismember(self, db: int, key: bytes, member: bytes) -> int:
+        return int(member in (self._get(db, key, set) or set()))
+
+    def _cmd_sscan(self, db: int, key: bytes, cursor: bytes, *option_list: bytes) -> List[Any]:
+        next_cursor, member_list = self._scan(self._cmd_smembers(db, key), cursor, option_list)
+        return [next_cursor, member_list]
+
+    ##############
+    # sorted set #
+    ##############
+    def _cmd_zadd(self, db: int, key: bytes, *score_member_list: bytes) -> int:
+        if not score_member_list or len(score_member_list) % 2:
+            raise ReplyError("ERR syntax error")
+        zset: _ZSet = self._get_or_create(db, key, _ZSet)
+        new_num: int = 0
+        for index in range(0, len(score_member_list), 2):
+            member: bytes = score_member_list[index + 1]
+            if member not in zset:
+                new_num += 1
+            zset[member] = float(score_member_list[index])
+        self._notify(db, key, "zadd")
+        return new_num
+
+    def _cmd_zrem(self, db: int, key: bytes, *member_list: bytes) -> int:
+        zset: _ZSet = self._get(db, key, _ZSet) or _ZSet()
+        removed_num: int = sum(1 for member in member_list if zset.pop(member, None) is not None)
+        self._remove_if_empty(db, key)
+        if removed_num:
+            self._notify(db, key, "zrem")
+        return removed_num
+
+    def _cmd_zcard(self, db: int, key: bytes) -> int:
+        return len(self._get(db, key, _ZSet) or _ZSet())
+
+    def _cmd_zscore(self, db: int, key: bytes, member: bytes) -> Optional[bytes]:
+        score: Optional[float] = (self._get(db, key, _ZSet) or _ZSet()).get(member, None)
+        return None if score is None else _lua_number(score)
+
+    def _zrange_by_score(self, db: int, key: bytes, min_score: bytes, max_score: bytes) -> List[bytes]:
+        min_value, min_exclusive = _parse_score(min_score)
+        max_value, max_exclusive = _parse_score(max_score)
+        member_list: List[bytes] = []
+        for member, score in (self._get(db, key, _ZSet) or _ZSet()).items():
+            if score < min_value or (min_exclusive and score == min_value):
+                continue
+            if score > max_value or (max_exclusive and score == max_value):
+                continue
+            member_list.append(member)
+        return member_list
+
+    def _cmd_zcount(self, db: int, key: bytes, min_score: bytes, max_score: bytes) -> int:
+        return len(self._zrange_by_score(db, key, min_score, max_score))
+
+    def _cmd_zscan(self, db: int, key: bytes, cursor: bytes, *option_list: bytes) -> List[Any]:
+        item_list: List[Tuple[bytes, float]] = sorted((self._get(db, key, _ZSet) or _ZSet()).items())
+        next_cursor, result_list = self._scan(item_list, cursor, option_list)
+        member_score_list: List[bytes] = []
+        for member, score in result_list:
+            member_score_list.extend([member, _lua_number(score)])
+        return [next_cursor, member_score_list]
+
+    def _cmd_zremrangebyscore(self, db: int, key: bytes, min_score: bytes, max_score: bytes) -> int:
+        member_list: List[bytes] = self._zrange_by_score(db, key, min_score, max_score)
+        return self._cmd_zrem(db, key, *member_list) if member_list else 0
+
+    ###########
+    # pub/sub #
+    ###########
+    def _publish(self, channel_name: bytes, message: bytes) -> int:
+        receiver_num: int = 0
+        for channel in self._channel_dict.get(channel_name, []):
+            channel.put_nowait(message)
+            receiver_num += 1
+        for pattern, channel_list in self._pattern_dict.items():
+            if fnmatch.fnmatchcase(channel_name.decode("latin1"), pattern.decode("latin1")):
+                for channel in channel_list:
+                    channel.put_nowait((channel_name, message))
+                    receiver_num += 1
+        return receiver_num
+
+    def _cmd_publish(self, db: int, channel_name: bytes, message: bytes) -> int:
+        return self._publish(channel_name, message)
+
+    def subscribe(self, channel: Channel) -> None:
+        channel_dict: Dict[bytes, List[Channel]] = self._pattern_dict if channel.is_pattern else self._channel_dict
+        channel_dict.setdefault(channel.name, []).append(channel)
+
+    def unsubscribe(self, channel: Channel) -> None:
+        channel_dict: Dict[bytes, List[Channel]] = self._pattern_dict if channel.is_pattern else self._channel_dict
+        channel_list: List[Channel] = channel_dict.get(channel.name, [])
+        if channel in channel_list:
+            channel_list.remove(channel)
+        if not channel_list:
+            channel_dict.pop(channel.name, None)
+        channel.close()
+
+    #############
+    # scripting #
+    #############
+    def _cmd_evalsha(self, db: int, sha: bytes, key_num: bytes, *key_arg_list: bytes) -> Any:
+        func: Optional[_ScriptFuncType] = self._script_dict.get(sha.decode(), None)
+        if func is None:
+            raise ReplyError("NOSCRIPT No matching script. Please use EVAL.")
+        return func(self, db, list(key_arg_list[: int(key_num)]), list(key_arg_list[int(key_num) :]))
+
+    def _cmd_eval(self, db: int, script: bytes, key_num: bytes, *key_arg_list: bytes) -> Any:
+        return self._cmd_evalsha(db, hashlib.sha1(script).hexdigest().encode(), key_num, *key_arg_list)
+
+    def _cmd_script(self, db: int, sub_command: bytes, *args: bytes) -> Any:
+        sub_command = sub_command.upper()
+        if sub_command == b"LOAD":
+            sha: str = hashlib.sha1(args[0]).hexdigest()
+            if sha not in self._script_dict:
+                raise ReplyError("ERR FakeRedis can only load the script registered by FakeRedis.register_script")
+            return sha.encode()
+        elif sub_command == b"EXISTS":
+            return [int(sha.decode() in self._script_dict) for sha in args]
+        raise ReplyError(f"ERR unknown subcommand '{sub_command.decode()}'")
+
+
+class _ZSet(dict):
+    """member -> score"""
+
+
+class FakeConnection(object):
+    """Like `aioredis.RedisConnection`, but the command is executed by `FakeRedis`"""
+
+    def __init__(self, server: FakeRedis, db: int = 0, encoding: Optional[str] = None) -> None:
+        self._server: FakeRedis = server
+        self._db: int = db
+        self._encoding: Optional[str] = encoding
+        self._closed: bool = False
+        self._pubsub_channels: Dict[bytes, Channel] = {}
+        self._pubsub_patterns: Dict[bytes, Channel] = {}
+        # the future of the round trip when in pipeline
+        self._buffer_round_trip: Optional[asyncio.Future] = None
+
+    def _round_trip(self) -> asyncio.Future:
+        if self._buffer_round_trip is not None:
+            return self._buffer_round_trip
+        self._server.round_trip_count += 1
+        return asyncio.ensure_future(asyncio.sleep(self._server.latency))
+
+    @contextmanager
+    def _buffered(self) -> Iterator[None]:
+        self._buffer_round_trip = None
+        self._buffer_round_trip = self._round_trip()
+        try:
+            yield
+        finally:
+            self._buffer_round_trip = None
+
+    def execute(self, command: Union[str, bytes], *args: Any, encoding: Any = _NOTSET) -> asyncio.Future:
+        if self._closed:
+            raise ConnectionError("Connection closed")
+        if encoding is _NOTSET:
+            encoding = self._encoding
+        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        # The command is executed immediately(redis execute command one by one),
+        # and the result is returned after the round trip
+        try:
+            result: Any = _decode(self._server.execute(self._db, command, *args), encoding)
+            exc: Optional[Exception] = None
+        except ReplyError as e:
+            exc = e
+        except TypeError as e:
+            exc = ReplyError(f"ERR {e}")
+
+        def _set_result(_: asyncio.Future) -> None:
+            if future.done():
+                return
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+        self._round_trip().add_done_callback(_set_result)
+        return future
+
+    def execute_pubsub(self, command: Union[str, bytes], *channels: Any) -> asyncio.Future:
+        if isinstance(command, bytes):
+            command = command.decode("utf-8")
+        command = command.upper()
+        is_pattern: bool = command.startswith("P")
+        channel_dict: Dict[bytes, Channel] = self._pubsub_patterns if is_pattern else self._pubsub_channels
+        result_list: List[list] = []
+        for channel in channels:
+            if not isinstance(channel, Channel):
+                channel = Channel(_to_bytes(channel), is_pattern=is_pattern)
+            if command in ("SUBSCRIBE", "PSUBSCRIBE"):
+                if channel.name not in channel_dict:
+                    channel_dict[channel.name] = channel
+                    self._server.subscribe(channel)
+            else:
+                old_channel: Optional[Channel] = channel_dict.pop(channel.name, None)
+                if old_channel is not None:
+                    self._server.unsubscribe(old_channel)
+            result_list.append(
+                [command.lower().encode(), channel.name, len(self._pubsub_channels) + len(self._pubsub_patterns)]
+            )
+        future: asyncio.Future = asyncio.get_event_loop().create_future()
+        future.set_result(result_list)
+        return future
+
+    @property
+    def pubsub_channels(self) -> Dict[bytes, Channel]:
+        return self._pubsub_channels
+
+    @property
+    def pubsub_patterns(self) -> Dict[bytes, Channel]:
+        return self._pubsub_patterns
+
+    @property
+    def in_pubsub(self) -> int:
+        return len(self._pubsub_channels) + len(self._pubsub_patterns)
+
+    @property
+    def in_transaction(self) -> bool:
+        return False
+
+    @property
+    def db(self) -> int:
+        return self._db
+
+    @property
+    def encoding(self) -> Optional[str]:
+        return self._encoding
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return "fake-redis", 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        for channel in list(self._pubsub_channels.values()) + list(self._pubsub_patterns.values()):
+            self._server.unsubscribe(channel)
+        self._pubsub_channels.clear()
+        self._pubsub_patterns.clear()
+
+    async def wait_closed(self) -> None:
+        pass
+
+
+class _AsyncConnectionContextManager(object):
+    def __init__(self, pool: "FakeConnectionsPool") -> None:
+        self._pool: "FakeConnectionsPool" = pool
+
+    async def __aenter__(self) -> FakeConnection:
+        return await self._pool.acquire()
+
+    async def __aexit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        pass
+
+
+class FakeConnectionsPool(AbcPool):
+    """Like `aioredis.ConnectionsPool`, can be used by `RedisHelper.init` and `aioredis.Redis`"""
+
+    def __init__(self, server: FakeRedis, db: int = 0, encoding: Optional[str] = None) -> None:
+        self._server: FakeRedis = server
+        self._conn: FakeConnection = FakeConnection(server, db, encoding)
+        self._pubsub_conn: FakeConnection = FakeConnection(server, db, encoding)
+
+    @property
+    def server(self) -> FakeRedis:
+        return self._server
+
+    def execute(self, command: Union[str, bytes], *args: Any, **kwargs: Any) -> asyncio.Future:
+        return self._conn.execute(command, *args, **kwargs)
+
+    def execute_pubsub(self, command: Union[str, bytes], *channels: Any) -> asyncio.Future:
+        return self._pubsub_conn.execute_pubsub(command, *channels)
+
+    def get_connection(self, command: Any = None, args: Any = ()) -> Tuple[FakeConnection, Tuple[str, int]]:
+        return self._conn, self._conn.address
+
+    async def acquire(self, command: Any = None, args: Any = ()) -> FakeConnection:
+        if self.closed:
+            raise ConnectionError("Pool is closed")
+        return self._conn
+
+    def release(self, conn: FakeConnection) -> None:
+        pass
+
+    def get(self) -> _AsyncConnectionContextManager:
+        return _AsyncConnectionContextManager(self)
+
+    @property
+    def pubsub_channels(self) -> Dict[bytes, Channel]:
+        return self._pubsub_conn.pubsub_channels
+
+    @property
+    def pubsub_patterns(self) -> Dict[bytes, Channel]:
+        return self._pubsub_conn.pubsub_patterns
+
+    @property
+    def in_pubsub(self) -> int:
+        return self._pubsub_conn.in_pubsub
+
+    @property
+    def in_transaction(self) -> bool:
+        return False
+
+    @property
+    def db(self) -> int:
+        return self._conn.db
+
+    @property
+    def encoding(self) -> Optional[str]:
+        return self._conn.encoding
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._conn.address
+
+    @property
+    def size(self) -> int:
+        return 1
+
+    @property
+    def freesize(self) -> int:
+        return 1
+
+    @property
+    def closed(self) -> bool:
+        return self._conn.closed
+
+    def close(self) -> None:
+        self._conn.close()
+        self._pubsub_conn.close()
+
+    async def wait_closed(self) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+    async def __aiter__(self) -> AsyncIterator:  # pragma: no cover
+        raise NotImplementedError
+
+
+#####################################################
+# python implementation of the bundled lua scripts #
+#####################################################
+def _lock_release_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    if server.execute(db, "GET", key_list[0]) != arg_list[0]:
+        return 0
+    server.execute(db, "DEL", key_list[0])
+    return 1
+
+
+def _zset_release_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    return server.execute(db, "ZREM", key_list[0], arg_list[0])
+
+
+def _semaphore_acquire_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    now: float = float(arg_list[1])
+    timeout: float = float(arg_list[2])
+    server.execute(db, "ZREMRANGEBYSCORE", key_list[0], "-inf", now)
+    if server.execute(db, "ZCARD", key_list[0]) >= float(arg_list[3]):
+        return 0
+    server.execute(db, "ZADD", key_list[0], now + timeout, arg_list[0])
+    server.execute(db, "PEXPIRE", key_list[0], math.ceil(timeout * 1000))
+    return 1
+
+
+def _read_lock_acquire_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    if server.execute(db, "EXISTS", key_list[0]) == 1 or server.execute(db, "EXISTS", key_list[2]) == 1:
+        return 0
+    now: float = float(arg_list[1])
+    timeout: float = float(arg_list[2])
+    server.execute(db, "ZREMRANGEBYSCORE", key_list[1], "-inf", now)
+    server.execute(db, "ZADD", key_list[1], now + timeout, arg_list[0])
+    server.execute(db, "PEXPIRE", key_list[1], math.ceil(timeout * 1000))
+    return 1
+
+
+def _write_lock_acquire_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    if server.execute(db, "EXISTS", key_list[0]) == 1:
+        return 0
+    server.execute(db, "ZREMRANGEBYSCORE", key_list[1], "-inf", float(arg_list[1]))
+    if server.execute(db, "ZCARD", key_list[1]) > 0:
+        server.execute(db, "SET", key_list[2], arg_list[0], "PX", arg_list[3])
+        return 0
+    server.execute(db, "SET", key_list[0], arg_list[0], "PX", math.ceil(float(arg_list[2]) * 1000))
+    server.execute(db, "DEL", key_list[2])
+    return 1
+
+
+def _token_bucket_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    key: bytes = key_list[0]
+    current_time: int = int(server.execute(db, "TIME")[0])
+    interval_per_token: float = float(arg_list[0])
+    max_token: float = float(arg_list[1])
+    init_token: float = float(arg_list[2])
+    last_time, last_token = server.execute(db, "HMGET", key, "last_time", "last_token")
+    if last_time is None or last_token is None:
+        tokens: float = init_token
+        server.execute(db, "HSET", key, "last_time", current_time)
+    else:
+        this_interval: float = current_time - float(last_time)
+        if this_interval > 1:
+            tokens_to_add: float = math.floor(this_interval * interval_per_token)
+            tokens = min(float(last_token) + tokens_to_add, max_token)
+            server.execute(db, "HSET", key, "last_time", current_time)
+        else:
+            tokens = float(last_token)
+    if tokens < 1:
+        server.execute(db, "HSET", key, "last_token", _lua_number(tokens))
+        return -1
+    tokens = tokens - 1
+    server.execute(db, "HSET", key, "last_token", _lua_number(tokens))
+    return int(tokens)
+
+
+def _cache_set_tag_script(server: FakeRedis, db: int, key_list: List[bytes], arg_list: List[bytes]) -> int:
+    now: float = float(arg_list[1])
+    expire: int = int(arg_list[2])
+    server.execute(db, "ZREMRANGEBYSCORE", key_list[0], "-inf", now)
+    ttl: int = server.execute(db, "TTL", key_list[0])
+    server.execute(db, "ZADD", key_list[0], now + expire if expire > 0 else "inf", arg_list[0])
+    if expire == 0:
+        server.execute(db, "PERSIST", key_list[0])
+    elif ttl == -2 or 0 <= ttl < expire:
+        server.execute(db, "EXPIRE", key_list[0], expire)
+    return 1
+
+
+def _get_bundled_script_dict() -> Dict[str, _ScriptFuncType]:
+    # import here, avoid circular import
+    from fast_tools.base.redis_helper import Lock, Semaphore, _ReadLock, _WriteLock
+    from fast_tools.cache import _CacheHandler
+    from fast_tools.limit.backend.redis import RedisTokenBucketBackend
+
+    return {
+        Lock.LUA_RELEASE_SCRIPT: _lock_release_script,
+        Semaphore.LUA_ACQUIRE_SCRIPT: _semaphore_acquire_script,
+        Semaphore.LUA_RELEASE_SCRIPT: _zset_release_script,
+        _ReadLock.LUA_ACQUIRE_SCRIPT: _read_lock_acquire_script,
+        _WriteLock.LUA_ACQUIRE_SCRIPT: _write_lock_acquire_script,
+        RedisTokenBucketBackend._lua_script: _token_bucket_script,
+        _CacheHandler.LUA_SET_TAG_SCRIPT: _cache_set_tag_script,
+    }
@@ -0,0 +1,71 @@
+import time
+from typing import Dict, List
+
+__all__ = ["HotKeyDetector"]
+
+
+class HotKeyDetector(object):
+    """Detect the hot keys of recent reads by Space-Saving(a heavy hitters algorithm) with fixed memory.
+
+    At most `capacity` keys are counted, the new key replaces the key with the min count and inherits its count
+    as error, so the count of key is overestimated by at most the error,
+    and a key is hot if `count - error >= min_count`.
+    The counts are halved every `decay_interval` seconds, so the key which is no longer read becomes cold.
+    """
+
+    def __init__(self, capacity: int = 64, min_count: int = 1000, decay_interval: float = 10, replica_ttl: float = 1):
+        """
+        :param capacity: the max number of counted keys, it should be larger than the number of hot keys
+        :param min_count: the min number of reads(decayed) of hot key
+        :param decay_interval: seconds between the halving of counts
+        :param replica_ttl: seconds that the local replica of hot key lives, see `RedisHelper`
+        """
+        self.capacity: int = capacity
+        self.min_count: int = min_count
+        self.decay_interval: float = decay_interval
+        self.replica_ttl: float = replica_ttl
+
+        # key -> [count, error]
+        self._count_dict: Dict[str, List[float]] = {}
+        self._decay_timestamp: float = time.monotonic()
+
+    def _decay(self) -> None:
+        now_timestamp: float = time.monotonic()
+        interval_num: int = int((now_timestamp - self._decay_timestamp) // self.decay_interval)
+        if interval_num < 1:
+            return
+        self._decay_timestamp += interval_num * self.decay_interval
+        factor: float = 0.5**interval_num
+        for key in list(self._count_dict.keys()):
+            item: List[float] = self._count_dict[key]
+            item[0] *= factor
+            item[1] *= factor
+            if item[0] < 1:
+                del self._count_dict[key]
+
+    def add(self, key: str) -> bool:
+        """record a read of the key, return True if the key is hot"""
+        self._decay()
+        item: List[float] = self._count_dict.get(key, [])
+        if not item:
+            if len(self._count_dict) < self.capacity:
+                item = [0.0, 0.0]
+            else:
+                min_key: str = min(self._count_dict, key=lambda k: self._count_dict[k][0])
+                min_count: float = self._count_dict.pop(min_key)[0]
+                item = [min_count, min_count]
+            self._count_dict[key] = item
+        item[0] += 1
+        return item[0] - item[1] >= self.min_count
+
+    def is_hot(self, key: str) -> bool:
+        item: List[float] = self._count_dict.get(key, [])
+        return bool(item) and item[0] - item[1] >= self.min_count
+
+    @property
+    def hot_key_dict(self) -> Dict[str, float]:
+        """hot key -> the guaranteed number of reads(decayed)"""
+        self._decay()
+        return {
+            key: count - error for key, (count, error) in self._count_dict.items() if count - error >= self.min_count
+        }
@@ -1,9 +1,10 @@
+import time
 from collections import OrderedDict
 from dataclasses import MISSING
 from threading import Lock
-from typing import Any, Generic, TypeVar, Union
+from typing import Any, Generic, Optional, Tuple, TypeVar, Union
 
-__all__ = ["LRUCache"]
+__all__ = ["LRUCache", "TTLLRUCache"]
 KT = TypeVar("KT")
 VT = TypeVar("VT")
 
@@ -42,6 +43,15 @@ class LRUCache(Generic[KT, VT]):
     def set(self, key: KT, value: VT) -> None:
         self._set(key, value)
 
+    def delete(self, key: KT) -> None:
+        self.cache.pop(key, None)
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
 
 class ThreadLRUCache(LRUCache):
     def __init__(self, capacity: int) -> None:
@@ -55,3 +65,26 @@ class ThreadLRUCache(LRUCache):
     def _set(self, key: KT, value: VT) -> None:
         with self._lock:
             super(ThreadLRUCache, self)._set(key, value)
+
+
+class TTLLRUCache(LRUCache[KT, VT]):
+    """LRUCache whose items are also expired after `ttl` seconds"""
+
+    def __init__(self, capacity: int, ttl: float) -> None:
+        super().__init__(capacity)
+        self.ttl: float = ttl
+
+    def _get(self, key: KT) -> VT:
+        value, expire_timestamp = self.cache.pop(key)
+        if expire_timestamp < time.monotonic():
+            raise KeyError(key)
+        self.cache[key] = (value, expire_timestamp)
+        return value
+
+    def _set(self, key: KT, value: VT, ttl: Optional[float] = None) -> None:
+        item: Tuple[VT, float] = (value, time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl)))
+        super()._set(key, item)  # type: ignore
+
+    def set(self, key: KT, value: VT, ttl: Optional[float] = None) -> None:
+        """`ttl` can only shorten the default ttl of the cache"""
+        self._set(key, value, ttl)
@@ -1,15 +1,39 @@
 import asyncio
 import logging
+import math
 import pickle
 import time
 import uuid
+from contextlib import nullcontext
 from contextvars import ContextVar
-from typing import Any, List, Optional, Tuple
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 from aioredis import ConnectionsPool, Redis, errors  # type: ignore
 
+from fast_tools.base.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+from fast_tools.base.hot_key import HotKeyDetector
+from fast_tools.base.lru import TTLLRUCache
 from fast_tools.base.utils import NAMESPACE as _namespace
 
+_NOT_FOUND: Any = object()
+# the backoff(second) of resubscribing the invalidation channel of near cache
+_NEAR_CACHE_LISTEN_MIN_BACKOFF: float = 0.1
+_NEAR_CACHE_LISTEN_MAX_BACKOFF: float = 5.0
+
 
 class LockError(Exception):
     ...
@@ -59,12 +83,10 @@ class Lock(object):
         """
         Returns True if this key is locked by any process, otherwise False.
         """
-        return await self._redis.client.get(self._lock_key) is not None
+        return await self._redis.execute("GET", self._lock_key) is not None
 
-    async def do_release(self, expected_token: int) -> None:
-        if not bool(
-            await self._redis.client.eval(self.LUA_RELEASE_SCRIPT, keys=[self._lock_key], args=[expected_token])
-        ):
+    async def do_release(self, expected_token: str) -> None:
+        if not bool(await self._redis.execute("EVAL", self.LUA_RELEASE_SCRIPT, 1, self._lock_key, expected_token)):
             raise LockError("Cannot release a lock that's no longer owned")
 
     async def release(self) -> None:
@@ -99,21 +121,249 @@ class Lock(object):
             await asyncio.sleep(sleep)
 
 
+class Semaphore(Lock):
+    """Counting semaphore, at most `value` holders at the same time.
+
+    Each holder is a member of the sorted set whose score is the timestamp when its lease expires,
+    so the lease of a crashed holder is released after `timeout` seconds
+    """
+
+    # KEYS[1] - semaphore name
+    # ARGV[1] - token, ARGV[2] - now timestamp, ARGV[3] - timeout(second), ARGV[4] - semaphore value
+    # return 1 if the semaphore was acquired, otherwise 0
+    LUA_ACQUIRE_SCRIPT = """
+        local now = tonumber(ARGV[2])
+        local timeout = tonumber(ARGV[3])
+        redis.call('zremrangebyscore', KEYS[1], '-inf', now)
+        if redis.call('zcard', KEYS[1]) >= tonumber(ARGV[4]) then
+            return 0
+        end
+        redis.call('zadd', KEYS[1], now + timeout, ARGV[1])
+        redis.call('pexpire', KEYS[1], math.ceil(timeout * 1000))
+        return 1
+    """
+
+    # KEYS[1] - semaphore name
+    # ARGV[1] - token
+    # return 1 if the semaphore was released, otherwise 0
+    LUA_RELEASE_SCRIPT = """
+        return redis.call('zrem', KEYS[1], ARGV[1])
+    """
+
+    def __init__(
+        self,
+        redis_helper: "RedisHelper",
+        semaphore_key: str,
+        value: int,
+        timeout: int = 1 * 60,
+        block_timeout: Optional[int] = None,
+        sleep_time: float = 0.1,
+    ):
+        if value < 1:
+            raise ValueError("Semaphore value must be >= 1")
+        super().__init__(redis_helper, semaphore_key, timeout, block_timeout, sleep_time)
+        self._lock_key = f"{self._redis.namespace}:semaphore:{semaphore_key}"
+        self._value: int = value
+
+    async def locked(self) -> bool:
+        """
+        Returns True if the semaphore can not be acquired immediately, otherwise False.
+        """
+        return await self._redis.execute("ZCOUNT", self._lock_key, f"({time.time()}", "+inf") >= self._value
+
+    async def do_release(self, expected_token: str) -> None:
+        if not bool(await self._redis.execute("EVAL", self.LUA_RELEASE_SCRIPT, 1, self._lock_key, expected_token)):
+            raise LockError("Cannot release a semaphore that's no longer owned")
+
+    async def do_acquire(self, token: str) -> bool:
+        return bool(
+            await self._redis.execute(
+                "EVAL", self.LUA_ACQUIRE_SCRIPT, 1, self._lock_key, token, time.time(), self._timeout, self._value
+            )
+        )
+
+
+class _ReadLock(Lock):
+    # KEYS[1] - write lock name, KEYS[2] - reader set name, KEYS[3] - writer waiting flag name
+    # ARGV[1] - token, ARGV[2] - now timestamp, ARGV[3] - timeout(second)
+    # return 1 if the read lock was acquired, otherwise 0
+    LUA_ACQUIRE_SCRIPT = """
+        if redis.call('exists', KEYS[1]) == 1 or redis.call('exists', KEYS[3]) == 1 then
+            return 0
+        end
+        local now = tonumber(ARGV[2])
+        local timeout = tonumber(ARGV[3])
+        redis.call('zremrangebyscore', KEYS[2], '-inf', now)
+        redis.call('zadd', KEYS[2], now + timeout, ARGV[1])
+        redis.call('pexpire', KEYS[2], math.ceil(timeout * 1000))
+        return 1
+    """
+    LUA_RELEASE_SCRIPT = Semaphore.LUA_RELEASE_SCRIPT
+
+    def __init__(self, rw_lock: "ReadWriteLock") -> None:
+        super().__init__(rw_lock.redis_helper, rw_lock.key, rw_lock.timeout, rw_lock.block_timeout, rw_lock.sleep_time)
+        self._rw_lock: "ReadWriteLock" = rw_lock
+        self._lock_key = rw_lock.read_key
+
+    async def locked(self) -> bool:
+        """
+        Returns True if the lock is held by any reader, otherwise False.
+        """
+        return bool(await self._redis.execute("ZCOUNT", self._lock_key, f"({time.time()}", "+inf"))
+
+    async def do_release(self, expected_token: str) -> None:
+        if not bool(await self._redis.execute("EVAL", self.LUA_RELEASE_SCRIPT, 1, self._lock_key, expected_token)):
+            raise LockError("Cannot release a lock that's no longer owned")
+
+    async def do_acquire(self, token: str) -> bool:
+        return bool(
+            await self._redis.execute(
+                "EVAL",
+                self.LUA_ACQUIRE_SCRIPT,
+                3,
+                self._rw_lock.write_key,
+                self._lock_key,
+                self._rw_lock.write_waiting_key,
+                token,
+                time.time(),
+                self._timeout,
+            )
+        )
+
+
+class _WriteLock(Lock):
+    # KEYS[1] - write lock name, KEYS[2] - reader set name, KEYS[3] - writer waiting flag name
+    # ARGV[1] - token, ARGV[2] - now timestamp, ARGV[3] - timeout(second), ARGV[4] - writer waiting flag ttl(ms)
+    # return 1 if the write lock was acquired, otherwise 0
+    LUA_ACQUIRE_SCRIPT = """
+        if redis.call('exists', KEYS[1]) == 1 then
+            return 0
+        end
+        redis.call('zremrangebyscore', KEYS[2], '-inf', tonumber(ARGV[2]))
+        if redis.call('zcard', KEYS[2]) > 0 then
+            redis.call('set', KEYS[3], ARGV[1], 'px', ARGV[4])
+            return 0
+        end
+        redis.call('set', KEYS[1], ARGV[1], 'px', math.ceil(tonumber(ARGV[3]) * 1000))
+        redis.call('del', KEYS[3])
+        return 1
+    """
+
+    def __init__(self, rw_lock: "ReadWriteLock") -> None:
+        super().__init__(rw_lock.redis_helper, rw_lock.key, rw_lock.timeout, rw_lock.block_timeout, rw_lock.sleep_time)
+        self._rw_lock: "ReadWriteLock" = rw_lock
+        self._lock_key = rw_lock.write_key
+
+    async def do_acquire(self, token: str) -> bool:
+        # new readers are blocked while a writer is waiting, so that the writer will not starve
+        write_waiting_ttl: int = math.ceil(max(self._sleep_time * 3, 1) * 1000)
+        return bool(
+            await self._redis.execute(
+                "EVAL",
+                self.LUA_ACQUIRE_SCRIPT,
+                3,
+                self._lock_key,
+                self._rw_lock.read_key,
+                self._rw_lock.write_waiting_key,
+                token,
+                time.time(),
+                self._timeout,
+                write_waiting_ttl,
+            )
+        )
+
+
+class ReadWriteLock(object):
+    """Many readers or one writer
+
+    >>> rw_lock = redis_helper.rw_lock("demo")
+    >>> async with rw_lock.read_lock:
+    ...     pass
+    >>> async with rw_lock.write_lock:
+    ...     pass
+    """
+
+    def __init__(
+        self,
+        redis_helper: "RedisHelper",
+        lock_key: str,
+        timeout: int = 1 * 60,
+        block_timeout: Optional[int] = None,
+        sleep_time: float = 0.1,
+    ):
+        self.redis_helper: "RedisHelper" = redis_helper
+        self.key: str = lock_key
+        self.timeout: int = timeout
+        self.block_timeout: Optional[int] = block_timeout
+        self.sleep_time: float = sleep_time
+
+        # use hash tag, all keys of the lock are in the same shard
+        key_prefix: str = f"{redis_helper.namespace}:rw_lock:{{{lock_key}}}"
+        self.write_key: str = f"{key_prefix}:write"
+        self.read_key: str = f"{key_prefix}:read"
+        self.write_waiting_key: str = f"{key_prefix}:write_waiting"
+
+        self.read_lock: Lock = _ReadLock(self)
+        self.write_lock: Lock = _WriteLock(self)
+
+
 class RedisHelper(object):
     def __init__(
         self,
         namespace: str = _namespace,
+        near_cache: Optional[TTLLRUCache] = None,
+        enable_keyspace_notification: bool = False,
+        hot_key_detector: Optional[HotKeyDetector] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
     ):
+        """
+        :param namespace: key namespace
+        :param near_cache: in-process cache in front of `get_dict` and `hget_dict`.
+            The local value is dropped when its ttl expires or when the key is invalidated.
+            If the invalidation channel is lost, it is resubscribed with backoff and the near cache is skipped meanwhile
+        :param enable_keyspace_notification: By default, `set_dict`, `hmset_dict` and `del_key` publish the key to
+            the invalidation channel. If True, the invalidation comes from redis keyspace notification instead,
+            which also covers keys changed by other commands(redis needs `notify-keyspace-events` config, like `Kgh$`)
+        :param hot_key_detector: If set, the reads of `get_dict` are counted by it(only when near cache is not set),
+            and the hot key is read from a local replica which lives `hot_key_detector.replica_ttl` seconds
+        :param circuit_breaker: If set, `execute` and `pipeline` are guarded by it, and raise `CircuitBreakerOpenError`
+            without calling redis when it is open, so that the caller(like `@cache` and limit backends) can fail open
+        """
         self._namespace: str = namespace
         self._conn_pool: Optional["ConnectionsPool"] = None
         self._client: Optional["Redis"] = None
 
+        self._near_cache: Optional[TTLLRUCache] = near_cache
+        self._enable_keyspace_notification: bool = enable_keyspace_notification
+        # Incremented on every invalidation, a read that raced with an invalidation is not written to near cache
+        self._near_cache_version: int = 0
+        self._near_cache_listen_future_list: List[asyncio.Future] = []
+        # the listen futures which are subscribed, the near cache is skipped if any listen future is not subscribed
+        self._near_cache_subscribed_future_set: Set[asyncio.Future] = set()
+        # other in-process caches(like the local cache of `@cache`) that share the invalidation of near cache
+        self._local_cache_list: List[TTLLRUCache] = []
+
+        self._hot_key_detector: Optional[HotKeyDetector] = hot_key_detector
+        self._hot_key_cache: Optional[TTLLRUCache] = None
+        if hot_key_detector is not None:
+            self._hot_key_cache = TTLLRUCache(hot_key_detector.capacity, hot_key_detector.replica_ttl)
+            self._local_cache_list.append(self._hot_key_cache)
+        self._circuit_breaker: Optional[CircuitBreaker] = circuit_breaker
+
     @property
     def client(self) -> Redis:
         if self._client is None:
             raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
         return self._client
 
+    @property
+    def client_list(self) -> List[Redis]:
+        return [self.client]
+
+    def get_client(self, key: str) -> Redis:
+        """Return the client that owns the key, a single node helper only has one client"""
+        return self.client
+
     def init(self, conn_pool: "ConnectionsPool", namespace: Optional[str] = None) -> None:
         if conn_pool is None:
             raise ConnectionError("conn_pool is none")
@@ -127,13 +377,141 @@ class RedisHelper(object):
         self._client = Redis(self._conn_pool)
         if namespace:
             self._namespace = namespace
+        self._start_near_cache_listen()
+
+    @property
+    def near_cache(self) -> Optional[TTLLRUCache]:
+        return self._near_cache
+
+    @property
+    def hot_key_detector(self) -> Optional[HotKeyDetector]:
+        return self._hot_key_detector
+
+    @property
+    def circuit_breaker(self) -> Optional[CircuitBreaker]:
+        return self._circuit_breaker
+
+    def _circuit_breaker_guard(self) -> ContextManager:
+        if self._circuit_breaker is None:
+            return nullcontext()
+        # the reply error is caused by the command, not by the redis server
+        return self._circuit_breaker.guard((errors.ReplyError,))
+
+    @property
+    def near_cache_channel(self) -> str:
+        return f"{self._namespace}:near_cache:invalidate"
+
+    def _get_local_cache_list(self) -> List[TTLLRUCache]:
+        if self._near_cache is None:
+            return self._local_cache_list
+        return [self._near_cache, *self._local_cache_list]
+
+    def add_local_cache(self, local_cache: TTLLRUCache) -> None:
+        """Register an in-process cache, its items are invalidated in the same way as the near cache"""
+        if local_cache in self._local_cache_list:
+            return
+        self._local_cache_list.append(local_cache)
+        if not self.closed() and not self._near_cache_listen_future_list:
+            self._start_near_cache_listen()
+
+    def _start_near_cache_listen(self) -> None:
+        local_cache_list: List[TTLLRUCache] = self._get_local_cache_list()
+        if not local_cache_list:
+            return
+        for local_cache in local_cache_list:
+            local_cache.clear()
+        if self._enable_keyspace_notification:
+            self._near_cache_listen_future_list = [
+                asyncio.ensure_future(self._near_cache_listen(client, "__keyspace@*__:*", is_pattern=True))
+                for client in self.client_list
+            ]
+        else:
+            self._near_cache_listen_future_list = [
+                asyncio.ensure_future(
+                    self._near_cache_listen(self.get_client(self.near_cache_channel), self.near_cache_channel)
+                )
+            ]
+
+    def _clear_local_cache(self) -> None:
+        self._near_cache_version += 1
+        for local_cache in self._get_local_cache_list():
+            local_cache.clear()
+
+    def _is_near_cache_listening(self) -> bool:
+        """the near cache can not be invalidated if any listener is not subscribed"""
+        return bool(self._near_cache_listen_future_list) and all(
+            future in self._near_cache_subscribed_future_set for future in self._near_cache_listen_future_list
+        )
+
+    async def _near_cache_listen(self, client: Redis, channel_name: str, is_pattern: bool = False) -> None:
+        """receive the invalidation, and resubscribe with backoff when the subscription is lost"""
+        future: Optional[asyncio.Future] = asyncio.current_task()
+        backoff: float = _NEAR_CACHE_LISTEN_MIN_BACKOFF
+        while True:
+            try:
+                if is_pattern:
+                    channel = (await client.psubscribe(channel_name))[0]
+                else:
+                    channel = (await client.subscribe(channel_name))[0]
+                # the local items written while the listener is down may be stale
+                self._clear_local_cache()
+                self._near_cache_subscribed_future_set.add(future)  # type: ignore
+                backoff = _NEAR_CACHE_LISTEN_MIN_BACKOFF
+
+                while await channel.wait_message():
+                    message: Any = await channel.get(encoding="utf-8")
+                    if is_pattern:
+                        # message like: (b'__keyspace@0__:key', 'set')
+                        key: str = message[0].decode().split(":", 1)[1]
+                    else:
+                        key = message
+                    self.invalidate_near_cache(key)
+                logging.error(f"{self.__class__.__name__} near cache channel:{channel_name} is closed")
+            except asyncio.CancelledError:
+                return
+            except Exception as e:
+                logging.error(f"{self.__class__.__name__} near cache listen error:{e}")
+            finally:
+                # can not receive invalidation, so the near cache is skipped until the channel is resubscribed
+                self._near_cache_subscribed_future_set.discard(future)  # type: ignore
+                self._clear_local_cache()
+            if self.closed():
+                return
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, _NEAR_CACHE_LISTEN_MAX_BACKOFF)
+
+    def invalidate_near_cache(self, key: str) -> None:
+        """drop the key from near cache(and the registered local caches) of current process"""
+        local_cache_list: List[TTLLRUCache] = self._get_local_cache_list()
+        if local_cache_list:
+            self._near_cache_version += 1
+            for local_cache in local_cache_list:
+                local_cache.delete(key)
+
+    async def _publish_invalidation(self, key: str) -> None:
+        if not self._get_local_cache_list():
+            return
+        self.invalidate_near_cache(key)
+        if not self._enable_keyspace_notification:
+            await self.execute("PUBLISH", self.near_cache_channel, key)
+
+    async def _publish_invalidation_list(self, key_list: List[str]) -> None:
+        if not self._get_local_cache_list():
+            return
+        for key in key_list:
+            self.invalidate_near_cache(key)
+        if not self._enable_keyspace_notification:
+            await self.pipeline([("publish", self.near_cache_channel, key) for key in key_list])
 
     async def execute(self, command: str, *args: Any, **kwargs: Any) -> Any:
         if self._conn_pool is None:
             raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
         try:
-            async with self._conn_pool.get() as conn:
-                return await conn.execute(command, *args, **kwargs)
+            with self._circuit_breaker_guard():
+                async with self._conn_pool.get() as conn:
+                    return await conn.execute(command, *args, **kwargs)
+        except CircuitBreakerOpenError:
+            raise
         except Exception as e:
             raise errors.RedisError(
                 f"{self.__class__.__name__} execute error. error:{e}."
@@ -149,52 +527,216 @@ class RedisHelper(object):
     ) -> Lock:
         return Lock(self, key, timeout, block_timeout, sleep_time)
 
+    def semaphore(
+        self,
+        key: str,
+        value: int,
+        timeout: int = 1 * 60,
+        block_timeout: Optional[int] = None,
+        sleep_time: float = 0.1,
+    ) -> Semaphore:
+        return Semaphore(self, key, value, timeout, block_timeout, sleep_time)
+
+    def rw_lock(
+        self,
+        key: str,
+        timeout: int = 1 * 60,
+        block_timeout: Optional[int] = None,
+        sleep_time: float = 0.1,
+    ) -> ReadWriteLock:
+        return ReadWriteLock(self, key, timeout, block_timeout, sleep_time)
+
     async def exists(self, key: str) -> bool:
         ret: Optional[int] = await self.execute("exists", key)
         return True if ret and ret == 1 else False
 
-    async def get_dict(self, key: str) -> dict:
-        data = await self.execute("get", key)
+    @staticmethod
+    def _loads_dict(data: Optional[str]) -> dict:
         if not data or data == "":
             return {}
         return pickle.loads(data.encode("latin1"))
 
+    async def get_dict(self, key: str) -> dict:
+        """Note: if near cache is enabled, the returned dict may be shared by other callers, don't modify it"""
+        if self._near_cache is None:
+            if self._hot_key_cache is not None and self._hot_key_detector and self._hot_key_detector.add(key):
+                return await self.get_dict_with_local_cache(key, self._hot_key_cache)
+            return self._loads_dict(await self.execute("get", key))
+
+        if not self._is_near_cache_listening():
+            return self._loads_dict(await self.execute("get", key))
+        value: Any = self._near_cache.get(key, _NOT_FOUND)
+        if value is not _NOT_FOUND:
+            return value
+        version: int = self._near_cache_version
+        value = self._loads_dict(await self.execute("get", key))
+        if version == self._near_cache_version:
+            self._near_cache.set(key, value)
+        return value
+
+    async def get_dict_with_local_cache(self, key: str, local_cache: TTLLRUCache) -> dict:
+        """Like `get_dict`, but read through `local_cache`(registered by `add_local_cache`) first.
+        The value and the remaining ttl of the key are fetched in one pipeline,
+        so the local item never outlives the key in redis"""
+        if not self._is_near_cache_listening():
+            return self._loads_dict(await self.execute("get", key))
+        value: Any = local_cache.get(key, _NOT_FOUND)
+        if value is not _NOT_FOUND:
+            return value
+        version: int = self._near_cache_version
+        data, pttl = await self._pipeline(self.get_client(key), [("get", key), ("pttl", key)])
+        value = self._loads_dict(data)
+        if value and pttl != 0 and version == self._near_cache_version:
+            # pttl is -1 when the key has no expire
+            local_cache.set(key, value, pttl / 1000 if pttl > 0 else None)
+        return value
+
+    async def mget_dict(self, key_list: List[str]) -> List[dict]:
+        if not key_list:
+            return []
+        return [self._loads_dict(data) for data in await self.execute("MGET", *key_list)]
+
     async def set_dict(self, key: str, data: dict, timeout: Optional[int] = None) -> None:
         if timeout:
             await self.execute("SET", key, pickle.dumps(data).decode("latin1"), "ex", timeout)
         else:
             await self.execute("set", key, pickle.dumps(data).decode("latin1"))
+        await self._publish_invalidation(key)
 
     async def del_key(self, key: str, delay: Optional[int] = None) -> bool:
         if delay:
-            return bool(await self.execute("EXPIRE", key, delay))
-        return bool(await self.execute("del", key))
+            result: bool = bool(await self.execute("EXPIRE", key, delay))
+        else:
+            # unlink reclaims the memory of a big value in background thread instead of blocking redis
+            result = bool(await self.execute("UNLINK", key))
+        await self._publish_invalidation(key)
+        return result
+
+    @staticmethod
+    async def _scan_iter(
+        execute: Callable[..., Awaitable[Any]], pattern: Optional[str] = None, count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        arg_list: list = []
+        if pattern:
+            arg_list.extend(["MATCH", pattern])
+        if count:
+            arg_list.extend(["COUNT", count])
+        cursor: Union[int, str] = 0
+        while True:
+            cursor, key_list = await execute("SCAN", cursor, *arg_list)
+            for key in key_list:
+                yield key
+            if cursor == "0":
+                break
 
-    async def pipeline(self, exec_list: List[Tuple]) -> Optional[list]:
-        try:
-            p = self.client.pipeline()
-            for command, *args in exec_list:
-                if command == "del":
-                    command = "delete"
-                getattr(p, command)(*args)
+    def scan_iter(self, pattern: Optional[str] = None, count: Optional[int] = None) -> AsyncIterator[str]:
+        """Incrementally iterate the keys(by `SCAN`) that match the pattern, like: `fast-tools:user_info:*`"""
+        return self._scan_iter(self.execute, pattern, count)
+
+    async def delete_keys(
+        self, key_iter: Union[Iterable[str], AsyncIterable[str]], batch_size: int = 500, max_concurrency: int = 4
+    ) -> int:
+        """
+        Delete keys by `UNLINK` in batches, at most `max_concurrency` batches are executed at the same time,
+         and the key iterator is not consumed until there is a free slot, so it can be a huge(or async) iterator
 
-            return await p.execute()
+        :return: the number of keys that were deleted
+        """
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        future_set: Set[asyncio.Future] = set()
+        deleted_num: int = 0
+
+        async def _unlink(key_list: List[str]) -> None:
+            nonlocal deleted_num
+            try:
+                # don't use `deleted_num += await ...`, the value of deleted_num is read before await
+                result: int = await self.execute("UNLINK", *key_list)
+                deleted_num += result
+                await self._publish_invalidation_list(key_list)
+            finally:
+                semaphore.release()
+
+        async def _submit(key_list: List[str]) -> None:
+            await semaphore.acquire()
+            future: asyncio.Future = asyncio.ensure_future(_unlink(key_list))
+            future_set.add(future)
+            future.add_done_callback(future_set.discard)
+
+        batch_key_list: List[str] = []
+        try:
+            if isinstance(key_iter, AsyncIterable):
+                async for key in key_iter:
+                    batch_key_list.append(key)
+                    if len(batch_key_list) >= batch_size:
+                        await _submit(batch_key_list)
+                        batch_key_list = []
+            else:
+                for key in key_iter:
+                    batch_key_list.append(key)
+                    if len(batch_key_list) >= batch_size:
+                        await _submit(batch_key_list)
+                        batch_key_list = []
+            if batch_key_list:
+                await _submit(batch_key_list)
+        finally:
+            if future_set:
+                await asyncio.gather(*future_set)
+        return deleted_num
+
+    async def delete_pattern(self, pattern: str, batch_size: int = 500, max_concurrency: int = 4) -> int:
+        """Delete all keys that match the pattern without blocking redis, return the number of keys deleted"""
+        return await self.delete_keys(self.scan_iter(pattern, count=batch_size), batch_size, max_concurrency)
+
+    async def _pipeline(self, client: Redis, exec_list: List[Tuple]) -> list:
+        try:
+            with self._circuit_breaker_guard():
+                p = client.pipeline()
+                for command, *args in exec_list:
+                    command = command.lower()
+                    if command == "del":
+                        command = "delete"
+                    getattr(p, command)(*args)
+
+                return await p.execute()
+        except CircuitBreakerOpenError:
+            raise
         except Exception as e:
             raise errors.PipelineError(f"Redis pipeline error, exec_list:{exec_list}") from e
 
+    async def pipeline(self, exec_list: List[Tuple]) -> Optional[list]:
+        return await self._pipeline(self.client, exec_list)
+
     async def hmset_dict(self, key: str, key_dict: dict) -> None:
         value_list: list = []
         for _key in key_dict.keys():
             value_list.append(_key)
             value_list.append(pickle.dumps({_key: key_dict[_key]}).decode("latin1"))
         await self.execute("HMSET", key, *value_list)
+        await self._publish_invalidation(key)
 
-    async def hget_dict(self, key: str, field: str) -> Any:
+    async def _hget_dict(self, key: str, field: str) -> Any:
         value: Optional[str] = await self.execute("HGET", key, field)
         if value is None:
             return None
         return pickle.loads(value.encode("latin1"))[field]
 
+    async def hget_dict(self, key: str, field: str) -> Any:
+        if self._near_cache is None or not self._is_near_cache_listening():
+            return await self._hget_dict(key, field)
+
+        # all fields of the hash share one near cache item, so that they can be invalidated by key
+        field_dict: Dict[str, Any] = self._near_cache.get(key, _NOT_FOUND)
+        if field_dict is not _NOT_FOUND and field in field_dict:
+            return field_dict[field]
+        version: int = self._near_cache_version
+        value: Any = await self._hget_dict(key, field)
+        if version == self._near_cache_version:
+            if field_dict is _NOT_FOUND:
+                field_dict = {}
+                self._near_cache.set(key, field_dict)
+            field_dict[field] = value
+        return value
+
     async def hmget_dict(self, key: str) -> dict:
         return_dict = {}
         scan = 0
@@ -218,7 +760,14 @@ class RedisHelper(object):
         else:
             return self._conn_pool.closed
 
+    def _stop_near_cache_listen(self) -> None:
+        for future in self._near_cache_listen_future_list:
+            if not future.done():
+                future.cancel()
+        self._near_cache_listen_future_list = []
+
     async def close(self) -> None:
+        self._stop_near_cache_listen()
         if self._conn_pool is not None and not self._conn_pool.closed:
             logging.info(f"{self.__class__.__name__} Close.")
             self._conn_pool.close()
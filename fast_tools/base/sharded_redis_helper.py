@@ -0,0 +1,272 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+from functools import partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from aioredis import ConnectionsPool, Redis, errors  # type: ignore
+
+from fast_tools.base.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+from fast_tools.base.hot_key import HotKeyDetector
+from fast_tools.base.lru import TTLLRUCache
+from fast_tools.base.redis_helper import RedisHelper
+from fast_tools.base.utils import NAMESPACE as _namespace
+
+__all__ = ["ShardedRedisHelper"]
+
+# commands without key, they are always sent to the first shard
+_KEYLESS_COMMAND_SET = {"INFO", "PING", "TIME", "SCAN", "CONFIG"}
+# commands without key which act on the whole db, they are sent to every shard and the results are merged
+_ALL_SHARD_COMMAND_SET = {"DBSIZE", "FLUSHDB", "FLUSHALL", "SCRIPT"}
+# commands whose args are all keys, they are split by shard and the results are merged
+_SUM_MULTI_KEY_COMMAND_SET = {"DEL", "UNLINK", "EXISTS", "TOUCH"}
+_LIST_MULTI_KEY_COMMAND_SET = {"MGET"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class ShardedRedisHelper(RedisHelper):
+    """Client-side sharding RedisHelper
+
+    Each key is routed to one of the conn pools by consistent hashing with virtual nodes,
+    if `enable_hash_tag` is True, only the substring inside the first `{...}` of the key is hashed(like Redis Cluster),
+    so that `{user:1}:info` and `{user:1}:token` stay in the same shard.
+    """
+
+    def __init__(
+        self,
+        namespace: str = _namespace,
+        virtual_node_num: int = 160,
+        enable_hash_tag: bool = True,
+        near_cache: Optional[TTLLRUCache] = None,
+        enable_keyspace_notification: bool = False,
+        hot_key_detector: Optional[HotKeyDetector] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+    ):
+        super().__init__(
+            namespace,
+            near_cache=near_cache,
+            enable_keyspace_notification=enable_keyspace_notification,
+            hot_key_detector=hot_key_detector,
+            circuit_breaker=circuit_breaker,
+        )
+        self._virtual_node_num: int = virtual_node_num
+        self._enable_hash_tag: bool = enable_hash_tag
+        self._conn_pool_list: List["ConnectionsPool"] = []
+        self._client_list: List["Redis"] = []
+        self._ring_hash_list: List[int] = []
+        self._ring_index_list: List[int] = []
+
+    @property
+    def client(self) -> Redis:
+        if not self._client_list:
+            raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
+        raise RuntimeError(
+            f"{self.__class__.__name__} has multi client, please use {self.__class__.__name__}.get_client(key)"
+        )
+
+    @property
+    def client_list(self) -> List[Redis]:
+        return self._client_list
+
+    def get_client(self, key: str) -> Redis:
+        if not self._client_list:
+            raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
+        return self._client_list[self.get_shard_index(key)]
+
+    def init(  # type: ignore[override]
+        self, conn_pool_list: Sequence["ConnectionsPool"], namespace: Optional[str] = None
+    ) -> None:
+        if not conn_pool_list or any(conn_pool is None for conn_pool in conn_pool_list):
+            raise ConnectionError("conn_pool is none")
+        elif self._conn_pool_list:
+            if not self.closed():
+                for conn_pool in conn_pool_list:
+                    if not conn_pool.closed:
+                        conn_pool.close()
+                raise ConnectionError(f"Init error, {self.__class__.__name__} already init")
+
+        self._conn_pool_list = list(conn_pool_list)
+        self._client_list = [Redis(conn_pool) for conn_pool in self._conn_pool_list]
+
+        ring: List[Tuple[int, int]] = []
+        for index in range(len(self._conn_pool_list)):
+            for virtual_index in range(self._virtual_node_num):
+                ring.append((_hash(f"shard-{index}-node-{virtual_index}"), index))
+        ring.sort()
+        self._ring_hash_list = [hash_value for hash_value, _ in ring]
+        self._ring_index_list = [index for _, index in ring]
+        if namespace:
+            self._namespace = namespace
+        self._start_near_cache_listen()
+
+    def _get_hash_key(self, key: str) -> str:
+        if self._enable_hash_tag:
+            start: int = key.find("{")
+            if start != -1:
+                end: int = key.find("}", start + 1)
+                if end > start + 1:
+                    return key[start + 1 : end]
+        return key
+
+    def get_shard_index(self, key: str) -> int:
+        """Return the index of the conn pool which the key belongs to"""
+        if len(self._ring_index_list) == 0:
+            raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
+        index: int = bisect.bisect(self._ring_hash_list, _hash(self._get_hash_key(key)))
+        if index == len(self._ring_hash_list):
+            index = 0
+        return self._ring_index_list[index]
+
+    def _get_command_shard_index(self, command: str, args: Sequence[Any]) -> int:
+        command = command.upper()
+        if not args or command in _KEYLESS_COMMAND_SET:
+            return 0
+        if command in ("EVAL", "EVALSHA"):
+            key_num: int = int(args[1])
+            if not key_num:
+                return 0
+            shard_index_set = {self.get_shard_index(key) for key in args[2 : 2 + key_num]}
+            if len(shard_index_set) != 1:
+                raise errors.RedisError(f"{command} keys:{args[2: 2 + key_num]} don't hash to the same shard")
+            return shard_index_set.pop()
+        return self.get_shard_index(args[0])
+
+    def _group_key_by_shard(self, key_list: Sequence[str]) -> Dict[int, List[int]]:
+        """return {shard index: [key index]}"""
+        shard_dict: Dict[int, List[int]] = {}
+        for key_index, key in enumerate(key_list):
+            shard_dict.setdefault(self.get_shard_index(key), []).append(key_index)
+        return shard_dict
+
+    def _split_command(self, command: str, args: Sequence[Any], is_pipeline: bool = False) -> Dict[int, List[int]]:
+        """return {shard index: [index of the args sent to the shard]}"""
+        upper_command: str = command.upper()
+        if upper_command in _ALL_SHARD_COMMAND_SET:
+            return {shard_index: list(range(len(args))) for shard_index in range(len(self._conn_pool_list))}
+        if len(args) > 1 and (
+            upper_command in _SUM_MULTI_KEY_COMMAND_SET or upper_command in _LIST_MULTI_KEY_COMMAND_SET
+        ):
+            return self._group_key_by_shard(args)
+        if is_pipeline:
+            return {self._get_pipeline_shard_index(command, args): list(range(len(args)))}
+        return {self._get_command_shard_index(command, args): list(range(len(args)))}
+
+    @staticmethod
+    def _merge_result(command: str, arg_num: int, result_list: List[Tuple[List[int], Any]]) -> Any:
+        """merge the results of shards, result_list: [(index of the args sent to the shard, result of the shard)]"""
+        upper_command: str = command.upper()
+        if upper_command in _SUM_MULTI_KEY_COMMAND_SET or upper_command == "DBSIZE":
+            return sum(result for _, result in result_list)
+        elif upper_command in _LIST_MULTI_KEY_COMMAND_SET:
+            merge_result_list: List[Any] = [None] * arg_num
+            for arg_index_list, shard_result_list in result_list:
+                for arg_index, result in zip(arg_index_list, shard_result_list):
+                    merge_result_list[arg_index] = result
+            return merge_result_list
+        # the result of the command sent to every shard(like `FLUSHDB`) is the same
+        return result_list[0][1]
+
+    async def _execute_by_shard(self, shard_index: int, command: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            with self._circuit_breaker_guard():
+                async with self._conn_pool_list[shard_index].get() as conn:
+                    return await conn.execute(command, *args, **kwargs)
+        except CircuitBreakerOpenError:
+            raise
+        except Exception as e:
+            raise errors.RedisError(
+                f"{self.__class__.__name__} execute error. error:{e}."
+                f" shard:{shard_index} command:{command}, args:{args}, kwargs:{kwargs}"
+            ) from e
+
+    async def execute(self, command: str, *args: Any, **kwargs: Any) -> Any:
+        if not self._conn_pool_list:
+            raise ConnectionError(f"Not init {self.__class__.__name__}, please run {self.__class__.__name__}.init")
+        shard_dict: Dict[int, List[int]] = self._split_command(command, args)
+        if len(shard_dict) == 1:
+            shard_index, arg_index_list = next(iter(shard_dict.items()))
+            result: Any = await self._execute_by_shard(shard_index, command, *args, **kwargs)
+            return self._merge_result(command, len(args), [(arg_index_list, result)])
+
+        # multi key command is split by shard and executed concurrently
+        result_list: List[Any] = await asyncio.gather(
+            *[
+                self._execute_by_shard(
+                    shard_index, command, *[args[arg_index] for arg_index in arg_index_list], **kwargs
+                )
+                for shard_index, arg_index_list in shard_dict.items()
+            ]
+        )
+        return self._merge_result(command, len(args), list(zip(shard_dict.values(), result_list)))
+
+    async def _scan_all_shard_iter(
+        self, pattern: Optional[str] = None, count: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        for shard_index in range(len(self._conn_pool_list)):
+            async for key in self._scan_iter(partial(self._execute_by_shard, shard_index), pattern, count):
+                yield key
+
+    def scan_iter(self, pattern: Optional[str] = None, count: Optional[int] = None) -> AsyncIterator[str]:
+        """scan the keys of every shard one by one"""
+        return self._scan_all_shard_iter(pattern, count)
+
+    def _get_pipeline_shard_index(self, command: str, args: Sequence[Any]) -> int:
+        if command.upper() in ("EVAL", "EVALSHA"):
+            # pipeline use aioredis method, like: ("eval", script, [key], [arg])
+            key_list: Sequence[str] = args[1] if len(args) > 1 else []
+            return self._get_command_shard_index(command, [args[0], len(key_list), *key_list])
+        return self._get_command_shard_index(command, args)
+
+    async def pipeline(self, exec_list: List[Tuple]) -> Optional[list]:
+        """split exec list by shard(the multi key command is also split), execute the pipeline of each shard
+        concurrently, and return the result in the order of exec list"""
+        shard_exec_dict: Dict[int, List[Tuple]] = {}
+        # exec index -> [(shard index, index in the exec list of shard, index of the args sent to the shard)]
+        part_list: List[List[Tuple[int, int, List[int]]]] = []
+        for command, *args in exec_list:
+            part: List[Tuple[int, int, List[int]]] = []
+            for shard_index, arg_index_list in self._split_command(command, args, is_pipeline=True).items():
+                shard_exec_list: List[Tuple] = shard_exec_dict.setdefault(shard_index, [])
+                part.append((shard_index, len(shard_exec_list), arg_index_list))
+                shard_exec_list.append((command, *[args[arg_index] for arg_index in arg_index_list]))
+            part_list.append(part)
+
+        shard_index_list: List[int] = list(shard_exec_dict.keys())
+        result_list: List[list] = await asyncio.gather(
+            *[
+                self._pipeline(self._client_list[shard_index], shard_exec_dict[shard_index])
+                for shard_index in shard_index_list
+            ]
+        )
+        shard_result_dict: Dict[int, list] = dict(zip(shard_index_list, result_list))
+        return [
+            self._merge_result(
+                command,
+                len(args),
+                [
+                    (arg_index_list, shard_result_dict[shard_index][exec_index])
+                    for shard_index, exec_index, arg_index_list in part
+                ],
+            )
+            for (command, *args), part in zip(exec_list, part_list)
+        ]
+
+    def closed(self) -> bool:
+        if not self._conn_pool_list:
+            return True
+        return all(conn_pool.closed for conn_pool in self._conn_pool_list)
+
+    async def close(self) -> None:
+        self._stop_near_cache_listen()
+        if not self.closed():
+            logging.info(f"{self.__class__.__name__} Close.")
+            for conn_pool in self._conn_pool_list:
+                if not conn_pool.closed:
+                    conn_pool.close()
+            await asyncio.gather(*[conn_pool.wait_closed() for conn_pool in self._conn_pool_list])
+        else:
+            logging.warning(f"{self.__class__.__name__} has been closed")
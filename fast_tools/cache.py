@@ -1,12 +1,181 @@
+import asyncio
+import dataclasses
+import hashlib
 import inspect
 import logging
+import math
+import random
+import time
+import uuid
+from contextlib import contextmanager
 from functools import wraps
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Type
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+from urllib.parse import urlencode
 
+from aioredis import errors  # type: ignore
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.responses import JSONResponse, Response
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from fast_tools.base import NAMESPACE, json, redis_helper
+from fast_tools.base import NAMESPACE, CircuitBreakerOpenError, LRUCache, RouteTrie, TTLLRUCache, redis_helper
+from fast_tools.base._compress import compress_func_dict, decompress_func_dict
+
+try:
+    import xxhash  # type: ignore
+
+    def _hash(data: str) -> str:
+        return xxhash.xxh3_128_hexdigest(data.encode())
+
+except ImportError:
+
+    def _hash(data: str) -> str:
+        return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+
+try:
+    from pydantic import BaseModel, create_model
+    from pydantic.json import pydantic_encoder
+except ImportError:
+    BaseModel = None  # type: ignore
+    create_model = None  # type: ignore
+    pydantic_encoder = None  # type: ignore
+
+
+# call func, and return the result of func and the rendered response data(see `_gen_response_data`)
+_COMPUTE_FUNC_TYPE = Callable[[Any, Any], Awaitable[Tuple[Any, Dict[str, Any]]]]
+# handle the cached response by (response, backend, key) or (response, backend, key, ttl)
+_AFTER_CACHE_RESPONSE_FUNC_TYPE = Callable[..., Awaitable]
+# generate the tags of cache by request(None if func has no request param) and the result of func
+_TAG_FUNC_TYPE = Callable[[Optional[Request], Any], Union[Iterable[str], Awaitable[Iterable[str]]]]
+
+
+class CacheMetricsRecorder(object):
+    """Record the metrics of one func decorated by `cache`, it records nothing by default.
+    It is created once by `BaseCacheMetrics.bind` when decorating, so the labels can be bound in advance"""
+
+    def inc_hit(self) -> None:
+        """the response is served by cache(include `304 Not Modified`)"""
+
+    def inc_miss(self) -> None:
+        """the response is computed by func"""
+
+    def inc_stale(self) -> None:
+        """the stale response is served while it is recomputed in background"""
+
+    def observe_lock_wait(self, seconds: float) -> None:
+        """the time waiting for the lock of key before computing"""
+
+    def observe_compute(self, seconds: float) -> None:
+        """the time computing the data(include the serialization), also for the background recomputation"""
+
+    def observe_serialize(self, seconds: float) -> None:
+        """the time serializing the result of func to the body of response"""
+
+    def observe_payload_size(self, size: int) -> None:
+        """the size of body(before compression)"""
+
+
+class BaseCacheMetrics(object):
+    """The metrics of `cache`, see `fast_tools.exporter.PrometheusCacheMetrics`
+    and `fast_tools.statsd_middleware.StatsdCacheMetrics`"""
+
+    def bind(self, alias: str) -> CacheMetricsRecorder:
+        """return the recorder of the func(the alias of `cache` or the name of func)"""
+        raise NotImplementedError
+
+
+class Vary(object):
+    """Declare the parts of request that the response varies on, the cache key is generated by them.
+    The values are serialized canonically(sorted by name, header name is case-insensitive) and hashed
+    """
+
+    def __init__(
+        self,
+        path_param_list: Optional[List[str]] = None,
+        query_param_list: Optional[List[str]] = None,
+        header_list: Optional[List[str]] = None,
+    ):
+        self.path_param_list: List[str] = sorted(set(path_param_list or []))
+        self.query_param_list: List[str] = sorted(set(query_param_list or []))
+        self.header_list: List[str] = sorted({header.lower() for header in header_list or []})
+
+    def gen_key_data(self, request: Request) -> str:
+        item_list: List[Tuple[str, str]] = []
+        for name in self.path_param_list:
+            item_list.append((f"path.{name}", str(request.path_params.get(name, ""))))
+        for name in self.query_param_list:
+            for value in request.query_params.getlist(name):
+                item_list.append((f"query.{name}", value))
+        for name in self.header_list:
+            for value in request.headers.getlist(name):
+                item_list.append((f"header.{name}", " ".join(value.split())))
+        return urlencode(item_list)
+
+
+def _gen_request_key_data(request: Request) -> str:
+    return f"{request.url.path}?{urlencode(sorted(request.query_params.multi_items()))}"
+
+
+def _has_request_param(sig: inspect.Signature) -> bool:
+    return any(
+        inspect.isclass(parameter.annotation) and issubclass(parameter.annotation, Request)
+        for parameter in sig.parameters.values()
+    )
+
+
+def _gen_default_key_data(args: Any, kwargs: Dict[str, Any]) -> str:
+    """serialize the param of func, the request is replaced with its path and sorted query params"""
+
+    def _serialize(value: Any) -> str:
+        if isinstance(value, Request):
+            return _gen_request_key_data(value)
+        return repr(value)
+
+    return urlencode(
+        [("", _serialize(arg)) for arg in args] + [(key, _serialize(kwargs[key])) for key in sorted(kwargs.keys())]
+    )
+
+
+def _alias_encoder(obj: Any) -> Any:
+    # the model nested in dataclass is not converted by `BaseModel.dict`, it is also encoded with alias
+    if isinstance(obj, BaseModel):
+        return obj.dict(by_alias=True)
+    return pydantic_encoder(obj)
+
+
+def _gen_serializer(return_annotation: Any, json_response: Type[JSONResponse]) -> Optional[Callable[[Any], bytes]]:
+    """gen the serializer of the return annotation once, the result is serialized without validation,
+    return None if the return annotation is not supported(`BaseModel`, dataclass and `List[...]`)"""
+    if BaseModel is not None and inspect.isclass(return_annotation) and issubclass(return_annotation, BaseModel):
+        # like the default of FastAPI
+        return lambda result: result.json(by_alias=True).encode()
+    is_dataclass: bool = inspect.isclass(return_annotation) and dataclasses.is_dataclass(return_annotation)
+    if BaseModel is not None and (is_dataclass or getattr(return_annotation, "__origin__", None) is list):
+        # the pydantic model of the annotation, its json encoder supports nested model, dataclass, datetime and so on
+        root_model: Type[BaseModel] = create_model(
+            f"{getattr(return_annotation, '__name__', 'List')}CacheRoot", __root__=(return_annotation, ...)
+        )
+        return lambda result: root_model.construct(__root__=result).json(by_alias=True, encoder=_alias_encoder).encode()
+    if is_dataclass:
+        return lambda result: json_response(dataclasses.asdict(result)).body
+    return None
 
 
 def _check_typing_type(_type: Type, origin_name: str) -> bool:
@@ -16,12 +185,969 @@ def _check_typing_type(_type: Type, origin_name: str) -> bool:
         return False
 
 
-async def cache_control(response: Response, backend: "redis_helper.RedisHelper", key: str) -> None:
-    """add ttl in response header"""
-    ttl = await backend.client.ttl(key)
+async def cache_control(
+    response: Response, backend: "redis_helper.RedisHelper", key: str, ttl: Optional[int] = None
+) -> None:
+    """add ttl in response header, the ttl is read from backend if it is not given"""
+    if ttl is None:
+        ttl = await backend.execute("TTL", key)
     response.headers["Cache-Control"] = f"max-age={ttl}"
 
 
+_CACHE_ENTRY_VERSION: int = 3
+# the max number of keys whose access count is recorded by each func, see `refresh_ahead_threshold`
+_REFRESH_AHEAD_KEY_NUM: int = 10240
+# the manifest is selected from the `manifest_size * _MANIFEST_CAPACITY_FACTOR` recently called keys
+_MANIFEST_CAPACITY_FACTOR: int = 4
+# the chunks of streaming response live longer than its entry, so that the replay started before expiry can finish
+_STREAM_CHUNK_GRACE_TIME: int = 60
+
+
+# the errors which mean the backend is unavailable
+_BACKEND_ERROR_TUPLE: Tuple[Type[Exception], ...] = (CircuitBreakerOpenError, errors.RedisError)
+
+
+class _BackendUnavailableError(Exception):
+    """the backend is unavailable before func is called, so func can be called without cache"""
+
+
+@contextmanager
+def _before_compute_guard() -> Iterator[None]:
+    """convert the backend error raised before func is called,
+    so that it is not mixed up with the error raised by func or by the store after func is called"""
+    try:
+        yield
+    except _BACKEND_ERROR_TUPLE as e:
+        raise _BackendUnavailableError(e) from e
+
+
+async def _release_lock(lock: "redis_helper.Lock", key: str) -> None:
+    """the lock expires by itself, so the release error is only logged"""
+    try:
+        await lock.release()
+    except Exception as e:
+        logging.exception(f"release the lock of cache key:{key} error:{e}")
+
+
+def _gen_tag_key(namespace: str, tag: str) -> str:
+    return f"{namespace}:cache_tag:{tag}"
+
+
+async def invalidate_tags(
+    backend: "redis_helper.RedisHelper", *tag_list: str, namespace: str = NAMESPACE, batch_size: int = 500
+) -> int:
+    """Delete the caches of `@cache` which have any of the tags, return the number of keys deleted
+
+    :param backend: the backend of `@cache`
+    :param tag_list: tags of cache
+    :param namespace: the namespace of `@cache`
+    :param batch_size: the number of keys read and deleted by each command
+    """
+    tag_key_list: List[str] = [_gen_tag_key(namespace, tag) for tag in tag_list]
+
+    async def _key_iter() -> AsyncIterator[str]:
+        for tag_key in tag_key_list:
+            cursor: Union[int, str] = 0
+            while True:
+                cursor, member_score_list = await backend.execute("ZSCAN", tag_key, cursor, "COUNT", batch_size)
+                key_list: List[str] = member_score_list[::2]
+                if key_list:
+                    # the chunks of streaming response are recorded in the chunk set of key
+                    chunk_key_list_list: list = (
+                        await backend.pipeline([("smembers", _gen_chunk_set_key(key)) for key in key_list]) or []
+                    )
+                    for key, chunk_key_list in zip(key_list, chunk_key_list_list):
+                        yield key
+                        yield key + ":meta"
+                        yield _gen_chunk_set_key(key)
+                        for chunk_key in chunk_key_list:
+                            yield chunk_key
+                if cursor == "0":
+                    break
+
+    deleted_num: int = await backend.delete_keys(_key_iter(), batch_size=batch_size)
+    if tag_key_list:
+        await backend.execute("UNLINK", *tag_key_list)
+    return deleted_num
+
+
+def _gen_cache_entry(data: Optional[Dict[str, Any]], expire: Optional[int], delta: float, now: float) -> Dict[str, Any]:
+    """
+    :param data: rendered response data, None if func raised an exception that is cached
+    :param expire: logical expiration time of data, the key may live longer in backend to serve stale data
+    :param delta: seconds spent computing data
+    :param now: the timestamp of the clock of cache
+    """
+    return {
+        "_version": _CACHE_ENTRY_VERSION,
+        "data": data,
+        "expire_at": now + expire if expire else None,
+        "delta": delta,
+    }
+
+
+def _gen_response_data(response: Response) -> Dict[str, Any]:
+    """Only the rendered body is stored, so the hit is served without serialization"""
+    headers: Dict[str, str] = dict(response.headers)
+    headers.pop("content-length", None)
+    return {
+        "body": response.body,
+        "status_code": response.status_code,
+        "headers": headers,
+        "media_type": response.media_type,
+    }
+
+
+def _gen_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _match_etag(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison, like: `"a", W/"b"` or `*`"""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        for encoding in decompress_func_dict:
+            # the ETag of compressed variant, see `_gen_variant_etag`
+            suffix: str = f'-{encoding}"'
+            if tag.endswith(suffix):
+                tag = tag[: -len(suffix)] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
+
+
+def _gen_variant_etag(etag: str, encoding: str) -> str:
+    """Each encoding is a different representation, so it has a different strong ETag"""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _select_encoding(accept_encoding: str, encoding_list: Iterable[str]) -> Optional[str]:
+    """Select the first encoding(in server preference order) accepted by `Accept-Encoding`,
+    return None if only the identity is accepted"""
+    q_dict: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, param = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q: float = 1.0
+        param = param.strip()
+        if param.startswith("q="):
+            try:
+                q = float(param[2:])
+            except ValueError:
+                q = 0.0
+        q_dict[name] = q
+    for encoding in encoding_list:
+        if q_dict.get(encoding, q_dict.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def _add_vary_header(headers: Dict[str, str]) -> None:
+    vary: Optional[str] = headers.get("vary")
+    if not vary:
+        headers["vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["vary"] = f"{vary}, Accept-Encoding"
+
+
+def _get_request(kwargs: Dict[str, Any]) -> Optional[Request]:
+    for arg in kwargs.values():
+        if isinstance(arg, Request):
+            return arg
+    return None
+
+
+def _get_required_request(kwargs: Dict[str, Any]) -> Request:
+    request: Optional[Request] = _get_request(kwargs)
+    if request is None:
+        raise ValueError("Can not found request param")
+    return request
+
+
+def _compress_data(data: Dict[str, Any], encoding_list: Sequence[str]) -> None:
+    """replace the body with the compressed variants"""
+    data["encoded_body_dict"] = {encoding: compress_func_dict[encoding](data["body"]) for encoding in encoding_list}
+    data["body"] = b""
+
+
+def _render_response(data: Dict[str, Any], accept_encoding: str = "") -> Response:
+    encoded_body_dict: Optional[Dict[str, bytes]] = data.get("encoded_body_dict")
+    if not encoded_body_dict:
+        return Response(data["body"], data["status_code"], data["headers"], data["media_type"])
+
+    headers: Dict[str, str] = dict(data["headers"])
+    _add_vary_header(headers)
+    encoding: Optional[str] = _select_encoding(accept_encoding, encoded_body_dict)
+    if encoding is None:
+        # the client only accepts identity, it is rare
+        encoding = next(iter(encoded_body_dict))
+        body: bytes = decompress_func_dict[encoding](encoded_body_dict[encoding])
+    else:
+        body = encoded_body_dict[encoding]
+        headers["content-encoding"] = encoding
+        if "etag" in headers:
+            headers["etag"] = _gen_variant_etag(headers["etag"], encoding)
+    return Response(body, data["status_code"], headers, data["media_type"])
+
+
+async def _get_entry(
+    backend: "redis_helper.RedisHelper", key: str, local_cache: Optional[TTLLRUCache]
+) -> Optional[Dict[str, Any]]:
+    if local_cache is None:
+        entry: Dict[str, Any] = await backend.get_dict(key)
+    else:
+        entry = await backend.get_dict_with_local_cache(key, local_cache)
+    # the entry written by other version is regarded as a miss
+    if entry.get("_version") != _CACHE_ENTRY_VERSION:
+        return None
+    return entry
+
+
+async def _set_dict(
+    backend: "redis_helper.RedisHelper",
+    key: str,
+    value: Dict[str, Any],
+    expire: Optional[int],
+    local_cache: Optional[TTLLRUCache],
+) -> None:
+    await backend.set_dict(key, value, expire)
+    if local_cache is not None:
+        local_cache.set(key, value, expire)
+
+
+def _dump_exception(exception: Exception) -> Tuple[Type[Exception], tuple, Dict[str, Any]]:
+    """the exception built with keyword args(like: `HTTPException(status_code=404)`) has empty `args`,
+    it can not be rebuilt by `cls(*args)`(like copy and pickle do), so its class, args and attributes are stored"""
+    return exception.__class__, exception.args, dict(exception.__dict__)
+
+
+def _load_exception(exception_info: Tuple[Type[Exception], tuple, Dict[str, Any]]) -> Exception:
+    """the cached exception is shared by the hits(and the waiters of one computation),
+    each raise uses a new exception, so that the traceback of the shared exception does not grow"""
+    exception_class, args, attr_dict = exception_info
+    exception: Exception = exception_class.__new__(exception_class)
+    exception.args = args
+    exception.__dict__.update(attr_dict)
+    return exception
+
+
+def _is_expired(entry: Dict[str, Any], now: float) -> bool:
+    return entry["expire_at"] is not None and entry["expire_at"] <= now
+
+
+def _get_ttl(entry: Dict[str, Any], now: float) -> int:
+    """the remaining seconds of data(like the `TTL` of redis), it is not the ttl of key in backend"""
+    if entry["expire_at"] is None:
+        return -1
+    return max(math.ceil(entry["expire_at"] - now), 0)
+
+
+def _gen_chunk_key(key: str, stream_id: str, index: int) -> str:
+    return f"{key}:chunk:{stream_id}:{index}"
+
+
+def _gen_chunk_set_key(key: str) -> str:
+    """the set of the chunk keys of key, so that the chunks can be deleted with key"""
+    return f"{key}:chunk"
+
+
+async def _iter_chunk(backend: "redis_helper.RedisHelper", key: str, data: Dict[str, Any]) -> AsyncIterator[bytes]:
+    """read the chunks of streaming response one by one, so that the whole body is never in memory"""
+    for index in range(data["chunk_num"]):
+        chunk: Optional[bytes] = await backend.execute(
+            "GET", _gen_chunk_key(key, data["stream_id"], index), encoding=None
+        )
+        if chunk is None:
+            # part of the response has been sent, it can only be broken
+            raise RuntimeError(f"The chunk:{index} of cache key:{key} is missing")
+        yield chunk
+
+
+class _TeeStreamResponse(Response):
+    """Send the streaming response to client, and the sent messages are also passed to the tee send"""
+
+    def __init__(
+        self, response: Response, gen_tee_send: Callable[[Send], Send], on_finish: Callable[[], Awaitable[None]]
+    ) -> None:
+        self.response: Response = response
+        self.gen_tee_send: Callable[[Send], Send] = gen_tee_send
+        self.on_finish: Callable[[], Awaitable[None]] = on_finish
+        self.status_code = response.status_code
+        self.media_type = response.media_type
+        # share the headers with the origin response, so that the change of headers is also sent
+        self.raw_headers = response.raw_headers
+        self.background = None  # type: ignore
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.background is not None and self.response.background is None:
+            self.response.background = self.background
+        try:
+            await self.response(scope, receive, self.gen_tee_send(send))
+        finally:
+            await self.on_finish()
+
+
+def _need_early_refresh(entry: Dict[str, Any], beta: float, now: float) -> bool:
+    """XFetch(Optimal Probabilistic Cache Stampede Prevention):
+    the probability of recomputing grows as the entry approaches expiry, and a slow computation starts earlier"""
+    if entry["expire_at"] is None:
+        return False
+    return now - entry["delta"] * beta * math.log(1 - random.random()) >= entry["expire_at"]
+
+
+class _CacheHandler(object):
+    """Cache the response of one func, it is created by `cache`"""
+
+    # KEYS[1] - tag name
+    # ARGV[1] - key, ARGV[2] - now timestamp, ARGV[3] - expire(second, 0 means the key never expires)
+    # the ttl of tag is only extended, so the short-lived key does not cut the ttl of the long-lived key's tag
+    LUA_SET_TAG_SCRIPT = """
+        local now = tonumber(ARGV[2])
+        local expire = tonumber(ARGV[3])
+        redis.call('zremrangebyscore', KEYS[1], '-inf', now)
+        local ttl = redis.call('ttl', KEYS[1])
+        if expire > 0 then
+            redis.call('zadd', KEYS[1], now + expire, ARGV[1])
+        else
+            redis.call('zadd', KEYS[1], 'inf', ARGV[1])
+        end
+        if expire == 0 then
+            redis.call('persist', KEYS[1])
+        elseif ttl == -2 or (ttl >= 0 and ttl < expire) then
+            redis.call('expire', KEYS[1], expire)
+        end
+        return 1
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        backend: "redis_helper.RedisHelper",
+        prefix: str,
+        expire: Optional[int],
+        json_response: Type[JSONResponse],
+        get_key_func: Optional[Callable[[Request], Awaitable[str]]],
+        vary: Optional[Vary],
+        after_cache_response_list: Optional[List[_AFTER_CACHE_RESPONSE_FUNC_TYPE]],
+        local_cache: Optional[TTLLRUCache],
+        stale_while_revalidate: Optional[int],
+        early_refresh_beta: Optional[float],
+        enable_etag: bool,
+        compress_min_size: Optional[int],
+        compress_encoding_list: Optional[Sequence[str]],
+        namespace: str,
+        tag_list: Optional[List[str]],
+        get_tag_func: Optional[_TAG_FUNC_TYPE],
+        negative_cache_exception_list: Optional[List[Type[Exception]]],
+        negative_cache_status_code_list: Optional[List[int]],
+        negative_cache_expire: int,
+        refresh_ahead_threshold: Optional[int],
+        refresh_ahead_time: float,
+        manifest_size: Optional[int],
+        metrics_recorder: CacheMetricsRecorder,
+        write_back: bool,
+        write_back_concurrency: int,
+        stream_chunk_size: int,
+        stream_lock_timeout: int,
+        clock: Callable[[], float],
+    ):
+        self.func: Callable = func
+        self.backend: "redis_helper.RedisHelper" = backend
+        self.prefix: str = prefix
+        self.expire: Optional[int] = expire
+        self.json_response: Type[JSONResponse] = json_response
+        self.get_key_func: Optional[Callable[[Request], Awaitable[str]]] = get_key_func
+        self.vary: Optional[Vary] = vary
+        # the func that has the `ttl` param is called with the ttl of entry, so it does not need to access backend
+        self.after_cache_response_list: List[Tuple[_AFTER_CACHE_RESPONSE_FUNC_TYPE, bool]] = [
+            (after_cache_response, len(inspect.signature(after_cache_response).parameters) > 3)
+            for after_cache_response in after_cache_response_list or []
+        ]
+        self.local_cache: Optional[TTLLRUCache] = local_cache
+        self.stale_while_revalidate: Optional[int] = stale_while_revalidate
+        self.early_refresh_beta: Optional[float] = early_refresh_beta
+        self.enable_etag: bool = enable_etag
+        self.compress_min_size: Optional[int] = compress_min_size
+        self.compress_encoding_list: Sequence[str] = compress_encoding_list or list(compress_func_dict.keys())
+        self.namespace: str = namespace
+        self.tag_list: Optional[List[str]] = tag_list
+        self.get_tag_func: Optional[_TAG_FUNC_TYPE] = get_tag_func
+        self.negative_cache_exception_tuple: Tuple[Type[Exception], ...] = tuple(negative_cache_exception_list or [])
+        self.negative_cache_status_code_set: Set[int] = set(negative_cache_status_code_list or [])
+        self.negative_cache_expire: int = negative_cache_expire
+        self.refresh_ahead_threshold: Optional[int] = refresh_ahead_threshold
+        self.refresh_ahead_time: float = refresh_ahead_time
+        self.manifest_size: Optional[int] = manifest_size
+        self.metrics_recorder: CacheMetricsRecorder = metrics_recorder
+        self.write_back: bool = write_back
+        self.write_back_concurrency: int = write_back_concurrency
+        self.stream_chunk_size: int = stream_chunk_size
+        self.stream_lock_timeout: int = stream_lock_timeout
+        self.clock: Callable[[], float] = clock
+        # the key lives longer than the data in backend, so that the stale data can be returned
+        self.backend_expire: Optional[int] = expire + (stale_while_revalidate or 0) if expire else None
+
+        self._refresh_future_dict: Dict[str, asyncio.Future] = {}
+        self._in_flight_future_dict: Dict[str, asyncio.Future] = {}
+        # key -> (expire_at of entry, the number of hits before entry expires)
+        self._access_count_cache: LRUCache[str, Tuple[float, int]] = LRUCache(_REFRESH_AHEAD_KEY_NUM)
+        self._refresh_ahead_future_dict: Dict[str, asyncio.Future] = {}
+        self._write_back_future_set: Set[asyncio.Future] = set()
+        # key -> the args of `_write_back`, the write is started after the response is rendered
+        self._pending_write_back_dict: Dict[str, Tuple[Any, ...]] = {}
+        # key -> [the number of calls, args, kwargs], see `gen_warm_up_manifest`
+        self._manifest_cache: Optional[LRUCache[str, List[Any]]] = (
+            LRUCache(manifest_size * _MANIFEST_CAPACITY_FACTOR) if manifest_size else None
+        )
+
+    async def get_key(self, args: Any, kwargs: Any) -> str:
+        if self.get_key_func is not None:
+            return f"{self.prefix}:{await self.get_key_func(_get_required_request(kwargs))}"
+        if self.vary is not None:
+            return f"{self.prefix}:{_hash(self.vary.gen_key_data(_get_required_request(kwargs)))}"
+        # fixed-length key, no matter how long the param is
+        return f"{self.prefix}:{_hash(_gen_default_key_data(args, kwargs))}"
+
+    async def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        return await _get_entry(self.backend, key, self.local_cache)
+
+    async def _set_dict(self, key: str, value: Dict[str, Any], expire: Optional[int]) -> None:
+        await _set_dict(self.backend, key, value, expire, self.local_cache)
+
+    async def set_entry(self, key: str, entry: Dict[str, Any], expire: Optional[int]) -> None:
+        data: Optional[Dict[str, Any]] = entry["data"]
+        if data is None:
+            # the entry of exception has no body, and the ETag of the previous body is no longer valid
+            if self.enable_etag:
+                await asyncio.gather(self._set_dict(key, entry, expire), self.backend.del_key(key + ":meta"))
+            else:
+                await self._set_dict(key, entry, expire)
+            return
+
+        etag: str = ""
+        if self.enable_etag:
+            etag = _gen_etag(data["body"])
+            data["headers"]["etag"] = etag
+        self.metrics_recorder.observe_payload_size(len(data["body"]))
+        if (
+            self.compress_min_size is not None
+            and len(data["body"]) >= self.compress_min_size
+            and "content-encoding" not in data["headers"]
+        ):
+            _compress_data(data, self.compress_encoding_list)
+
+        if not self.enable_etag:
+            await self._set_dict(key, entry, expire)
+            return
+        # the small meta entry answers the conditional request without reading the body
+        meta_entry: Dict[str, Any] = {
+            "_version": entry["_version"],
+            "etag": etag,
+            "expire_at": entry["expire_at"],
+            "encoding_list": list(data.get("encoded_body_dict", {}).keys()),
+        }
+        await asyncio.gather(self._set_dict(key, entry, expire), self._set_dict(key + ":meta", meta_entry, expire))
+
+    async def get_tag_list(self, kwargs: Dict[str, Any], result: Any) -> List[str]:
+        tag_list: List[str] = list(self.tag_list or [])
+        if self.get_tag_func is not None:
+            tag_iter: Union[Iterable[str], Awaitable[Iterable[str]]] = self.get_tag_func(_get_request(kwargs), result)
+            if asyncio.iscoroutine(tag_iter):
+                tag_iter = await tag_iter  # type: ignore
+            tag_list.extend(tag_iter)  # type: ignore
+        return tag_list
+
+    async def set_tag(self, key: str, tag_list: List[str], expire: Optional[int]) -> None:
+        """record the key in the sorted set of each tag, the score is the expiration timestamp of key,
+        and the expired members are removed when the tag is written"""
+        if not tag_list:
+            return
+        now_timestamp: float = self.clock()
+        await self.backend.pipeline(
+            [
+                (
+                    "eval",
+                    self.LUA_SET_TAG_SCRIPT,
+                    [_gen_tag_key(self.namespace, tag)],
+                    [key, now_timestamp, expire or 0],
+                )
+                for tag in tag_list
+            ]
+        )
+
+    async def not_modified_handle(self, key: str, kwargs: Dict[str, Any]) -> Optional[Response]:
+        """return `304 Not Modified` response if the `If-None-Match` of request matches the ETag of the cache"""
+        request: Optional[Request] = _get_request(kwargs)
+        if request is None:
+            return None
+        if_none_match: Optional[str] = request.headers.get("if-none-match")
+        if not if_none_match:
+            return None
+        meta_entry: Optional[Dict[str, Any]] = await self.get_entry(key + ":meta")
+        if (
+            not meta_entry
+            or _is_expired(meta_entry, self.clock())
+            or not _match_etag(if_none_match, meta_entry["etag"])
+        ):
+            return None
+        headers: Dict[str, str] = {"etag": meta_entry["etag"]}
+        if meta_entry["encoding_list"]:
+            _add_vary_header(headers)
+            encoding: Optional[str] = _select_encoding(
+                request.headers.get("accept-encoding", ""), meta_entry["encoding_list"]
+            )
+            if encoding:
+                headers["etag"] = _gen_variant_etag(meta_entry["etag"], encoding)
+        return await self.cache_response_handle(Response(status_code=304, headers=headers), key, meta_entry)
+
+    def render(self, entry: Dict[str, Any], kwargs: Dict[str, Any]) -> Response:
+        if entry["data"] is None:
+            raise _load_exception(entry["exception"])
+        request: Optional[Request] = _get_request(kwargs)
+        return _render_response(entry["data"], request.headers.get("accept-encoding", "") if request else "")
+
+    def get_expire(self, status_code: int) -> Tuple[Optional[int], Optional[int]]:
+        """return the expiration time of data and the expiration time of entry in backend"""
+        if status_code in self.negative_cache_status_code_set:
+            return self.negative_cache_expire, self.negative_cache_expire
+        return self.expire, self.backend_expire
+
+    async def compute_entry(
+        self, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE
+    ) -> Tuple[Dict[str, Any], Optional[int], List[str]]:
+        """return the entry, the expiration time of entry in backend and the tags of entry"""
+        start_timestamp: float = time.perf_counter()
+        try:
+            result, data = await compute(args, kwargs)
+        except self.negative_cache_exception_tuple as e:
+            entry: Dict[str, Any] = _gen_cache_entry(
+                None, self.negative_cache_expire, time.perf_counter() - start_timestamp, self.clock()
+            )
+            entry["exception"] = _dump_exception(e)
+            return entry, self.negative_cache_expire, []
+
+        expire, backend_expire = self.get_expire(data["status_code"])
+        entry = _gen_cache_entry(data, expire, time.perf_counter() - start_timestamp, self.clock())
+        self.metrics_recorder.observe_compute(entry["delta"])
+        tag_list: List[str] = await self.get_tag_list(kwargs, result) if self.tag_list or self.get_tag_func else []
+        return entry, backend_expire, tag_list
+
+    async def set_entry_and_tag(
+        self, key: str, entry: Dict[str, Any], expire: Optional[int], tag_list: List[str]
+    ) -> None:
+        # record the tags first, so that a stored key can always be found by its tags
+        await self.set_tag(key, tag_list, expire)
+        await self.set_entry(key, entry, expire)
+
+    async def compute_and_set_entry(
+        self, key: str, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE
+    ) -> Dict[str, Any]:
+        entry, expire, tag_list = await self.compute_entry(args, kwargs, compute)
+        try:
+            await self.set_entry_and_tag(key, entry, expire, tag_list)
+        except _BACKEND_ERROR_TUPLE as e:
+            # func has been called, its result is returned without cache
+            logging.exception(f"set cache key:{key} error:{e}")
+        return entry
+
+    async def _write_back(
+        self,
+        lock: "redis_helper.Lock",
+        token: str,
+        key: str,
+        entry: Dict[str, Any],
+        expire: Optional[int],
+        tag_list: List[str],
+    ) -> None:
+        try:
+            await self.set_entry_and_tag(key, entry, expire, tag_list)
+        except Exception as e:
+            logging.exception(f"write back cache key:{key} error:{e}")
+        finally:
+            try:
+                # the token of lock is not in the context of write back task
+                await lock.do_release(token)
+            except Exception as e:
+                logging.exception(f"release the lock of cache key:{key} error:{e}")
+
+    def start_write_back(self, key: str) -> None:
+        """store the pending entry of key in background, and release the lock after it is stored,
+        so that the other processes waiting for the lock read the stored entry instead of recomputing it.
+        It is called after the response is rendered, so that the compression and serialization of cache
+        run after the response is returned"""
+        write_back_args: Optional[Tuple[Any, ...]] = self._pending_write_back_dict.pop(key, None)
+        if write_back_args is None:
+            return
+        future: asyncio.Future = asyncio.ensure_future(self._write_back(*write_back_args))
+        self._write_back_future_set.add(future)
+        future.add_done_callback(self._write_back_future_set.discard)
+
+    async def flush_write_back(self) -> None:
+        """wait for the writes in background, like: before the process exits"""
+        for key in list(self._pending_write_back_dict.keys()):
+            self.start_write_back(key)
+        if self._write_back_future_set:
+            await asyncio.gather(*self._write_back_future_set)
+
+    async def _get_or_compute_entry(
+        self, key: str, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE
+    ) -> Tuple[Dict[str, Any], bool]:
+        """return entry and whether the entry is from cache"""
+        start_timestamp: float = time.perf_counter()
+        lock: "redis_helper.Lock" = self.backend.lock(key + ":lock")
+        with _before_compute_guard():
+            await lock.acquire()
+        self.metrics_recorder.observe_lock_wait(time.perf_counter() - start_timestamp)
+        is_write_back: bool = False
+        try:
+            # get lock
+            with _before_compute_guard():
+                entry: Optional[Dict[str, Any]] = await self.get_entry(key)
+            # check cache response data
+            if entry is not None and not _is_expired(entry, self.clock()):
+                return entry, True
+            # the writes in background are bounded, the exceeded write blocks the response
+            if (
+                not self.write_back
+                or len(self._write_back_future_set) + len(self._pending_write_back_dict) >= self.write_back_concurrency
+            ):
+                return await self.compute_and_set_entry(key, args, kwargs, compute), False
+
+            entry, expire, tag_list = await self.compute_entry(args, kwargs, compute)
+            # the lock is released by the write back task, which is started by `handle`
+            self._pending_write_back_dict[key] = (lock, lock.local.get(), key, entry, expire, tag_list)
+            is_write_back = True
+            return entry, False
+        finally:
+            if not is_write_back:
+                await _release_lock(lock, key)
+
+    async def get_or_compute_entry(
+        self, key: str, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE
+    ) -> Tuple[Dict[str, Any], bool]:
+        """The concurrent misses of the same key in current process share one future,
+        so that only one coroutine contends for the distributed lock and reads the backend"""
+        future: Optional[asyncio.Future] = self._in_flight_future_dict.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._get_or_compute_entry(key, args, kwargs, compute))
+            self._in_flight_future_dict[key] = future
+            future.add_done_callback(lambda f: self._in_flight_future_dict.pop(key, None))
+        try:
+            # the cancellation of one waiter does not cancel the others
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # the waiter can not start the write back after its response is rendered,
+            # so the write back is started when the computation is done, otherwise the lock is never released
+            future.add_done_callback(lambda f: self.start_write_back(key))
+            raise
+
+    async def _refresh(self, key: str, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE) -> None:
+        lock: "redis_helper.Lock" = self.backend.lock(key + ":lock")
+        try:
+            # other process is recomputing
+            if not await lock.acquire(blocking_timeout=0):
+                return
+            try:
+                await self.compute_and_set_entry(key, args, kwargs, compute)
+            finally:
+                await lock.release()
+        except Exception as e:
+            logging.exception(f"refresh cache key:{key} error:{e}")
+
+    def start_refresh(self, key: str, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE) -> None:
+        """recompute the data in background, at most one refresh for each key in current process"""
+        if key in self._refresh_future_dict:
+            return
+        future: asyncio.Future = asyncio.ensure_future(self._refresh(key, args, kwargs, compute))
+        self._refresh_future_dict[key] = future
+        future.add_done_callback(lambda f: self._refresh_future_dict.pop(key, None))
+
+    async def _refresh_ahead(self, key: str, delay: float, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE) -> None:
+        await asyncio.sleep(delay)
+        try:
+            entry: Optional[Dict[str, Any]] = await self.get_entry(key)
+            # other process has recomputed it
+            if entry is not None and entry["expire_at"] - self.clock() > self.refresh_ahead_time:
+                return
+            await self._refresh(key, args, kwargs, compute)
+        except Exception as e:
+            logging.exception(f"refresh ahead cache key:{key} error:{e}")
+
+    def record_access(
+        self, key: str, entry: Dict[str, Any], args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE
+    ) -> None:
+        """count the hits of the key before its entry expires,
+        and the hot key is recomputed in background `refresh_ahead_time` seconds before it expires"""
+        if not self.refresh_ahead_threshold or key in self._refresh_ahead_future_dict:
+            return
+        expire_at, count = self._access_count_cache.get(key, (entry["expire_at"], 0))
+        if expire_at != entry["expire_at"]:
+            # the entry has been recomputed, count again
+            count = 0
+        count += 1
+        if count < self.refresh_ahead_threshold:
+            self._access_count_cache.set(key, (entry["expire_at"], count))
+            return
+
+        self._access_count_cache.delete(key)
+        delay: float = max(entry["expire_at"] - self.refresh_ahead_time - self.clock(), 0)
+        future: asyncio.Future = asyncio.ensure_future(self._refresh_ahead(key, delay, args, kwargs, compute))
+        self._refresh_ahead_future_dict[key] = future
+        future.add_done_callback(lambda f: self._refresh_ahead_future_dict.pop(key, None))
+
+    async def cache_response_handle(self, response: Response, key: str, entry: Dict[str, Any]) -> Response:
+        for after_cache_response, need_ttl in self.after_cache_response_list:
+            if need_ttl:
+                await after_cache_response(response, self.backend, key, _get_ttl(entry, self.clock()))
+            else:
+                await after_cache_response(response, self.backend, key)
+        return response
+
+    def record_call(self, key: str, args: Any, kwargs: Any) -> None:
+        if self._manifest_cache is None:
+            return
+        call_info: Optional[List[Any]] = self._manifest_cache.get(key, None)
+        if call_info is None:
+            self._manifest_cache.set(key, [1, args, kwargs])
+        else:
+            call_info[0] += 1
+
+    def gen_manifest(self) -> List[Tuple[Any, Any]]:
+        """return the (args, kwargs) of the most frequently called keys"""
+        if self._manifest_cache is None or not self.manifest_size:
+            return []
+        call_info_list: List[List[Any]] = sorted(self._manifest_cache.cache.values(), key=lambda x: x[0], reverse=True)
+        return [(args, kwargs) for _, args, kwargs in call_info_list[: self.manifest_size]]
+
+    async def handle(self, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE) -> Response:
+        circuit_breaker = self.backend.circuit_breaker
+        if circuit_breaker is None or not circuit_breaker.is_open:
+            try:
+                return await self.cache_handle(args, kwargs, compute)
+            except _BackendUnavailableError as e:
+                logging.exception(f"get cache of func:{self.func.__name__} error:{e}")
+        # fail open: the backend is unavailable, so func is called without cache
+        _, data = await compute(args, kwargs)
+        return _render_response(data)
+
+    async def cache_handle(self, args: Any, kwargs: Any, compute: _COMPUTE_FUNC_TYPE) -> Response:
+        key: str = await self.get_key(args, kwargs)
+        self.record_call(key, args, kwargs)
+        with _before_compute_guard():
+            if self.enable_etag:
+                response: Optional[Response] = await self.not_modified_handle(key, kwargs)
+                if response is not None:
+                    self.metrics_recorder.inc_hit()
+                    return response
+
+            # get cache response data
+            entry: Optional[Dict[str, Any]] = await self.get_entry(key)
+        if entry is not None:
+            if not _is_expired(entry, self.clock()):
+                if self.early_refresh_beta and _need_early_refresh(entry, self.early_refresh_beta, self.clock()):
+                    self.start_refresh(key, args, kwargs, compute)
+                self.record_access(key, entry, args, kwargs, compute)
+                self.metrics_recorder.inc_hit()
+                return await self.cache_response_handle(self.render(entry, kwargs), key, entry)
+            elif self.stale_while_revalidate:
+                # serve stale data, and only one coroutine recompute it in background
+                self.start_refresh(key, args, kwargs, compute)
+                self.metrics_recorder.inc_stale()
+                return await self.cache_response_handle(self.render(entry, kwargs), key, entry)
+
+        entry, is_cache = await self.get_or_compute_entry(key, args, kwargs, compute)
+        if is_cache:
+            self.metrics_recorder.inc_hit()
+            return await self.cache_response_handle(self.render(entry, kwargs), key, entry)
+        self.metrics_recorder.inc_miss()
+        try:
+            return self.render(entry, kwargs)
+        finally:
+            # the first waiter of the computation starts the write back after its response is rendered
+            self.start_write_back(key)
+
+    def render_stream(self, key: str, entry: Dict[str, Any]) -> Response:
+        data: Dict[str, Any] = entry["data"]
+        return StreamingResponse(
+            _iter_chunk(self.backend, key, data), data["status_code"], data["headers"], data["media_type"]
+        )
+
+    async def replace_chunk_set(self, key: str, chunk_key_list: List[str], chunk_expire: Optional[int]) -> None:
+        """record the chunks of the new stream, so that they are deleted with key,
+        and the chunks of the old stream expire after the grace time, so the replay of the old stream can finish"""
+        chunk_set_key: str = _gen_chunk_set_key(key)
+        old_chunk_key_list: List[str] = await self.backend.execute("SMEMBERS", chunk_set_key)
+        exec_list: List[Tuple] = [("expire", chunk_key, _STREAM_CHUNK_GRACE_TIME) for chunk_key in old_chunk_key_list]
+        exec_list.append(("del", chunk_set_key))
+        if chunk_key_list:
+            exec_list.append(("sadd", chunk_set_key, *chunk_key_list))
+            if chunk_expire:
+                exec_list.append(("expire", chunk_set_key, chunk_expire))
+        await self.backend.pipeline(exec_list)
+
+    def gen_stream_tee_send(self, key: str, tag_list: List[str], start_timestamp: float, send: Send) -> Send:
+        """the message is sent to client first, then the body is stored as chunks of `stream_chunk_size` bytes,
+        and the entry(which has no body) is stored after the last chunk, so the incomplete stream is never read"""
+        stream_id: str = uuid.uuid4().hex
+        data: Dict[str, Any] = {}
+        buffer: bytearray = bytearray()
+        chunk_key_list: List[str] = []
+        body_size: int = 0
+        can_cache: bool = True
+
+        async def write_chunk(chunk: bytes) -> None:
+            chunk_key: str = _gen_chunk_key(key, stream_id, len(chunk_key_list))
+            # the chunks of the incomplete stream expire by themselves
+            await self.backend.execute(
+                "SET", chunk_key, chunk, "EX", self.stream_lock_timeout + _STREAM_CHUNK_GRACE_TIME
+            )
+            chunk_key_list.append(chunk_key)
+
+        async def store(message: Message) -> None:
+            nonlocal body_size, can_cache
+            if message["type"] == "http.response.start":
+                response_data: Optional[Dict[str, Any]] = _gen_asgi_response_data(message)
+                if response_data is None:
+                    can_cache = False
+                    return
+                data.update(response_data)
+                data["expire"], data["backend_expire"] = self.get_expire(data["status_code"])
+            elif message["type"] == "http.response.body" and data:
+                body: bytes = message.get("body", b"")
+                body_size += len(body)
+                buffer.extend(body)
+                while len(buffer) >= self.stream_chunk_size:
+                    await write_chunk(bytes(buffer[: self.stream_chunk_size]))
+                    del buffer[: self.stream_chunk_size]
+                if message.get("more_body", False):
+                    return
+
+                can_cache = False
+                if buffer:
+                    await write_chunk(bytes(buffer))
+                expire: Optional[int] = data.pop("expire")
+                backend_expire: Optional[int] = data.pop("backend_expire")
+                data["headers"]["content-length"] = str(body_size)
+                data["stream_id"] = stream_id
+                data["chunk_num"] = len(chunk_key_list)
+                entry: Dict[str, Any] = _gen_cache_entry(
+                    data, expire, time.perf_counter() - start_timestamp, self.clock()
+                )
+                self.metrics_recorder.observe_compute(entry["delta"])
+                self.metrics_recorder.observe_payload_size(body_size)
+                chunk_expire: Optional[int] = backend_expire + _STREAM_CHUNK_GRACE_TIME if backend_expire else None
+                if chunk_key_list:
+                    # the chunks live as long as the entry
+                    result_list: Optional[list] = await self.backend.pipeline(
+                        [
+                            ("expire", chunk_key, chunk_expire) if chunk_expire else ("persist", chunk_key)
+                            for chunk_key in chunk_key_list
+                        ]
+                    )
+                    if not all(result_list or []):
+                        raise RuntimeError(f"The chunks of cache key:{key} expired before the stream finished")
+                await self.set_tag(key, tag_list, backend_expire)
+                await self._set_dict(key, entry, backend_expire)
+                await self.replace_chunk_set(key, chunk_key_list, chunk_expire)
+
+        async def tee_send(message: Message) -> None:
+            nonlocal can_cache
+            await send(message)
+            if not can_cache:
+                return
+            try:
+                await store(message)
+            except Exception as e:
+                # the error of storing does not break the response
+                can_cache = False
+                logging.exception(f"store the stream of cache key:{key} error:{e}")
+
+        return tee_send
+
+    async def stream_handle(self, args: Any, kwargs: Any) -> Response:
+        circuit_breaker = self.backend.circuit_breaker
+        if circuit_breaker is None or not circuit_breaker.is_open:
+            try:
+                return await self.cache_stream_handle(args, kwargs)
+            except _BackendUnavailableError as e:
+                logging.exception(f"get cache of func:{self.func.__name__} error:{e}")
+        return await self.func(*args, **kwargs)
+
+    async def cache_stream_handle(self, args: Any, kwargs: Any) -> Response:
+        key: str = await self.get_key(args, kwargs)
+        self.record_call(key, args, kwargs)
+        with _before_compute_guard():
+            entry: Optional[Dict[str, Any]] = await self.get_entry(key)
+        if entry is not None and not _is_expired(entry, self.clock()):
+            self.metrics_recorder.inc_hit()
+            if entry["data"] is None:
+                raise _load_exception(entry["exception"])
+            return await self.cache_response_handle(self.render_stream(key, entry), key, entry)
+
+        self.metrics_recorder.inc_miss()
+        lock: "redis_helper.Lock" = self.backend.lock(key + ":lock", timeout=self.stream_lock_timeout)
+        # the stream is stored while it is sent, so the other requests of the key do not wait for it(and do not store)
+        with _before_compute_guard():
+            is_lock: bool = await lock.acquire(blocking_timeout=0)
+        if not is_lock:
+            return await self.func(*args, **kwargs)
+        start_timestamp: float = time.perf_counter()
+        try:
+            response: Response = await self.func(*args, **kwargs)
+            tag_list: List[str] = (
+                await self.get_tag_list(kwargs, response) if self.tag_list or self.get_tag_func else []
+            )
+        except self.negative_cache_exception_tuple as e:
+            entry = _gen_cache_entry(
+                None, self.negative_cache_expire, time.perf_counter() - start_timestamp, self.clock()
+            )
+            entry["exception"] = _dump_exception(e)
+            try:
+                await self._set_dict(key, entry, self.negative_cache_expire)
+            except _BACKEND_ERROR_TUPLE as set_e:
+                logging.exception(f"set cache key:{key} error:{set_e}")
+            finally:
+                await _release_lock(lock, key)
+            raise e
+        except BaseException:
+            await _release_lock(lock, key)
+            raise
+        # the lock is released after the response is sent
+        return _TeeStreamResponse(
+            response,
+            lambda send: self.gen_stream_tee_send(key, tag_list, start_timestamp, send),
+            lambda: _release_lock(lock, key),
+        )
+
+    async def compute_dict(self, args: Any, kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+        result: Dict[str, Any] = await self.func(*args, **kwargs)
+        start_timestamp: float = time.perf_counter()
+        response: Response = self.json_response(result)
+        self.metrics_recorder.observe_serialize(time.perf_counter() - start_timestamp)
+        return result, _gen_response_data(response)
+
+    def gen_compute_serialize(self, serializer: Callable[[Any], bytes]) -> _COMPUTE_FUNC_TYPE:
+        async def compute_serialize(args: Any, kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+            result: Any = await self.func(*args, **kwargs)
+            start_timestamp: float = time.perf_counter()
+            body: bytes = serializer(result)
+            self.metrics_recorder.observe_serialize(time.perf_counter() - start_timestamp)
+            return result, _gen_response_data(Response(body, media_type=self.json_response.media_type))
+
+        return compute_serialize
+
+    async def compute_response(self, args: Any, kwargs: Any) -> Tuple[Any, Dict[str, Any]]:
+        result: Response = await self.func(*args, **kwargs)
+        return result, _gen_response_data(result)
+
+
 def cache(
     backend: "redis_helper.RedisHelper",
     expire: Optional[int] = None,
@@ -29,7 +1155,28 @@ def cache(
     alias: Optional[str] = None,
     json_response: Type[JSONResponse] = JSONResponse,
     get_key_func: Optional[Callable[[Request], Awaitable[str]]] = None,
-    after_cache_response_list: Optional[List[Callable[[Response, "redis_helper.RedisHelper", str], Awaitable]]] = None,
+    vary: Optional[Vary] = None,
+    after_cache_response_list: Optional[List[_AFTER_CACHE_RESPONSE_FUNC_TYPE]] = None,
+    local_cache: Optional[TTLLRUCache] = None,
+    stale_while_revalidate: Optional[int] = None,
+    early_refresh_beta: Optional[float] = None,
+    enable_etag: bool = False,
+    compress_min_size: Optional[int] = None,
+    compress_encoding_list: Optional[Sequence[str]] = None,
+    tag_list: Optional[List[str]] = None,
+    get_tag_func: Optional[_TAG_FUNC_TYPE] = None,
+    negative_cache_exception_list: Optional[List[Type[Exception]]] = None,
+    negative_cache_status_code_list: Optional[List[int]] = None,
+    negative_cache_expire: int = 5,
+    refresh_ahead_threshold: Optional[int] = None,
+    refresh_ahead_time: float = 1,
+    manifest_size: Optional[int] = None,
+    metrics: Optional[BaseCacheMetrics] = None,
+    write_back: bool = False,
+    write_back_concurrency: int = 64,
+    stream_chunk_size: int = 64 * 1024,
+    stream_lock_timeout: int = 10 * 60,
+    clock: Callable[[], float] = time.time,
 ) -> Callable:
     """
     :param backend: now only support `RedisHelper`
@@ -37,94 +1184,145 @@ def cache(
     :param namespace: key namespace
     :param alias: func alias name
     :param json_response: response like `JSONResponse` or `UJSONResponse`
-    :param get_key_func:
-    :param after_cache_response_list: cache response data handle
+    :param get_key_func: generate the key by request
+    :param vary: If `get_key_func` is None, the key is generated by the declared path params, query params and headers.
+        By default, the key is the hash of func params(the request is replaced with its path and query params),
+        so the requests with different headers or cookies(like the auth of user) share one cache,
+        the func that reads them from request needs `vary` or `get_key_func`
+    :param after_cache_response_list: cache response data handle, called with (response, backend, key),
+        or (response, backend, key, ttl) if it has 4 params(the ttl of data is read from the cache entry,
+        no extra request to backend. -1 if the data has no expire, 0 if the data is stale)
+    :param local_cache: in-process cache in front of backend(like: `TTLLRUCache(1024, 1)`),
+        the local item never outlives the key in backend, and it is dropped when any process recomputes the key
+    :param stale_while_revalidate: seconds that the expired data can still be returned,
+        while it is recomputed by only one background task(the key lives `expire + stale_while_revalidate` in backend)
+    :param early_refresh_beta: If set, the data may be recomputed in background before it expires(XFetch),
+        the probability grows with the compute time of data and the beta(`1.0` is a good default),
+        beta > 1.0 favors earlier recomputation
+    :param enable_etag: If True, the strong ETag of body is computed when the cache is stored,
+        and the request whose `If-None-Match` matches it gets `304 Not Modified`(only a small meta key is read)
+    :param compress_min_size: If set, the body whose size is not less than it is stored as compressed variants,
+        and the hit is served by the variant that matches `Accept-Encoding`, without compression
+    :param compress_encoding_list: the encodings of compressed variants in preference order,
+        default: all available encodings of `br`(need brotli), `zstd`(need zstandard) and `gzip`
+    :param tag_list: tags of cache, the caches can be deleted by `invalidate_tags(backend, *tag_list)`
+    :param get_tag_func: generate the tags by request(None if func has no request param) and the result of func.
+        The tag is stored as a sorted set, which lives as long as the longest-lived cache written to it
+    :param negative_cache_exception_list: the exceptions raised by func are cached(`negative_cache_expire` seconds),
+        and the hit raises the exception rebuilt from its class, args and attributes(which must be picklable)
+    :param negative_cache_status_code_list: the response of these status codes is cached `negative_cache_expire` seconds
+    :param negative_cache_expire: cache expiration time of negative cache
+    :param refresh_ahead_threshold: If set, the key which is hit not less than it times(in current process)
+        before its data expires is recomputed in background `refresh_ahead_time` seconds before expiry,
+        only the process which gets the lock recomputes it, so the hot key never expires and the cold key still expires
+    :param refresh_ahead_time: seconds before expiry that the hot key is recomputed
+    :param manifest_size: If set, the args of the most frequently called keys(in current process) are recorded,
+        and they can be read by `gen_warm_up_manifest` to warm up the cache
+    :param metrics: record the hits, misses, stale serves, lock wait time, compute time, serialization time
+        and payload size of func, like: `PrometheusCacheMetrics()`
+    :param write_back: If True, the computed response is returned before it is stored,
+        and it is stored(the compression and serialization of cache included) in background after the response
+        is rendered, which still holds the lock of key until it is stored, the error of storing is logged.
+        Call `flush_write_back(func)` before the process exits to wait for the pending writes
+    :param write_back_concurrency: the max number of background writes of func,
+        the write is not in background when it is exceeded
+    :param stream_chunk_size: the max size of each chunk that the body of streaming response is stored as
+    :param stream_lock_timeout: the lock of key is held until the streaming response is sent,
+        it expires after the seconds, so the stream which takes longer may be stored by other process at the same time
+    :param clock: the clock of the logical expiration of data(include stale-while-revalidate and refresh),
+        like `fast_tools.base.fake_redis.VirtualClock` which is shared with `FakeRedis` in tests
+    Note: The background recomputation calls func with the args of the request which triggers it.
+        The result of func whose return annotation is `BaseModel`, dataclass or `List[...]`(need pydantic)
+        is serialized to JSON by the serializer built when decorating, and the `Response` is returned,
+        so the hit skips the validation of FastAPI `response_model`.
+        If the circuit breaker of backend is open(see `RedisHelper`), func is called and its response is returned
+        without reading or storing the cache.
+        The `StreamingResponse` or `FileResponse` is sent to client while its body is stored as chunks(the ETag and
+        compression of cache are not applied), and the hit is replayed chunk by chunk, the request that misses
+        while the key is being stored calls func without waiting
     """
+    if (stale_while_revalidate or early_refresh_beta or refresh_ahead_threshold) and not expire:
+        raise ValueError(
+            "`stale_while_revalidate`, `early_refresh_beta` and `refresh_ahead_threshold` require `expire`"
+        )
+    if compress_encoding_list:
+        for encoding in compress_encoding_list:
+            if encoding not in compress_func_dict:
+                raise ValueError(f"Not support encoding:{encoding}, support:{list(compress_func_dict.keys())}")
+    if local_cache is not None:
+        backend.add_local_cache(local_cache)
 
     def wrapper(func: Callable) -> Callable:
-        prefix: str = f"{namespace}:{alias or func.__name__}"
-
-        async def _get_key(args: Any, kwargs: Any) -> str:
-            if get_key_func:
-                for arg in kwargs.values():
-                    if isinstance(arg, Request):
-                        request: Request = arg
-                        break
-                else:
-                    raise ValueError("Can not found request param")
-                key: str = f"{prefix}:{await get_key_func(request)}"
-            else:
-                key = f"{prefix}:{args}:{kwargs}"
-            return key
-
-        async def _cache_response_handle(response: Response, key: str) -> Response:
-            if after_cache_response_list:
-                for after_cache_response in after_cache_response_list:
-                    await after_cache_response(response, backend, key)
-            return response
+        cache_handler: _CacheHandler = _CacheHandler(
+            func,
+            backend,
+            f"{namespace}:{alias or func.__name__}",
+            expire,
+            json_response,
+            get_key_func,
+            vary,
+            after_cache_response_list,
+            local_cache,
+            stale_while_revalidate,
+            early_refresh_beta,
+            enable_etag,
+            compress_min_size,
+            compress_encoding_list,
+            namespace,
+            tag_list,
+            get_tag_func,
+            negative_cache_exception_list,
+            negative_cache_status_code_list,
+            negative_cache_expire,
+            refresh_ahead_threshold,
+            refresh_ahead_time,
+            manifest_size,
+            metrics.bind(alias or func.__name__) if metrics is not None else CacheMetricsRecorder(),
+            write_back,
+            write_back_concurrency,
+            stream_chunk_size,
+            stream_lock_timeout,
+            clock,
+        )
 
         @wraps(func)
         async def return_dict_handle(*args: Any, **kwargs: Any) -> Response:
-            key: str = await _get_key(args, kwargs)
+            return await cache_handler.handle(args, kwargs, cache_handler.compute_dict)
 
-            # get cache response data
-            ret: Dict[str, Any] = await backend.get_dict(key)
-            if ret:
-                return await _cache_response_handle(json_response(ret), key)
-
-            async with backend.lock(key + ":lock"):
-                # get lock
-                ret = await backend.get_dict(key)
-                # check cache response data
-                if ret:
-                    return await _cache_response_handle(json_response(ret), key)
-                else:
-                    ret = await func(*args, **kwargs)
-                    await backend.set_dict(key, ret, expire)
-            return json_response(ret)
+        @wraps(func)
+        async def return_response_handle(*args: Any, **kwargs: Any) -> Response:
+            return await cache_handler.handle(args, kwargs, cache_handler.compute_response)
 
         @wraps(func)
-        async def return_response_handle(*args: Any, **kwargs: Any) -> Callable:
-            key: str = await _get_key(args, kwargs)
-            ret: Dict[str, Any] = await backend.get_dict(key)
-            if ret:
-                return await _cache_response_handle(return_annotation(**ret), key)
-
-            async with backend.lock(key + ":lock"):
-                ret = await backend.get_dict(key)
-                if ret:
-                    return await _cache_response_handle(return_annotation(**ret), key)
-                else:
-                    resp: Response = await func(*args, **kwargs)
-                    headers: dict = dict(resp.headers)
-                    del headers["content-length"]
-                    content: str = resp.body.decode()
-                    try:
-                        content = json.loads(content)
-                    except json.JSONDecodeError as e:
-                        logging.exception(e)
-
-                    await backend.set_dict(
-                        key,
-                        {
-                            "content": content,
-                            "status_code": resp.status_code,
-                            "headers": dict(headers),
-                            "media_type": resp.media_type,
-                        },
-                        expire,
-                    )
-            return resp
+        async def return_stream_handle(*args: Any, **kwargs: Any) -> Response:
+            return await cache_handler.stream_handle(args, kwargs)
 
         @wraps(func)
         async def return_normal_handle(*args: Any, **kwargs: Any) -> Any:
             return await func(*args, **kwargs)
 
         sig: inspect.Signature = inspect.signature(func)
+        if get_key_func is None and vary is None and _has_request_param(sig):
+            logging.warning(
+                f"func name:{func.__name__} has request param, but the key only contains its path and query params,"
+                f" the requests with different headers or cookies share one cache."
+                f" Please use `vary` or `get_key_func` if func reads them"
+            )
         return_annotation = sig.return_annotation
+        serializer: Optional[Callable[[Any], bytes]] = _gen_serializer(return_annotation, json_response)
         if return_annotation is dict or _check_typing_type(return_annotation, "dict"):
             handle_func: Callable = return_dict_handle
-        elif issubclass(return_annotation, Response):
+        elif serializer is not None:
+            compute_serialize: _COMPUTE_FUNC_TYPE = cache_handler.gen_compute_serialize(serializer)
+
+            @wraps(func)
+            async def return_serialize_handle(*args: Any, **kwargs: Any) -> Response:
+                return await cache_handler.handle(args, kwargs, compute_serialize)
+
+            handle_func = return_serialize_handle
+        elif inspect.isclass(return_annotation) and issubclass(return_annotation, (StreamingResponse, FileResponse)):
+            handle_func = return_stream_handle
+        elif inspect.isclass(return_annotation) and issubclass(return_annotation, Response):
             handle_func = return_response_handle
         else:
             if return_annotation is sig.empty:
@@ -133,13 +1331,282 @@ def cache(
             logging.warning(
                 f"func name:{func.__name__} return annotation:{return_annotation}."
                 f" Can not use cache."
-                f" Please check return annotation in ({dict}, {Dict}, {Response})"
+                f" Please check return annotation in ({dict}, {Dict}, {Response}, BaseModel, dataclass, {List})"
             )
             return return_normal_handle
         logging.debug(
             f"func name:{func.__name__} return annotation:{return_annotation}."
-            f" load cache handle {return_dict_handle} success"
+            f" load cache handle {handle_func} success"
         )
+        setattr(handle_func, _CACHE_HANDLER_ATTR, cache_handler)
         return handle_func
 
     return wrapper
+
+
+# the attribute of the func decorated by `cache`
+_CACHE_HANDLER_ATTR: str = "_fast_tools_cache_handler"
+_WARM_UP_CALL_TYPE = Tuple[Callable, Sequence[Any], Dict[str, Any]]
+
+
+async def flush_write_back(*func_list: Callable) -> None:
+    """wait for the background writes(see `write_back` of `cache`) of the funcs decorated by `cache`,
+    call it before the process exits, otherwise the pending writes are lost"""
+    await asyncio.gather(
+        *[
+            getattr(func, _CACHE_HANDLER_ATTR).flush_write_back()
+            for func in func_list
+            if hasattr(func, _CACHE_HANDLER_ATTR)
+        ]
+    )
+
+
+def gen_warm_up_request(
+    path: str,
+    query_params: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    path_params: Optional[Dict[str, Any]] = None,
+) -> Request:
+    """gen the `GET` request for the func which has the request param, see `warm_up`"""
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "root_path": "",
+            "query_string": urlencode(query_params or {}).encode(),
+            "headers": [
+                (key.lower().encode("latin-1"), value.encode("latin-1")) for key, value in (headers or {}).items()
+            ],
+            "path_params": path_params or {},
+        }
+    )
+
+
+def gen_warm_up_manifest(*func_list: Callable) -> List[_WARM_UP_CALL_TYPE]:
+    """return the calls of the most frequently called keys of the funcs decorated by `cache(manifest_size=...)`,
+    it can be used by `warm_up` after the backend is flushed"""
+    call_list: List[_WARM_UP_CALL_TYPE] = []
+    for func in func_list:
+        cache_handler: Optional[_CacheHandler] = getattr(func, _CACHE_HANDLER_ATTR, None)
+        if cache_handler is None:
+            raise ValueError(f"func:{func} is not decorated by cache")
+        call_list.extend([(func, args, kwargs) for args, kwargs in cache_handler.gen_manifest()])
+    return call_list
+
+
+async def warm_up(call_list: Iterable[_WARM_UP_CALL_TYPE], concurrency: int = 10, rate: Optional[float] = None) -> int:
+    """Call the funcs decorated by `cache` to store their caches(the cache that has not expired is not recomputed),
+    return the number of successful calls
+
+    :param call_list: (func decorated by `cache`, args, kwargs),
+        the request param(must be passed by kwargs like FastAPI) can be generated by `gen_warm_up_request`
+    :param concurrency: the max number of calls at the same time
+    :param rate: If set, at most `rate` calls are started per second, so that the warm-up can run in background
+        without flooding the database, like: `asyncio.ensure_future(warm_up(call_list, rate=10))`
+    """
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+    success_list: List[bool] = []
+
+    async def _call(func: Callable, args: Sequence[Any], kwargs: Dict[str, Any]) -> None:
+        try:
+            await func(*args, **kwargs)
+            success_list.append(True)
+        except Exception as e:
+            logging.exception(f"warm up func:{func.__name__} error:{e}")
+        finally:
+            semaphore.release()
+
+    future_list: List[asyncio.Future] = []
+    for func, args, kwargs in call_list:
+        await semaphore.acquire()
+        future_list.append(asyncio.ensure_future(_call(func, args, kwargs)))
+        if rate:
+            await asyncio.sleep(1 / rate)
+    await asyncio.gather(*future_list)
+    return len(success_list)
+
+
+class RouteCacheRule(object):
+    """The cache rule of one route template, see `CacheMiddleware`"""
+
+    def __init__(
+        self,
+        expire: Optional[int] = None,
+        vary: Optional[Vary] = None,
+        status_code_list: Optional[List[int]] = None,
+        max_body_size: Optional[int] = 1024 * 1024,
+    ):
+        """
+        :param expire: cache expiration time
+        :param vary: the key is generated by the declared path params, query params and headers.
+            By default, the key is the hash of the path and query params.
+            The request with `Authorization` header and the response with `Vary` header are not cached,
+            unless the headers they name are declared in `vary.header_list`
+        :param status_code_list: the response of these status codes is cached, default: [200]
+        :param max_body_size: the response whose body is larger than it is not cached(the body is collected in memory
+            until it is stored), None means no limit
+        """
+        self.expire: Optional[int] = expire
+        self.vary: Optional[Vary] = vary
+        self.status_code_set: Set[int] = set(status_code_list or [200])
+        self.max_body_size: Optional[int] = max_body_size
+        self.vary_header_set: Set[str] = set(vary.header_list) if vary is not None else set()
+
+    def is_vary_in_key(self, vary: str) -> bool:
+        """whether all the headers named by the `Vary` header are in the key"""
+        return all(
+            not header or (header != "*" and header in self.vary_header_set)
+            for header in (item.strip().lower() for item in vary.split(","))
+        )
+
+
+def _gen_asgi_response_data(message: Message) -> Optional[Dict[str, Any]]:
+    """gen the response data(see `_gen_response_data`) by the `http.response.start` message,
+    return None if the response can not be cached"""
+    headers: Dict[str, str] = {}
+    for raw_name, raw_value in message.get("headers", []):
+        name: str = raw_name.decode("latin-1").lower()
+        # the repeated header can not be stored by dict, and the cookie belongs to one user
+        if name in headers or name == "set-cookie":
+            return None
+        headers[name] = raw_value.decode("latin-1")
+    cache_control: str = headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "private" in cache_control:
+        return None
+    headers.pop("content-length", None)
+    return {"body": b"", "status_code": message["status"], "headers": headers, "media_type": None}
+
+
+class CacheMiddleware(object):
+    """Cache the complete response of route at the ASGI `send` level, and the hit is served without entering app,
+    so the route is cached without touching its handler(the dependencies of FastAPI are also skipped).
+
+    The route is searched by `route_trie`(need `route_trie.insert_by_app(app)` when app startup),
+    and only the `GET` request of the route template in `rule_dict` is cached.
+    The body chunks of response(include `StreamingResponse`) are sent to client while they are collected,
+    and the cache is stored after the last chunk is sent.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        backend: "redis_helper.RedisHelper",
+        route_trie: RouteTrie,
+        rule_dict: Dict[str, RouteCacheRule],
+        namespace: str = NAMESPACE,
+        local_cache: Optional[TTLLRUCache] = None,
+    ) -> None:
+        """
+        :param backend: now only support `RedisHelper`
+        :param route_trie: the `RouteTrie` of app
+        :param rule_dict: route template(like: `/user/{user_id}`) -> cache rule
+        :param namespace: key namespace
+        :param local_cache: in-process cache in front of backend, see `cache`
+        """
+        self.app: ASGIApp = app
+        self._backend: "redis_helper.RedisHelper" = backend
+        self._route_trie: RouteTrie = route_trie
+        self._rule_dict: Dict[str, RouteCacheRule] = rule_dict
+        self._prefix: str = f"{namespace}:route_cache"
+        self._local_cache: Optional[TTLLRUCache] = local_cache
+        if local_cache is not None:
+            backend.add_local_cache(local_cache)
+
+    def search_route(self, scope: Scope) -> Optional[Tuple[Route, Scope]]:
+        """return the route which matches the request and its child scope(include path params)"""
+        route: Optional[Route] = self._route_trie.search_by_scope(scope["path"], scope)
+        if route is None:
+            return None
+        match, child_scope = route.matches(scope)
+        if match != Match.FULL:
+            return None
+        return route, child_scope
+
+    def get_key(self, route: Route, rule: RouteCacheRule, scope: Scope, child_scope: Scope) -> str:
+        request: Request = Request({**scope, **child_scope})
+        if rule.vary is not None:
+            key_data: str = rule.vary.gen_key_data(request)
+        else:
+            key_data = _gen_request_key_data(request)
+        return f"{self._prefix}:{route.path}:{_hash(key_data)}"
+
+    def gen_tee_send(self, key: str, rule: RouteCacheRule, send: Send) -> Send:
+        """the message is sent to client first, then it is collected, and the entry is stored with the last chunk"""
+        start_timestamp: float = time.perf_counter()
+        data_list: List[Dict[str, Any]] = []
+        body_list: List[bytes] = []
+        body_size: int = 0
+        can_cache: bool = True
+
+        async def tee_send(message: Message) -> None:
+            nonlocal body_size, can_cache
+            await send(message)
+            if not can_cache:
+                return
+            if message["type"] == "http.response.start":
+                data: Optional[Dict[str, Any]] = _gen_asgi_response_data(message)
+                if (
+                    data is None
+                    or data["status_code"] not in rule.status_code_set
+                    # the response varies on the request header which is not in the key
+                    or not rule.is_vary_in_key(data["headers"].get("vary", ""))
+                ):
+                    can_cache = False
+                    return
+                data_list.append(data)
+            elif message["type"] == "http.response.body" and data_list:
+                body: bytes = message.get("body", b"")
+                body_size += len(body)
+                if rule.max_body_size is not None and body_size > rule.max_body_size:
+                    can_cache = False
+                    body_list.clear()
+                    return
+                body_list.append(body)
+                if not message.get("more_body", False):
+                    can_cache = False
+                    data_list[0]["body"] = b"".join(body_list)
+                    entry: Dict[str, Any] = _gen_cache_entry(
+                        data_list[0], rule.expire, time.perf_counter() - start_timestamp, time.time()
+                    )
+                    try:
+                        await _set_dict(self._backend, key, entry, rule.expire, self._local_cache)
+                    except Exception as e:
+                        # the response has been sent, the error of storing does not break it
+                        logging.exception(f"store the route cache key:{key} error:{e}")
+
+        return tee_send
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        search_result: Optional[Tuple[Route, Scope]] = self.search_route(scope)
+        rule: Optional[RouteCacheRule] = self._rule_dict.get(search_result[0].path) if search_result else None
+        if search_result is None or rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers: Headers = Headers(scope=scope)
+        # the response of the authorized request belongs to one user
+        if "authorization" in request_headers and not rule.is_vary_in_key("authorization"):
+            await self.app(scope, receive, send)
+            return
+        circuit_breaker = self._backend.circuit_breaker
+        if circuit_breaker is not None and circuit_breaker.is_open:
+            await self.app(scope, receive, send)
+            return
+        key: str = self.get_key(search_result[0], rule, scope, search_result[1])
+        try:
+            entry: Optional[Dict[str, Any]] = await _get_entry(self._backend, key, self._local_cache)
+        except Exception as e:
+            # the backend is unavailable, the request is handled by app without cache
+            logging.exception(f"get the route cache key:{key} error:{e}")
+            await self.app(scope, receive, send)
+            return
+        if entry is not None and not _is_expired(entry, time.time()):
+            response: Response = _render_response(entry["data"], request_headers.get("accept-encoding", ""))
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, self.gen_tee_send(key, rule, send))
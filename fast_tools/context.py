@@ -1,8 +1,10 @@
+import asyncio
 import logging
 import traceback
 from contextvars import ContextVar, Token
 from dataclasses import MISSING
-from typing import Any, Callable, Coroutine, Dict, List, NoReturn, Optional, Set, Type, get_type_hints
+from functools import wraps
+from typing import Any, Callable, Coroutine, Dict, Hashable, List, NoReturn, Optional, Set, Type, get_type_hints
 
 from starlette.datastructures import Headers
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
@@ -14,7 +16,10 @@ from fast_tools.base.utils import NAMESPACE
 _CAN_JSON_TYPE_SET: Set[type] = {bool, dict, float, int, list, str, tuple, type(None)}
 _CONTEXT_KEY_SET: Set[str] = set()
 _CONTEXT_DICT_TYPE = Dict[str, Any]
-_FAST_TOOLS_CONTEXT: ContextVar[Dict[str, Any]] = ContextVar(f"{NAMESPACE}_context", default={})
+# the context out of request, it is shared by all callers
+_DEFAULT_CONTEXT: Dict[str, Any] = {}
+_FAST_TOOLS_CONTEXT: ContextVar[Dict[str, Any]] = ContextVar(f"{NAMESPACE}_context", default=_DEFAULT_CONTEXT)
+_MEMOIZE_CONTEXT_KEY: str = f"{NAMESPACE}:request_memoize"
 _TOKEN_TEMP: List[Optional[Token]] = [None]
 
 
@@ -156,3 +161,61 @@ class ContextMiddleware(BaseHTTPMiddleware):
                 return response
             finally:
                 await self._safe_context_life_handle(self.context_model.before_reset_context(request, response))
+
+
+def _get_memoize_dict() -> Optional[Dict[Hashable, Any]]:
+    ctx_dict: _CONTEXT_DICT_TYPE = _FAST_TOOLS_CONTEXT.get()
+    if ctx_dict is _DEFAULT_CONTEXT:
+        return None
+    return ctx_dict.setdefault(_MEMOIZE_CONTEXT_KEY, {})
+
+
+def request_memoize(func: Callable) -> Callable:
+    """Memoize the result of func(async or sync) for the lifetime of current request context
+    (created by `ContextMiddleware` or `WithContext`), and the context is reset with the memoized results.
+    The concurrent calls of async func with the same args share one call, and the failed call is not memoized.
+    If the args are unhashable or there is no request context, func is called directly"""
+
+    def _gen_key(args: Any, kwargs: Dict[str, Any]) -> Optional[Hashable]:
+        key: Hashable = (func, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            memoize_dict: Optional[Dict[Hashable, Any]] = _get_memoize_dict()
+            key: Optional[Hashable] = _gen_key(args, kwargs) if memoize_dict is not None else None
+            if memoize_dict is None or key is None:
+                return await func(*args, **kwargs)
+
+            future: Optional[asyncio.Future] = memoize_dict.get(key)
+            if future is None:
+                future = asyncio.ensure_future(func(*args, **kwargs))
+                memoize_dict[key] = future
+
+                def _pop_failed_call(f: asyncio.Future) -> None:
+                    if f.cancelled() or f.exception() is not None:
+                        memoize_dict.pop(key, None)
+
+                future.add_done_callback(_pop_failed_call)
+            # the cancellation of one caller does not cancel the others
+            return await asyncio.shield(future)
+
+        return async_wrapper
+
+    @wraps(func)
+    def sync_wrapper(*args: Any, **kwargs: Any) -> Any:
+        memoize_dict: Optional[Dict[Hashable, Any]] = _get_memoize_dict()
+        key: Optional[Hashable] = _gen_key(args, kwargs) if memoize_dict is not None else None
+        if memoize_dict is None or key is None:
+            return func(*args, **kwargs)
+        if key not in memoize_dict:
+            memoize_dict[key] = func(*args, **kwargs)
+        return memoize_dict[key]
+
+    return sync_wrapper
@@ -1,5 +1,6 @@
+from .cache_metrics import PrometheusCacheMetrics
 from .handle import get_metrics
 from .middleware import PrometheusMiddleware
 from .util import init_registry
 
-__all__ = ["get_metrics", "PrometheusMiddleware", "init_registry"]
+__all__ = ["get_metrics", "PrometheusCacheMetrics", "PrometheusMiddleware", "init_registry"]
@@ -0,0 +1,89 @@
+from prometheus_client import Counter, Histogram  # type: ignore
+
+from fast_tools.base import NAMESPACE
+from fast_tools.cache import BaseCacheMetrics, CacheMetricsRecorder
+
+from . import util
+
+__all__ = ["PrometheusCacheMetrics"]
+
+_SIZE_BUCKETS: tuple = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, float("inf"))
+
+
+class _PrometheusCacheMetricsRecorder(CacheMetricsRecorder):
+    def __init__(self, metrics: "PrometheusCacheMetrics", alias: str) -> None:
+        label_list: list = [metrics.app_name, alias]
+        self._hit_counter: "Counter" = metrics.request_count.labels(*label_list, "hit")
+        self._miss_counter: "Counter" = metrics.request_count.labels(*label_list, "miss")
+        self._stale_counter: "Counter" = metrics.request_count.labels(*label_list, "stale")
+        self._lock_wait_histogram: "Histogram" = metrics.lock_wait_time.labels(*label_list)
+        self._compute_histogram: "Histogram" = metrics.compute_time.labels(*label_list)
+        self._serialize_histogram: "Histogram" = metrics.serialize_time.labels(*label_list)
+        self._payload_size_histogram: "Histogram" = metrics.payload_size.labels(*label_list)
+
+    def inc_hit(self) -> None:
+        self._hit_counter.inc()
+
+    def inc_miss(self) -> None:
+        self._miss_counter.inc()
+
+    def inc_stale(self) -> None:
+        self._stale_counter.inc()
+
+    def observe_lock_wait(self, seconds: float) -> None:
+        self._lock_wait_histogram.observe(seconds)
+
+    def observe_compute(self, seconds: float) -> None:
+        self._compute_histogram.observe(seconds)
+
+    def observe_serialize(self, seconds: float) -> None:
+        self._serialize_histogram.observe(seconds)
+
+    def observe_payload_size(self, size: int) -> None:
+        self._payload_size_histogram.observe(size)
+
+
+class PrometheusCacheMetrics(BaseCacheMetrics):
+    """The metrics of `cache`, they are registered to the registry of `fast_tools.exporter`(see `init_registry`),
+    and the labels of each func are bound when decorating"""
+
+    def __init__(
+        self,
+        app_name: str = NAMESPACE.replace("-", "_"),
+        prefix: str = NAMESPACE.replace("-", "_"),
+    ) -> None:
+        self.app_name: str = app_name
+        self.request_count: "Counter" = Counter(
+            f"{prefix}_cache_requests_total",
+            "Count of cache requests by result(hit, miss and stale)",
+            ["app_name", "alias", "result"],
+            registry=util.registry,
+        )
+        self.lock_wait_time: "Histogram" = Histogram(
+            f"{prefix}_cache_lock_wait_time",
+            "Histogram of the time waiting for the lock of key",
+            ["app_name", "alias"],
+            registry=util.registry,
+        )
+        self.compute_time: "Histogram" = Histogram(
+            f"{prefix}_cache_compute_time",
+            "Histogram of the time computing the data",
+            ["app_name", "alias"],
+            registry=util.registry,
+        )
+        self.serialize_time: "Histogram" = Histogram(
+            f"{prefix}_cache_serialize_time",
+            "Histogram of the time serializing the result of func",
+            ["app_name", "alias"],
+            registry=util.registry,
+        )
+        self.payload_size: "Histogram" = Histogram(
+            f"{prefix}_cache_payload_size",
+            "Histogram of the size of cached body",
+            ["app_name", "alias"],
+            buckets=_SIZE_BUCKETS,
+            registry=util.registry,
+        )
+
+    def bind(self, alias: str) -> CacheMetricsRecorder:
+        return _PrometheusCacheMetricsRecorder(self, alias)
@@ -1,29 +1,75 @@
 import asyncio
 import time
 from abc import ABC
-from typing import Any, Awaitable, Callable, Coroutine, List, Optional, Union
+from typing import Any, Awaitable, Callable, Coroutine, List, Optional, TypeVar, Union
 
+from aioredis import errors  # type: ignore
+
+from fast_tools.base.circuit_breaker import CircuitBreakerOpenError
 from fast_tools.base.redis_helper import RedisHelper
 from fast_tools.limit.backend.base import BaseLimitBackend
+from fast_tools.limit.backend.memory import TokenBucket
 from fast_tools.limit.rule import Rule
 
+_T = TypeVar("_T")
+
 
 class BaseRedisBackend(BaseLimitBackend, ABC):
-    def __init__(self, backend: "RedisHelper"):
+    def __init__(self, backend: "RedisHelper", fallback_backend: Optional[TokenBucket] = None):
+        """
+        :param backend: RedisHelper
+        :param fallback_backend: If set, the limit falls back to it(an in-process approximation) when
+            the circuit breaker of backend is open or redis fails, instead of raising the error
+        """
         self._backend: "RedisHelper" = backend
+        self._fallback_backend: Optional[TokenBucket] = fallback_backend
+
+    async def _fallback_handle(self, func: Callable[[], Awaitable[_T]], fallback_func: Callable[[], _T]) -> _T:
+        if self._fallback_backend is None:
+            return await func()
+        circuit_breaker = self._backend.circuit_breaker
+        if circuit_breaker is not None and circuit_breaker.is_open:
+            return fallback_func()
+        try:
+            return await func()
+        except (CircuitBreakerOpenError, errors.RedisError):
+            return fallback_func()
+
+    async def _block_time_handle(
+        self, key: str, rule: Rule, func: Callable[..., Awaitable[bool]], token_num: int = 1
+    ) -> bool:
+        async def _can_next() -> bool:
+            block_time_key: str = f"{key}:block_time"
+            bucket_block_time: Optional[int] = rule.block_time
 
-    async def _block_time_handle(self, key: str, rule: Rule, func: Callable[..., Awaitable[bool]]) -> bool:
-        block_time_key: str = f"{key}:block_time"
-        bucket_block_time: Optional[int] = rule.block_time
+            if bucket_block_time is not None and await self._backend.exists(block_time_key):
+                return False
 
-        if bucket_block_time is not None and await self._backend.exists(block_time_key):
-            return False
+            can_next: bool = await func()
+            if not can_next and bucket_block_time is not None:
+                await self._backend.execute("SET", block_time_key, bucket_block_time, "EX", bucket_block_time)
 
-        can_next: bool = await func()
-        if not can_next and bucket_block_time is not None:
-            await self._backend.client.set(block_time_key, bucket_block_time, expire=bucket_block_time)
+            return can_next
 
-        return can_next
+        return await self._fallback_handle(
+            _can_next, lambda: self._fallback_backend.can_next(key, rule, token_num)  # type: ignore
+        )
+
+    async def _expected_time_handle(self, key: str, rule: Rule, func: Callable[..., Awaitable[float]]) -> float:
+        return await self._fallback_handle(
+            func, lambda: self._fallback_backend.expected_time(key, rule)  # type: ignore
+        )
+
+    async def _get_block_time(self, key: str) -> Optional[int]:
+        """return the ttl of block time key, or None if the key is not blocked"""
+        block_time_key: str = key + ":block_time"
+        block_time = await self._backend.execute("GET", block_time_key)
+        if block_time:
+            return await self._backend.execute("TTL", block_time_key)
+        return None
+
+    async def _expire(self, key: str, rule: Rule) -> None:
+        await self._backend.execute("PEXPIRE", key, int(rule.total_second * 1000))
 
 
 class RedisFixedWindowBackend(BaseRedisBackend):
@@ -35,33 +81,32 @@ class RedisFixedWindowBackend(BaseRedisBackend):
             In the current time(rule.get_second()) window,
              whether the existing value(access_num) exceeds the maximum value(rule.gen_token_num)
             """
-            access_num: int = await self._backend.client.incr(key)
+            access_num: int = await self._backend.execute("INCR", key)
             if access_num == 1:
-                await self._backend.client.expire(key, rule.total_second)
+                await self._expire(key, rule)
 
             can_next: bool = not (access_num > rule.gen_token_num)
             return can_next
 
-        return self._block_time_handle(key, rule, _can_next)
+        return self._block_time_handle(key, rule, _can_next, token_num)
 
     def expected_time(self, key: str, rule: Rule) -> Union[float, Coroutine[Any, Any, float]]:
         key = f"{self._backend.namespace}:{key}"
 
         async def _expected_time() -> float:
-            block_time_key: str = key + ":block_time"
-            block_time = await self._backend.client.get(block_time_key)
-            if block_time:
-                return await self._backend.client.ttl(block_time_key)
+            block_time: Optional[int] = await self._get_block_time(key)
+            if block_time is not None:
+                return block_time
 
-            token_num_str: Optional[str] = await self._backend.client.get(key)
+            token_num_str: Optional[str] = await self._backend.execute("GET", key)
             if token_num_str is None:
                 return 0
             else:
                 if int(token_num_str) < rule.gen_token_num:
                     return 0
-            return await self._backend.client.ttl(key)
+            return await self._backend.execute("TTL", key)
 
-        return _expected_time()
+        return self._expected_time_handle(key, rule, _expected_time)
 
 
 class BaseRedisCellBackend(BaseRedisBackend):
@@ -94,16 +139,18 @@ class BaseRedisCellBackend(BaseRedisBackend):
     async def expected_time(self, key: str, rule: Rule) -> float:
         key = f"{self._backend.namespace}:{key}"
 
-        block_time_key: str = key + ":block_time"
-        block_time = await self._backend.client.get(block_time_key)
-        if block_time:
-            return await self._backend.client.ttl(block_time_key)
+        async def _expected_time() -> float:
+            block_time: Optional[int] = await self._get_block_time(key)
+            if block_time is not None:
+                return block_time
 
-        result: List[int] = await self._call_cell(key, rule, 0)
-        if result[2]:
-            return 0
-        else:
-            return result[4] / rule.gen_token_num
+            result: List[int] = await self._call_cell(key, rule, 0)
+            if result[2]:
+                return 0
+            else:
+                return result[4] / rule.gen_token_num
+
+        return await self._expected_time_handle(key, rule, _expected_time)
 
 
 class RedisCellBackend(BaseRedisCellBackend):
@@ -116,10 +163,10 @@ class RedisCellBackend(BaseRedisCellBackend):
             if can_next and result[4]:
                 # until the limit will reset to its maximum capacity
                 await asyncio.sleep(result[4])
-            await self._backend.client.expire(key, rule.total_second)
+            await self._expire(key, rule)
             return can_next
 
-        return await self._block_time_handle(key, rule, _can_next)
+        return await self._block_time_handle(key, rule, _can_next, token_num)
 
 
 class RedisCellLikeTokenBucketBackend(BaseRedisCellBackend):
@@ -129,10 +176,10 @@ class RedisCellLikeTokenBucketBackend(BaseRedisCellBackend):
         async def _can_next() -> bool:
             result: List[int] = await self._call_cell(key, rule, token_num)
             can_next: bool = not bool(result[0])
-            await self._backend.client.expire(key, rule.total_second)
+            await self._expire(key, rule)
             return can_next
 
-        return await self._block_time_handle(key, rule, _can_next)
+        return await self._block_time_handle(key, rule, _can_next, token_num)
 
 
 class RedisTokenBucketBackend(BaseRedisBackend):
@@ -173,28 +220,30 @@ end
         key = f"{self._backend.namespace}:{key}"
 
         async def _can_next() -> bool:
-            now_token: int = await self._backend.client.eval(
-                self._lua_script, keys=[key], args=[rule.rate, rule.max_token_num, rule.init_token_num]
+            now_token: int = await self._backend.execute(
+                "EVAL", self._lua_script, 1, key, rule.rate, rule.max_token_num, rule.init_token_num
             )
-            await self._backend.client.expire(key, rule.total_second)
+            await self._expire(key, rule)
             return now_token >= 0
 
-        return await self._block_time_handle(key, rule, _can_next)
+        return await self._block_time_handle(key, rule, _can_next, token_num)
 
     async def expected_time(self, key: str, rule: Rule) -> float:
         key = f"{self._backend.namespace}:{key}"
 
-        block_time_key: str = key + ":block_time"
-        block_time = await self._backend.client.get(block_time_key)
-        if block_time:
-            return await self._backend.client.ttl(block_time_key)
-        last_time_str: Optional[str] = await self._backend.client.hget(key, "last_time")
-        last_token_str: Optional[str] = await self._backend.client.hget(key, "last_token")
-        if last_time_str is None or last_token_str is None:
-            return 0
-        if int(last_token_str) > 0:
+        async def _expected_time() -> float:
+            block_time: Optional[int] = await self._get_block_time(key)
+            if block_time is not None:
+                return block_time
+            last_time_str: Optional[str] = await self._backend.execute("HGET", key, "last_time")
+            last_token_str: Optional[str] = await self._backend.execute("HGET", key, "last_token")
+            if last_time_str is None or last_token_str is None:
+                return 0
+            if int(last_token_str) > 0:
+                return 0
+            diff_time: float = time.time() - float(last_time_str)
+            if diff_time > 0:
+                return (rule.total_second - diff_time) / rule.gen_token_num
             return 0
-        diff_time: float = time.time() - float(last_time_str)
-        if diff_time > 0:
-            return (rule.total_second - diff_time) / rule.gen_token_num
-        return 0
+
+        return await self._expected_time_handle(key, rule, _expected_time)
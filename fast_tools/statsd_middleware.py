@@ -8,6 +8,12 @@ from starlette.responses import Response
 from starlette.types import ASGIApp
 
 from fast_tools.base import NAMESPACE, BaseSearchRouteMiddleware, RouteTrie
+from fast_tools.cache import BaseCacheMetrics, CacheMetricsRecorder
+
+
+def _to_ms(seconds: float) -> int:
+    """the timer of statsd is in milliseconds"""
+    return int(seconds * 1000)
 
 
 class StatsdMiddleware(BaseSearchRouteMiddleware):
@@ -63,6 +69,59 @@ class StatsdMiddleware(BaseSearchRouteMiddleware):
             self._client.gauge(self._join_metric(metric, ["exception", type(e).__name__]), 1)
             raise e
         finally:
-            self._client.timer(self._join_metric(metric, ["request_time"]), time.time() - start_time)
+            self._client.timer(self._join_metric(metric, ["request_time"]), _to_ms(time.time() - start_time))
             self._client.gauge(self._join_metric(metric, [str(status_code), "response_count"]), 1)
             self._client.gauge(self._join_metric(metric, ["request_in_progress"]), -1)
+
+
+class _StatsdCacheMetricsRecorder(CacheMetricsRecorder):
+    def __init__(self, client: StatsdClient, metric: str) -> None:
+        self._client: StatsdClient = client
+        self._hit_metric: str = metric + "hit"
+        self._miss_metric: str = metric + "miss"
+        self._stale_metric: str = metric + "stale"
+        self._lock_wait_metric: str = metric + "lock_wait_time"
+        self._compute_metric: str = metric + "compute_time"
+        self._serialize_metric: str = metric + "serialize_time"
+        self._payload_size_metric: str = metric + "payload_size"
+
+    def inc_hit(self) -> None:
+        self._client.increment(self._hit_metric, 1)
+
+    def inc_miss(self) -> None:
+        self._client.increment(self._miss_metric, 1)
+
+    def inc_stale(self) -> None:
+        self._client.increment(self._stale_metric, 1)
+
+    def observe_lock_wait(self, seconds: float) -> None:
+        self._client.timer(self._lock_wait_metric, _to_ms(seconds))
+
+    def observe_compute(self, seconds: float) -> None:
+        self._client.timer(self._compute_metric, _to_ms(seconds))
+
+    def observe_serialize(self, seconds: float) -> None:
+        self._client.timer(self._serialize_metric, _to_ms(seconds))
+
+    def observe_payload_size(self, size: int) -> None:
+        # the size is not a duration, statsd has no histogram type, so it is sent as the gauge of the latest size
+        self._client.gauge(self._payload_size_metric, size)
+
+
+class StatsdCacheMetrics(BaseCacheMetrics):
+    """The metrics of `cache` sent by statsd, like: `{prefix}.{app_name}.cache.{alias}.hit`,
+    the time is sent as the timer in milliseconds(same as `StatsdMiddleware`), the payload size is sent as the gauge,
+    and the metric names of each func are built when decorating"""
+
+    def __init__(
+        self,
+        *,
+        client: StatsdClient,
+        app_name: str = NAMESPACE,
+        prefix: str = NAMESPACE,
+    ) -> None:
+        self._client: StatsdClient = client
+        self._metric: str = StatsdMiddleware._join_metric("", [prefix, app_name, "cache"])
+
+    def bind(self, alias: str) -> CacheMetricsRecorder:
+        return _StatsdCacheMetricsRecorder(self._client, StatsdMiddleware._join_metric(self._metric, [alias]))
@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+from fast_tools.base.circuit_breaker import CircuitBreaker, CircuitBreakerOpenError
+
+
+class TestCircuitBreaker:
+    def test_circuit_breaker(self) -> None:
+        circuit_breaker: CircuitBreaker = CircuitBreaker(
+            error_rate_threshold=0.5, min_call_num=4, open_time=0.1, half_open_call_num=2
+        )
+        for _ in range(2):
+            with circuit_breaker.guard():
+                pass
+        # the error rate is judged after `min_call_num` calls
+        circuit_breaker.on_failure()
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+        with pytest.raises(RuntimeError):
+            with circuit_breaker.guard():
+                raise RuntimeError()
+        assert circuit_breaker.is_open
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()
+
+        # only `half_open_call_num` probe calls are let through, and they close the circuit
+        time.sleep(0.1)
+        assert circuit_breaker.state == CircuitBreaker.HALF_OPEN
+        circuit_breaker.before_call()
+        circuit_breaker.before_call()
+        assert circuit_breaker.is_open
+        with pytest.raises(CircuitBreakerOpenError):
+            circuit_breaker.before_call()
+        circuit_breaker.on_success()
+        circuit_breaker.on_success()
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_failure_and_slow_call(self) -> None:
+        circuit_breaker: CircuitBreaker = CircuitBreaker(slow_call_time=0.01, min_call_num=1, open_time=0.1)
+        # the ignored exception is counted as success
+        with pytest.raises(KeyError):
+            with circuit_breaker.guard((KeyError,)):
+                raise KeyError()
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+        # the slow call is counted as failure
+        with circuit_breaker.guard():
+            time.sleep(0.02)
+        assert circuit_breaker.is_open
+
+        # the failed probe opens the circuit again
+        time.sleep(0.1)
+        circuit_breaker.before_call()
+        circuit_breaker.on_failure()
+        assert circuit_breaker.state == CircuitBreaker.OPEN
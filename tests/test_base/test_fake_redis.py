@@ -0,0 +1,237 @@
+import asyncio
+from typing import Generator, List
+
+import pytest
+
+from fast_tools.base import (
+    CircuitBreaker,
+    CircuitBreakerOpenError,
+    HotKeyDetector,
+    RedisHelper,
+    ShardedRedisHelper,
+    TTLLRUCache,
+)
+from fast_tools.base.fake_redis import FakeRedis, VirtualClock
+from fast_tools.base.redis_helper import errors
+from fast_tools.limit.backend import TokenBucket
+from fast_tools.limit.backend.redis import RedisFixedWindowBackend, RedisTokenBucketBackend
+from fast_tools.limit.rule import Rule
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest.fixture()
+def fake_redis() -> FakeRedis:
+    return FakeRedis(clock=VirtualClock(1000))
+
+
+@pytest.fixture()
+def redis_helper(fake_redis: FakeRedis) -> Generator[RedisHelper, None, None]:
+    redis_helper: RedisHelper = RedisHelper()
+    redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+    yield redis_helper
+
+
+class TestFakeRedis:
+    async def test_string(self, fake_redis: FakeRedis, redis_helper: RedisHelper) -> None:
+        clock: VirtualClock = fake_redis.clock  # type: ignore
+        assert await redis_helper.execute("set", "test", "value", "ex", 10) == "OK"
+        assert await redis_helper.execute("set", "test", "value", "ex", 10, "nx") is None
+        assert await redis_helper.execute("get", "test", encoding=None) == b"value"
+        assert await redis_helper.client.ttl("test") == 10
+        assert await redis_helper.execute("pttl", "test") == 10000
+        clock.advance(10)
+        assert not await redis_helper.exists("test")
+        assert await redis_helper.execute("ttl", "test") == -2
+
+        assert await redis_helper.client.incr("test_incr") == 1
+        assert await redis_helper.client.incr("test_incr") == 2
+        assert await redis_helper.execute("ttl", "test_incr") == -1
+        with pytest.raises(errors.RedisError):
+            await redis_helper.execute("hget", "test_incr", "field")
+
+        await redis_helper.set_dict("test_dict", {"a": 1}, 10)
+        assert await redis_helper.get_dict("test_dict") == {"a": 1}
+        assert await redis_helper.mget_dict(["test_dict", "test"]) == [{"a": 1}, {}]
+        assert await redis_helper.del_key("test_dict")
+        with pytest.raises(errors.RedisError):
+            await redis_helper.execute("not_support_command")
+
+    async def test_hash_and_scan(self, redis_helper: RedisHelper) -> None:
+        test_dict: dict = {str(i): i for i in range(100)}
+        await redis_helper.hmset_dict("test", test_dict)
+        assert await redis_helper.hget_dict("test", "1") == 1
+        assert await redis_helper.hmget_dict("test") == test_dict
+
+        key_list: List[str] = [f"test_scan:{i}" for i in range(100)]
+        await redis_helper.pipeline([("set", key, "value") for key in key_list])
+        assert sorted([key async for key in redis_helper.scan_iter("test_scan:*", count=7)]) == sorted(key_list)
+        assert await redis_helper.delete_pattern("test_scan:*", batch_size=7) == 100
+        assert await redis_helper.execute("dbsize") == 1
+
+    async def test_round_trip(self, fake_redis: FakeRedis, redis_helper: RedisHelper) -> None:
+        fake_redis.reset_stats()
+        await redis_helper.pipeline([("set", "test", "value"), ("get", "test"), ("del", "test")])
+        assert fake_redis.round_trip_count == 1
+        assert fake_redis.command_count["SET"] == 1
+        await redis_helper.execute("get", "test")
+        assert fake_redis.round_trip_count == 2
+
+    async def test_lock(self, redis_helper: RedisHelper) -> None:
+        lock_1 = redis_helper.lock("test")
+        async with lock_1:
+            assert await lock_1.locked()
+            assert not await redis_helper.lock("test").acquire(0)
+        assert not await lock_1.locked()
+
+        semaphore = redis_helper.semaphore("test", 2)
+        async with semaphore:
+            async with redis_helper.semaphore("test", 2):
+                assert await semaphore.locked()
+            assert not await semaphore.locked()
+
+        rw_lock = redis_helper.rw_lock("test")
+        other_rw_lock = redis_helper.rw_lock("test")
+        async with rw_lock.read_lock:
+            assert await other_rw_lock.read_lock.acquire(0)
+            assert not await other_rw_lock.write_lock.acquire(0)
+            await other_rw_lock.read_lock.release()
+        async with rw_lock.write_lock:
+            assert not await redis_helper.rw_lock("test").read_lock.acquire(0)
+
+    async def test_pubsub(self, fake_redis: FakeRedis) -> None:
+        redis_helper_1: RedisHelper = RedisHelper(near_cache=TTLLRUCache(10, 60))
+        redis_helper_1.init(fake_redis.create_pool(encoding="utf-8"))
+        redis_helper_2: RedisHelper = RedisHelper(near_cache=TTLLRUCache(10, 60))
+        redis_helper_2.init(fake_redis.create_pool(encoding="utf-8"))
+        await asyncio.sleep(0)
+
+        await redis_helper_1.set_dict("test", {"a": 1})
+        assert await redis_helper_2.get_dict("test") == {"a": 1}
+        await redis_helper_1.set_dict("test", {"a": 2})
+        await asyncio.sleep(0)
+        assert await redis_helper_2.get_dict("test") == {"a": 2}
+        await redis_helper_1.close()
+        await redis_helper_2.close()
+
+        # keyspace notification
+        fake_redis.notify_keyspace_events = True
+        redis_helper: RedisHelper = RedisHelper(near_cache=TTLLRUCache(10, 60), enable_keyspace_notification=True)
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        await asyncio.sleep(0)
+        assert await redis_helper.get_dict("test") == {"a": 2}
+        await redis_helper.execute("del", "test")
+        await asyncio.sleep(0)
+        assert await redis_helper.get_dict("test") == {}
+        await redis_helper.close()
+
+    async def test_near_cache_resubscribe(self, fake_redis: FakeRedis) -> None:
+        redis_helper_1: RedisHelper = RedisHelper(near_cache=TTLLRUCache(10, 60))
+        redis_helper_1.init(fake_redis.create_pool(encoding="utf-8"))
+        redis_helper_2: RedisHelper = RedisHelper(near_cache=TTLLRUCache(10, 60))
+        redis_helper_2.init(fake_redis.create_pool(encoding="utf-8"))
+        await asyncio.sleep(0)
+        await redis_helper_2.set_dict("test", {"a": 1})
+        assert await redis_helper_1.get_dict("test") == {"a": 1}
+
+        # the subscription is lost(and the change of key is not published), the near cache is skipped until resubscribing
+        await redis_helper_1.client.unsubscribe(redis_helper_1.near_cache_channel)
+        await asyncio.sleep(0)
+        assert len(redis_helper_1.near_cache) == 0  # type: ignore
+        await redis_helper_2.execute("set", "test", "")
+        assert await redis_helper_1.get_dict("test") == {}
+        assert len(redis_helper_1.near_cache) == 0  # type: ignore
+
+        # the invalidation is received again after resubscribing
+        await asyncio.sleep(0.2)
+        assert await redis_helper_1.get_dict("test") == {}
+        assert len(redis_helper_1.near_cache) == 1  # type: ignore
+        await redis_helper_2.set_dict("test", {"a": 2})
+        await asyncio.sleep(0)
+        assert await redis_helper_1.get_dict("test") == {"a": 2}
+        await redis_helper_1.close()
+        await redis_helper_2.close()
+
+    async def test_hot_key(self, fake_redis: FakeRedis) -> None:
+        redis_helper: RedisHelper = RedisHelper(hot_key_detector=HotKeyDetector(min_count=3, replica_ttl=60))
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        await asyncio.sleep(0)
+        await redis_helper.set_dict("test", {"a": 1}, 10)
+
+        fake_redis.reset_stats()
+        for _ in range(10):
+            assert await redis_helper.get_dict("test") == {"a": 1}
+        # the hot key is read from local replica
+        assert fake_redis.command_count["GET"] == 3
+        assert redis_helper.hot_key_detector and redis_helper.hot_key_detector.hot_key_dict == {"test": 10}
+
+        # the local replica is invalidated by write
+        await redis_helper.set_dict("test", {"a": 2}, 10)
+        assert await redis_helper.get_dict("test") == {"a": 2}
+        await redis_helper.close()
+
+    async def test_limit_backend(self, fake_redis: FakeRedis, redis_helper: RedisHelper) -> None:
+        clock: VirtualClock = fake_redis.clock  # type: ignore
+        rule: Rule = Rule(second=10, gen_token_num=2, init_token_num=2, max_token_num=2)
+
+        token_bucket_backend: RedisTokenBucketBackend = RedisTokenBucketBackend(redis_helper)
+        assert [await token_bucket_backend.can_next("test", rule) for _ in range(3)] == [True, True, False]
+        clock.advance(10)
+        assert await token_bucket_backend.can_next("test", rule)
+
+        fixed_window_backend: RedisFixedWindowBackend = RedisFixedWindowBackend(redis_helper)
+        assert [await fixed_window_backend.can_next("test_window", rule) for _ in range(3)] == [True, True, False]
+        assert await fixed_window_backend.expected_time("test_window", rule) == 10
+        clock.advance(10)
+        assert await fixed_window_backend.can_next("test_window", rule)
+
+    async def test_limit_backend_fallback(self, fake_redis: FakeRedis) -> None:
+        circuit_breaker: CircuitBreaker = CircuitBreaker(min_call_num=2, open_time=60)
+        redis_helper: RedisHelper = RedisHelper(circuit_breaker=circuit_breaker)
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        rule: Rule = Rule(second=10, gen_token_num=2, init_token_num=2, max_token_num=2)
+        token_bucket_backend: RedisTokenBucketBackend = RedisTokenBucketBackend(
+            redis_helper, fallback_backend=TokenBucket()
+        )
+        assert await token_bucket_backend.can_next("test", rule)
+
+        # redis is down, the limit falls back to the in-process token bucket
+        await redis_helper.close()
+        assert [await token_bucket_backend.can_next("test", rule) for _ in range(3)] == [True, True, False]
+        assert circuit_breaker.is_open
+        fake_redis.reset_stats()
+        assert await token_bucket_backend.expected_time("test", rule) > 0
+        assert fake_redis.round_trip_count == 0
+
+        # without fallback backend, the error is raised
+        with pytest.raises(CircuitBreakerOpenError):
+            await RedisTokenBucketBackend(redis_helper).can_next("test", rule)
+
+    async def test_sharded_redis_helper(self) -> None:
+        fake_redis_list: List[FakeRedis] = [FakeRedis() for _ in range(3)]
+        redis_helper: ShardedRedisHelper = ShardedRedisHelper()
+        redis_helper.init([fake_redis.create_pool(encoding="utf-8") for fake_redis in fake_redis_list])
+
+        key_list: List[str] = [f"test:{i}" for i in range(100)]
+        await redis_helper.pipeline([("set", key, "value") for key in key_list])
+        assert all(fake_redis.command_count["SET"] for fake_redis in fake_redis_list)
+        assert sum(fake_redis.command_count["SET"] for fake_redis in fake_redis_list) == 100
+        assert await redis_helper.execute("exists", *key_list) == 100
+        assert await redis_helper.delete_pattern("test:*") == 100
+
+        # the multi key command in pipeline is also split by shard
+        key_list = key_list[:12]
+        await redis_helper.pipeline([("set", key, str(index)) for index, key in enumerate(key_list)])
+        assert await redis_helper.pipeline([("mget", *key_list)]) == [[str(index) for index in range(12)]]
+        # the eval is routed by its keys, no matter the case of command
+        assert redis_helper._get_pipeline_shard_index("EVAL", ["script", key_list[:1], []]) == (
+            redis_helper.get_shard_index(key_list[0])
+        )
+        assert await redis_helper.pipeline([("dbsize",), ("del", *key_list)]) == [12, 12]
+
+        # the command of whole db is sent to every shard
+        await redis_helper.pipeline([("set", key, "value") for key in key_list])
+        assert await redis_helper.execute("DBSIZE") == 12
+        assert await redis_helper.execute("FLUSHDB") == "OK"
+        assert [await fake_redis.create_pool().execute("dbsize") for fake_redis in fake_redis_list] == [0, 0, 0]
+        await redis_helper.close()
@@ -0,0 +1,23 @@
+import time
+
+from fast_tools.base.hot_key import HotKeyDetector
+
+
+class TestHotKey:
+    def test_hot_key_detector(self) -> None:
+        hot_key_detector: HotKeyDetector = HotKeyDetector(capacity=4, min_count=10, decay_interval=0.1)
+        cold_index: int = 0
+        for _ in range(30):
+            hot_key_detector.add("hot")
+            # the cold keys replace each other
+            for _ in range(2):
+                cold_index += 1
+                hot_key_detector.add(f"cold:{cold_index}")
+        assert hot_key_detector.is_hot("hot")
+        assert not hot_key_detector.is_hot(f"cold:{cold_index}")
+        assert hot_key_detector.hot_key_dict == {"hot": 30}
+
+        # the count is halved every decay interval
+        time.sleep(0.2)
+        assert hot_key_detector.hot_key_dict == {}
+        assert not hot_key_detector.add("hot")
@@ -1,6 +1,8 @@
+import time
+
 import pytest
 
-from fast_tools.base.lru import LRUCache
+from fast_tools.base.lru import LRUCache, TTLLRUCache
 
 
 class TestLru:
@@ -16,3 +18,22 @@ class TestLru:
 
         with pytest.raises(KeyError):
             lru_cache.get("2")
+
+    def test_ttl_lru(self) -> None:
+        lru_cache: TTLLRUCache[str, int] = TTLLRUCache(3, 0.1)
+        lru_cache.set("0", 0)
+        lru_cache.set("1", 1, ttl=10)
+        lru_cache.set("2", 2, ttl=0)
+        assert lru_cache.get("0", None) == 0
+        assert lru_cache.get("2", None) is None
+        time.sleep(0.1)
+        # ttl can not be greater than the ttl of cache
+        assert lru_cache.get("0", None) is None
+        assert lru_cache.get("1", None) is None
+
+        lru_cache.set("3", 3)
+        lru_cache.delete("3")
+        assert lru_cache.get("3", None) is None
+        lru_cache.set("3", 3)
+        lru_cache.clear()
+        assert len(lru_cache) == 0
@@ -1,10 +1,13 @@
+import asyncio
 import time
-from typing import AsyncGenerator, Dict
+from typing import AsyncGenerator, Dict, List, Set
 
 import aioredis  # type: ignore
 import pytest
 
-from fast_tools.base.redis_helper import Lock, LockError, RedisHelper, errors
+from fast_tools.base.lru import TTLLRUCache
+from fast_tools.base.redis_helper import Lock, LockError, ReadWriteLock, RedisHelper, Semaphore, errors
+from fast_tools.base.sharded_redis_helper import ShardedRedisHelper
 
 pytestmark = pytest.mark.asyncio
 
@@ -136,3 +139,155 @@ class TestRedisHelper:
         assert not await lock_2.acquire(1)
         await lock_1.release()
         assert not await lock_1.locked()
+
+    async def test_semaphore(self, redis_helper: RedisHelper) -> None:
+        semaphore_1: Semaphore = redis_helper.semaphore("test_key", 2)
+        semaphore_2: Semaphore = redis_helper.semaphore("test_key", 2)
+        semaphore_3: Semaphore = redis_helper.semaphore("test_key", 2)
+        assert await semaphore_1.acquire()
+        assert not await semaphore_3.locked()
+        assert await semaphore_2.acquire()
+        assert await semaphore_3.locked()
+        assert not await semaphore_3.acquire(1)
+
+        with pytest.raises(LockError) as e:
+            await semaphore_3.do_release(int(time.time()))
+        assert e.value.args[0] == "Cannot release a semaphore that's no longer owned"
+
+        await semaphore_1.release()
+        async with semaphore_3:
+            assert await semaphore_3.locked()
+        await semaphore_2.release()
+        assert not await semaphore_3.locked()
+
+        # lease timeout
+        semaphore_4: Semaphore = redis_helper.semaphore("test_key", 1, timeout=1)
+        assert await semaphore_4.acquire()
+        assert await semaphore_4.acquire(2)
+
+        with pytest.raises(ValueError):
+            redis_helper.semaphore("test_key", 0)
+
+    async def test_rw_lock(self, redis_helper: RedisHelper) -> None:
+        rw_lock_1: ReadWriteLock = redis_helper.rw_lock("test_key")
+        rw_lock_2: ReadWriteLock = redis_helper.rw_lock("test_key")
+        async with rw_lock_1.read_lock:
+            # readers do not block each other
+            assert await rw_lock_2.read_lock.acquire(0)
+            assert await rw_lock_2.read_lock.locked()
+            assert not await rw_lock_2.write_lock.acquire(0)
+            await rw_lock_2.read_lock.release()
+            # waiting writer block new reader
+            assert not await rw_lock_2.read_lock.acquire(0)
+
+        async with rw_lock_1.write_lock:
+            assert await rw_lock_2.write_lock.locked()
+            assert not await rw_lock_2.read_lock.acquire(0)
+            assert not await rw_lock_2.write_lock.acquire(0)
+        assert not await rw_lock_2.write_lock.locked()
+        assert await rw_lock_2.read_lock.acquire(0)
+        await rw_lock_2.read_lock.release()
+
+    async def test_mget_dict(self, redis_helper: RedisHelper) -> None:
+        await redis_helper.set_dict("test_a", {"a": 1}, 10)
+        await redis_helper.set_dict("test_b", {"b": 2}, 10)
+        assert await redis_helper.mget_dict(["test_a", "test_c", "test_b"]) == [{"a": 1}, {}, {"b": 2}]
+        assert await redis_helper.mget_dict([]) == []
+        await redis_helper.execute("del", "test_a", "test_b")
+
+    async def test_scan_and_delete_pattern(self, redis_helper: RedisHelper) -> None:
+        key_list: List[str] = [f"test_scan:{i}" for i in range(1000)]
+        await redis_helper.pipeline([("set", key, "value") for key in key_list])
+        assert sorted([key async for key in redis_helper.scan_iter("test_scan:*", count=100)]) == sorted(key_list)
+
+        assert await redis_helper.delete_pattern("test_scan:*", batch_size=100, max_concurrency=2) == 1000
+        assert [key async for key in redis_helper.scan_iter("test_scan:*")] == []
+
+        await redis_helper.pipeline([("set", key, "value") for key in key_list])
+        assert await redis_helper.delete_keys(iter(key_list), batch_size=300) == 1000
+
+    async def test_near_cache(self) -> None:
+        async def create_helper() -> RedisHelper:
+            redis_helper: RedisHelper = RedisHelper(near_cache=TTLLRUCache(100, 10))
+            redis_helper.init(
+                await aioredis.create_pool("redis://localhost", minsize=1, maxsize=10, encoding="utf-8"),
+            )
+            return redis_helper
+
+        redis_helper_1: RedisHelper = await create_helper()
+        redis_helper_2: RedisHelper = await create_helper()
+        # wait subscribe
+        await asyncio.sleep(0.1)
+
+        await redis_helper_1.set_dict("test_near_cache", {"a": 1}, 10)
+        assert await redis_helper_2.get_dict("test_near_cache") == {"a": 1}
+        # read from near cache
+        await redis_helper_1.execute("set", "test_near_cache", "")
+        assert await redis_helper_2.get_dict("test_near_cache") == {"a": 1}
+
+        # invalidate by channel
+        await redis_helper_1.set_dict("test_near_cache", {"a": 2}, 10)
+        await asyncio.sleep(0.1)
+        assert await redis_helper_2.get_dict("test_near_cache") == {"a": 2}
+
+        await redis_helper_1.hmset_dict("test_near_cache_hash", {"a": 1, "b": 2})
+        assert await redis_helper_2.hget_dict("test_near_cache_hash", "a") == 1
+        await redis_helper_1.del_key("test_near_cache_hash")
+        await asyncio.sleep(0.1)
+        assert await redis_helper_2.hget_dict("test_near_cache_hash", "a") is None
+
+        await redis_helper_1.del_key("test_near_cache")
+        await redis_helper_1.close()
+        await redis_helper_2.close()
+
+
+class TestShardedRedisHelper:
+    @staticmethod
+    async def _create_helper() -> ShardedRedisHelper:
+        redis_helper: ShardedRedisHelper = ShardedRedisHelper()
+        redis_helper.init(
+            [
+                await aioredis.create_pool(f"redis://localhost/{db}", minsize=1, maxsize=10, encoding="utf-8")
+                for db in range(3)
+            ]
+        )
+        return redis_helper
+
+    async def test_init(self) -> None:
+        redis_helper: ShardedRedisHelper = ShardedRedisHelper()
+        with pytest.raises(ConnectionError) as e:
+            redis_helper.get_client("test")
+        assert e.value.args[0] == "Not init ShardedRedisHelper, please run ShardedRedisHelper.init"
+
+        with pytest.raises(ConnectionError) as e:
+            redis_helper.init([])
+        assert e.value.args[0] == "conn_pool is none"
+
+        redis_helper = await self._create_helper()
+        with pytest.raises(RuntimeError):
+            redis_helper.client
+        assert len(redis_helper.client_list) == 3
+        await redis_helper.close()
+        assert redis_helper.closed()
+
+    async def test_shard(self) -> None:
+        redis_helper: ShardedRedisHelper = await self._create_helper()
+        key_list: List[str] = [f"test_key_{i}" for i in range(300)]
+        shard_index_set: Set[int] = {redis_helper.get_shard_index(key) for key in key_list}
+        assert shard_index_set == {0, 1, 2}
+        # hash tag
+        assert len({redis_helper.get_shard_index("{" + "user:1}:" + key) for key in key_list}) == 1
+
+        for key in key_list[:30]:
+            await redis_helper.set_dict(key, {"key": key}, 10)
+            assert await redis_helper.get_client(key).exists(key)
+        assert await redis_helper.mget_dict(key_list[:30]) == [{"key": key} for key in key_list[:30]]
+        assert await redis_helper.execute("exists", *key_list[:30]) == 30
+        assert await redis_helper.pipeline([("get", key) for key in key_list[:30]]) == [
+            await redis_helper.execute("get", key) for key in key_list[:30]
+        ]
+        assert await redis_helper.execute("del", *key_list[:30]) == 30
+
+        async with redis_helper.lock("test_key"):
+            assert await redis_helper.lock("test_key").locked()
+        await redis_helper.close()
@@ -1,13 +1,39 @@
 import asyncio
+import gzip
 import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 
 import aioredis  # type: ignore
 import pytest
+from pydantic import BaseModel, Field
 from requests import Response  # type: ignore
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.responses import Response as StarletteResponse
+from starlette.responses import StreamingResponse
 from starlette.testclient import TestClient
 
 from example.cache import app
+from fast_tools.base import CircuitBreaker, RouteTrie, TTLLRUCache
+from fast_tools.base.fake_redis import FakeRedis, VirtualClock
 from fast_tools.base.redis_helper import RedisHelper
+from fast_tools.cache import (
+    CacheMiddleware,
+    RouteCacheRule,
+    Vary,
+    cache,
+    cache_control,
+    flush_write_back,
+    gen_warm_up_manifest,
+    gen_warm_up_request,
+    invalidate_tags,
+    warm_up,
+)
+from fast_tools.exporter import PrometheusCacheMetrics
+from fast_tools.exporter.util import registry
 
 from .conftest import AnyStringWith  # type: ignore
 
@@ -19,7 +45,7 @@ class TestCache:
         async def clear() -> None:
             redis_helper: RedisHelper = RedisHelper()
             redis_helper.init(await aioredis.create_pool("redis://localhost", minsize=1, maxsize=10, encoding="utf-8"))
-            await redis_helper.client.delete("fast-tools:root:():{}")
+            await redis_helper.delete_pattern("fast-tools:root:*")
             await redis_helper.client.delete("fast-tools:user_login:123")
             await redis_helper.client.delete("fast-tools:user_login:1234")
             await redis_helper.close()
@@ -60,3 +86,945 @@ class TestCache:
             with pytest.raises(ValueError) as e:
                 client.get("/api/get_key_error")
             assert e.value.args[0] == "Can not found request param"
+
+
+class TestCacheByFakeRedis:
+    @staticmethod
+    def gen_redis_helper(fake_redis: FakeRedis) -> RedisHelper:
+        redis_helper: RedisHelper = RedisHelper()
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        return redis_helper
+
+    @staticmethod
+    async def asgi_get(
+        app: Any, path: str, query_string: bytes = b"", header_list: Optional[List[Tuple[bytes, bytes]]] = None
+    ) -> Tuple[int, Dict[str, str], List[bytes]]:
+        """call the asgi app, return status code, headers and body chunks"""
+        message_list: List[dict] = []
+        receive_count_list: List[int] = []
+
+        async def receive() -> dict:
+            if receive_count_list:
+                # the client is still connected
+                await asyncio.Future()
+            receive_count_list.append(1)
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: dict) -> None:
+            message_list.append(message)
+
+        scope: dict = {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "root_path": "",
+            "query_string": query_string,
+            "headers": header_list or [],
+        }
+        await app(scope, receive, send)
+        headers: Dict[str, str] = {
+            name.decode("latin-1"): value.decode("latin-1") for name, value in message_list[0]["headers"]
+        }
+        return message_list[0]["status"], headers, [message["body"] for message in message_list[1:]]
+
+    async def test_local_cache(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        def gen_func(backend: RedisHelper, local_cache: TTLLRUCache) -> Callable:
+            @cache(backend, 10, local_cache=local_cache)
+            async def demo() -> dict:
+                call_count_dict["count"] += 1
+                return {"count": call_count_dict["count"]}
+
+            return demo
+
+        # two workers share one redis
+        local_cache_1: TTLLRUCache = TTLLRUCache(10, 60)
+        redis_helper_1: RedisHelper = self.gen_redis_helper(fake_redis)
+        demo_1: Callable = gen_func(redis_helper_1, local_cache_1)
+        local_cache_2: TTLLRUCache = TTLLRUCache(10, 60)
+        redis_helper_2: RedisHelper = self.gen_redis_helper(fake_redis)
+        demo_2: Callable = gen_func(redis_helper_2, local_cache_2)
+        await asyncio.sleep(0)
+
+        assert (await demo_1()).body == b'{"count":1}'
+        await asyncio.sleep(0)
+        assert (await demo_2()).body == b'{"count":1}'
+        # the local item is capped at the ttl of redis key
+        key: str = list(local_cache_2.cache.keys())[0]
+        _, expire_timestamp = local_cache_2.cache[key]
+        assert expire_timestamp - time.monotonic() <= 10
+
+        fake_redis.reset_stats()
+        assert (await demo_1()).body == b'{"count":1}'
+        assert (await demo_2()).body == b'{"count":1}'
+        assert fake_redis.round_trip_count == 0
+
+        # worker 2 recomputes, worker 1 drops its local item
+        await redis_helper_2.del_key(key)
+        assert (await demo_2()).body == b'{"count":2}'
+        await asyncio.sleep(0)
+        assert len(local_cache_1) == 0
+        assert (await demo_1()).body == b'{"count":2}'
+
+        await redis_helper_1.close()
+        await redis_helper_2.close()
+
+    async def test_stale_while_revalidate(self) -> None:
+        clock: VirtualClock = VirtualClock(time.time())
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis(clock=clock))
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        @cache(redis_helper, 1, stale_while_revalidate=10, clock=clock)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        assert (await demo()).body == b'{"count":1}'
+        clock.advance(1.1)
+        # return stale data, and recompute in background
+        assert (await demo()).body == b'{"count":1}'
+        assert (await demo()).body == b'{"count":1}'
+        await asyncio.sleep(0.1)
+        assert (await demo()).body == b'{"count":2}'
+        assert call_count_dict["count"] == 2
+        await redis_helper.close()
+
+    async def test_early_refresh(self) -> None:
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis())
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        # a huge beta makes the data always be recomputed before expiry
+        @cache(redis_helper, 60, early_refresh_beta=10**10)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        assert (await demo()).body == b'{"count":1}'
+        assert (await demo()).body == b'{"count":1}'
+        await asyncio.sleep(0.1)
+        assert (await demo()).body == b'{"count":2}'
+        await asyncio.sleep(0.1)
+
+        with pytest.raises(ValueError):
+            cache(redis_helper, early_refresh_beta=1.0)
+        await redis_helper.close()
+
+    async def test_single_flight(self) -> None:
+        fake_redis: FakeRedis = FakeRedis(latency=0.01)
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        @cache(redis_helper, 60)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            await asyncio.sleep(0.05)
+            return {"count": call_count_dict["count"]}
+
+        response_list: list = await asyncio.gather(*[demo() for _ in range(10)])
+        assert {response.body for response in response_list} == {b'{"count":1}'}
+        assert call_count_dict["count"] == 1
+        # only one coroutine takes the distributed lock(1 lock SET + 1 cache SET)
+        assert fake_redis.command_count["SET"] == 2
+        # 10 reads before the miss, 1 read in the lock, and 1 read by the release script of lock
+        assert fake_redis.command_count["GET"] == 12
+        await redis_helper.close()
+
+    async def test_cache_rendered_response(self) -> None:
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis())
+        render_count_dict: Dict[str, int] = {"count": 0}
+
+        class CountJSONResponse(JSONResponse):
+            def render(self, content: Any) -> bytes:
+                render_count_dict["count"] += 1
+                return super().render(content)
+
+        @cache(redis_helper, 60, json_response=CountJSONResponse)
+        async def demo_dict() -> dict:
+            return {"timestamp": time.time()}
+
+        @cache(redis_helper, 60)
+        async def demo_response() -> PlainTextResponse:
+            return PlainTextResponse(str(time.time()), headers={"X-Demo": "demo"})
+
+        body: bytes = (await demo_dict()).body
+        for _ in range(3):
+            assert (await demo_dict()).body == body
+        # the hit does not serialize the data again
+        assert render_count_dict["count"] == 1
+
+        body = (await demo_response()).body
+        response: StarletteResponse = await demo_response()
+        assert response.body == body
+        assert response.headers["x-demo"] == "demo"
+        assert response.headers["content-type"].startswith("text/plain")
+        assert response.headers["content-length"] == str(len(body))
+        await redis_helper.close()
+
+    async def test_etag(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+
+        async def get_key(request: Request) -> str:
+            return "demo"
+
+        @cache(redis_helper, 60, get_key_func=get_key, enable_etag=True)
+        async def demo(request: Request) -> dict:
+            return {"timestamp": time.time()}
+
+        def gen_request(if_none_match: str = "") -> Request:
+            headers: list = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+            return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+        response: StarletteResponse = await demo(request=gen_request())
+        etag: str = response.headers["etag"]
+        assert etag.startswith('"') and etag.endswith('"')
+        assert (await demo(request=gen_request())).headers["etag"] == etag
+
+        fake_redis.reset_stats()
+        for if_none_match in (etag, f'"other", W/{etag}', "*"):
+            not_modified_response: StarletteResponse = await demo(request=gen_request(if_none_match))
+            assert not_modified_response.status_code == 304
+            assert not_modified_response.body == b""
+            assert not_modified_response.headers["etag"] == etag
+        # only the meta key is read
+        assert fake_redis.command_count["GET"] == 3
+
+        assert (await demo(request=gen_request('"other"'))).body == response.body
+        await redis_helper.close()
+
+    async def test_compress(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+
+        async def get_key(request: Request) -> str:
+            return request.query_params["size"]
+
+        @cache(
+            redis_helper,
+            60,
+            get_key_func=get_key,
+            enable_etag=True,
+            compress_min_size=100,
+            compress_encoding_list=["gzip"],
+        )
+        async def demo(request: Request) -> PlainTextResponse:
+            return PlainTextResponse("a" * int(request.query_params["size"]))
+
+        def gen_request(size: int, accept_encoding: str = "", if_none_match: str = "") -> Request:
+            headers: list = [(b"accept-encoding", accept_encoding.encode())]
+            if if_none_match:
+                headers.append((b"if-none-match", if_none_match.encode()))
+            query_string: bytes = f"size={size}".encode()
+            return Request(
+                {"type": "http", "method": "GET", "path": "/", "query_string": query_string, "headers": headers}
+            )
+
+        # small body is not compressed
+        response: StarletteResponse = await demo(request=gen_request(10, "gzip"))
+        assert response.body == b"a" * 10
+        assert "content-encoding" not in response.headers
+
+        await demo(request=gen_request(1000, "gzip"))
+        gzip_response: StarletteResponse = await demo(request=gen_request(1000, "br;q=1.0, gzip;q=0.5"))
+        assert gzip_response.headers["content-encoding"] == "gzip"
+        assert gzip_response.headers["vary"] == "Accept-Encoding"
+        assert gzip.decompress(gzip_response.body) == b"a" * 1000
+
+        for accept_encoding in ("", "gzip;q=0", "identity"):
+            identity_response: StarletteResponse = await demo(request=gen_request(1000, accept_encoding))
+            assert "content-encoding" not in identity_response.headers
+            assert identity_response.body == b"a" * 1000
+            assert identity_response.headers["etag"] != gzip_response.headers["etag"]
+
+        not_modified_response: StarletteResponse = await demo(
+            request=gen_request(1000, "gzip", gzip_response.headers["etag"])
+        )
+        assert not_modified_response.status_code == 304
+        assert not_modified_response.headers["etag"] == gzip_response.headers["etag"]
+
+        with pytest.raises(ValueError):
+            cache(redis_helper, 60, compress_min_size=100, compress_encoding_list=["not_support"])
+        await redis_helper.close()
+
+    async def test_key(self, caplog: pytest.LogCaptureFixture) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+
+        def gen_request(
+            query_string: str, headers: Optional[list] = None, path_params: Optional[dict] = None
+        ) -> Request:
+            return Request(
+                {
+                    "type": "http",
+                    "method": "GET",
+                    "path": "/",
+                    "query_string": query_string.encode(),
+                    "headers": headers or [],
+                    "path_params": path_params or {},
+                }
+            )
+
+        @cache(redis_helper, 60, alias="default")
+        async def demo_default(request: Request) -> dict:
+            return {"timestamp": time.time()}
+
+        # the key of request param does not contain headers or cookies
+        assert "has request param" in caplog.text
+
+        @cache(
+            redis_helper,
+            60,
+            alias="vary",
+            vary=Vary(path_param_list=["uid"], query_param_list=["a", "b"], header_list=["Accept-Language"]),
+        )
+        async def demo_vary(request: Request) -> dict:
+            return {"timestamp": time.time()}
+
+        # the key does not contain the repr of request, and the order of query params is normalized
+        body: bytes = (await demo_default(request=gen_request("a=1&b=2"))).body
+        assert (await demo_default(request=gen_request("b=2&a=1"))).body == body
+        assert (await demo_default(request=gen_request("a=2&b=2"))).body != body
+
+        body = (await demo_vary(request=gen_request("a=1&b=2&c=3", [(b"accept-language", b"en")], {"uid": 1}))).body
+        for request in (
+            gen_request("b=2&a=1", [(b"accept-language", b" en ")], {"uid": 1}),
+            gen_request("c=4&a=1&b=2", [(b"accept-language", b"en"), (b"x-other", b"1")], {"uid": 1}),
+        ):
+            assert (await demo_vary(request=request)).body == body
+        for request in (
+            gen_request("a=1&b=2", [(b"accept-language", b"zh")], {"uid": 1}),
+            gen_request("a=1&b=2", [(b"accept-language", b"en")], {"uid": 2}),
+        ):
+            assert (await demo_vary(request=request)).body != body
+
+        # fixed-length key
+        key_set: Set[str] = {key async for key in redis_helper.scan_iter()}
+        assert len({len(key.split(":")[-1]) for key in key_set}) == 1
+        assert len(key_set) == 5
+
+        with pytest.raises(ValueError):
+            await demo_vary()
+        await redis_helper.close()
+
+    async def test_tag(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+        other_redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+        local_cache: TTLLRUCache = TTLLRUCache(10, 60)
+
+        async def get_tag_list(request: Optional[Request], result: Any) -> List[str]:
+            return [f"user:{request.query_params['uid']}"] if request else []
+
+        # each process has the same local cache config in practice
+        @cache(
+            redis_helper,
+            60,
+            tag_list=["user"],
+            get_tag_func=get_tag_list,
+            vary=Vary(query_param_list=["uid"]),
+            local_cache=TTLLRUCache(10, 60),
+        )
+        async def user_info(request: Request) -> dict:
+            return {"timestamp": time.time()}
+
+        @cache(other_redis_helper, 60, get_tag_func=lambda request, result: ["feed"], local_cache=local_cache)
+        async def feed() -> dict:
+            return {"timestamp": time.time()}
+
+        def gen_request(uid: int) -> Request:
+            return Request({"type": "http", "query_string": f"uid={uid}".encode(), "headers": []})
+
+        user_1_body: bytes = (await user_info(request=gen_request(1))).body
+        user_2_body: bytes = (await user_info(request=gen_request(2))).body
+        feed_body: bytes = (await feed()).body
+        await asyncio.sleep(0)
+
+        assert await invalidate_tags(redis_helper, "user:1") == 1
+        assert (await user_info(request=gen_request(1))).body != user_1_body
+        assert (await user_info(request=gen_request(2))).body == user_2_body
+        assert await invalidate_tags(redis_helper, "user", "not_exist") == 2
+        assert (await user_info(request=gen_request(2))).body != user_2_body
+
+        # the local cache of other process is invalidated
+        assert (await feed()).body == feed_body
+        assert await invalidate_tags(redis_helper, "feed") == 1
+        assert not await redis_helper.exists("fast-tools:cache_tag:feed")
+        await asyncio.sleep(0)
+        assert (await feed()).body != feed_body
+        await redis_helper.close()
+        await other_redis_helper.close()
+
+    async def test_tag_ttl(self) -> None:
+        fake_redis: FakeRedis = FakeRedis(clock=VirtualClock(time.time()))
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+        tag_key: str = "fast-tools:cache_tag:mixed"
+
+        @cache(redis_helper, 600, tag_list=["mixed"])
+        async def long_demo() -> dict:
+            return {}
+
+        @cache(redis_helper, 600, tag_list=["mixed"], negative_cache_status_code_list=[404], negative_cache_expire=1)
+        async def short_demo() -> PlainTextResponse:
+            return PlainTextResponse("not found", status_code=404)
+
+        @cache(redis_helper, None, tag_list=["mixed"])
+        async def never_expire_demo() -> dict:
+            return {}
+
+        # the short-lived key does not cut the ttl of tag
+        await long_demo()
+        await short_demo()
+        assert await redis_helper.execute("TTL", tag_key) == 600
+        fake_redis.clock.advance(2)
+        assert await invalidate_tags(redis_helper, "mixed") == 1
+
+        # the tag of the key which never expires never expires
+        await long_demo()
+        await never_expire_demo()
+        await short_demo()
+        assert await redis_helper.execute("TTL", tag_key) == -1
+        await redis_helper.close()
+
+    async def test_negative_cache(self) -> None:
+        clock: VirtualClock = VirtualClock(time.time())
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis(clock=clock))
+        call_count_dict: Dict[str, int] = {"empty": 0, "exception": 0, "keyword_exception": 0, "status_code": 0}
+
+        @cache(redis_helper, 60)
+        async def empty() -> dict:
+            call_count_dict["empty"] += 1
+            return {}
+
+        @cache(
+            redis_helper,
+            60,
+            negative_cache_exception_list=[HTTPException],
+            negative_cache_expire=1,
+            local_cache=TTLLRUCache(10, 60),
+            clock=clock,
+        )
+        async def exception() -> dict:
+            call_count_dict["exception"] += 1
+            raise HTTPException(404, detail="not found")
+
+        @cache(redis_helper, 60, negative_cache_exception_list=[HTTPException])
+        async def keyword_exception() -> dict:
+            call_count_dict["keyword_exception"] += 1
+            raise HTTPException(status_code=404, detail="not found")
+
+        @cache(
+            redis_helper,
+            60,
+            alias="status_code",
+            negative_cache_status_code_list=[404],
+            negative_cache_expire=1,
+            clock=clock,
+        )
+        async def status_code() -> PlainTextResponse:
+            call_count_dict["status_code"] += 1
+            return PlainTextResponse("not found", status_code=404)
+
+        # the empty result is a hit
+        for _ in range(3):
+            assert (await empty()).body == b"{}"
+        assert call_count_dict["empty"] == 1
+
+        exception_list: List[BaseException] = []
+        for _ in range(3):
+            with pytest.raises(HTTPException) as e:
+                await exception()
+            assert e.value.status_code == 404
+            assert e.value.detail == "not found"
+            exception_list.append(e.value)
+        assert call_count_dict["exception"] == 1
+        # the hit of local cache raises a copy of the cached exception
+        assert len({id(raised_exception) for raised_exception in exception_list}) == 3
+
+        # the exception built with keyword args(its `args` is empty) is rebuilt from redis
+        for _ in range(3):
+            with pytest.raises(HTTPException) as e:
+                await keyword_exception()
+            assert (e.value.status_code, e.value.detail) == (404, "not found")
+        assert call_count_dict["keyword_exception"] == 1
+
+        for _ in range(3):
+            assert (await status_code()).status_code == 404
+        assert call_count_dict["status_code"] == 1
+        key_list: List[str] = [key async for key in redis_helper.scan_iter("fast-tools:status_code:*")]
+        assert await redis_helper.execute("ttl", key_list[0]) == 1
+
+        clock.advance(1.1)
+        with pytest.raises(HTTPException):
+            await exception()
+        assert call_count_dict["exception"] == 2
+        await status_code()
+        assert call_count_dict["status_code"] == 2
+        await redis_helper.close()
+
+    async def test_cache_middleware(self) -> None:
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis())
+        call_count_dict: Dict[str, int] = {"user": 0, "stream": 0, "not_found": 0, "not_cache": 0, "vary": 0}
+        app: Starlette = Starlette()
+
+        @app.route("/user/{user_id}")
+        async def user(request: Request) -> JSONResponse:
+            call_count_dict["user"] += 1
+            return JSONResponse({"user_id": request.path_params["user_id"], "count": call_count_dict["user"]})
+
+        @app.route("/stream")
+        async def stream(request: Request) -> StreamingResponse:
+            call_count_dict["stream"] += 1
+
+            async def _content() -> AsyncIterator[bytes]:
+                for i in range(3):
+                    yield f"{i},".encode()
+
+            return StreamingResponse(_content(), media_type="text/csv")
+
+        @app.route("/not_found")
+        async def not_found(request: Request) -> PlainTextResponse:
+            call_count_dict["not_found"] += 1
+            return PlainTextResponse("not found", status_code=404)
+
+        @app.route("/not_cache")
+        async def not_cache(request: Request) -> PlainTextResponse:
+            call_count_dict["not_cache"] += 1
+            return PlainTextResponse("not cache")
+
+        @app.route("/vary/{name}")
+        async def vary(request: Request) -> PlainTextResponse:
+            call_count_dict["vary"] += 1
+            return PlainTextResponse(request.headers.get("accept-language", ""), headers={"vary": "Accept-Language"})
+
+        app.add_route("/vary/key/{name}", vary)
+
+        route_trie: RouteTrie = RouteTrie()
+        route_trie.insert_by_app(app)
+        middleware: CacheMiddleware = CacheMiddleware(
+            app,
+            backend=redis_helper,
+            route_trie=route_trie,
+            rule_dict={
+                "/user/{user_id}": RouteCacheRule(10),
+                "/stream": RouteCacheRule(10),
+                "/not_found": RouteCacheRule(10),
+                "/vary/{name}": RouteCacheRule(10, vary=Vary(path_param_list=["name"])),
+                "/vary/key/{name}": RouteCacheRule(10, vary=Vary(header_list=["accept-language", "authorization"])),
+            },
+        )
+
+        for _ in range(3):
+            status_code, headers, body_list = await self.asgi_get(middleware, "/user/1", b"b=2&a=1")
+            assert status_code == 200
+            assert headers["content-type"] == "application/json"
+            assert b"".join(body_list) == b'{"user_id":"1","count":1}'
+        # the order of query params does not change the key
+        await self.asgi_get(middleware, "/user/1", b"a=1&b=2")
+        assert call_count_dict["user"] == 1
+        _, _, body_list = await self.asgi_get(middleware, "/user/2")
+        assert b"".join(body_list) == b'{"user_id":"2","count":2}'
+
+        # the streaming response is sent to client by chunks, and the hit is served as a whole
+        _, _, body_list = await self.asgi_get(middleware, "/stream")
+        assert body_list[:3] == [b"0,", b"1,", b"2,"]
+        status_code, headers, body_list = await self.asgi_get(middleware, "/stream")
+        assert (status_code, headers["content-type"], body_list) == (200, "text/csv; charset=utf-8", [b"0,1,2,"])
+        assert call_count_dict["stream"] == 1
+
+        for path in ("/not_found", "/not_found", "/not_cache", "/not_cache"):
+            await self.asgi_get(middleware, path)
+        assert call_count_dict["not_found"] == 2
+        assert call_count_dict["not_cache"] == 2
+
+        # the request with authorization is not cached
+        for token in (b"Bearer 1", b"Bearer 2"):
+            _, _, body_list = await self.asgi_get(middleware, "/user/9", header_list=[(b"authorization", token)])
+        assert call_count_dict["user"] == 4
+        # the response varies on the header which is not in the key is not cached
+        for language in (b"en", b"zh"):
+            _, _, body_list = await self.asgi_get(middleware, "/vary/a", header_list=[(b"accept-language", language)])
+            assert body_list == [language]
+        assert call_count_dict["vary"] == 2
+        # unless the header is in the key
+        for language in (b"en", b"zh", b"en"):
+            _, _, body_list = await self.asgi_get(
+                middleware, "/vary/key/b", header_list=[(b"accept-language", language), (b"authorization", b"1")]
+            )
+            assert body_list == [language]
+        assert call_count_dict["vary"] == 4
+
+        # the error of redis does not break the request
+        await redis_helper.close()
+        status_code, _, body_list = await self.asgi_get(middleware, "/user/3")
+        assert (status_code, b"".join(body_list)) == (200, b'{"user_id":"3","count":5}')
+
+    async def test_cache_control(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = self.gen_redis_helper(fake_redis)
+        key_list: List[str] = []
+
+        async def record_key(response: StarletteResponse, backend: RedisHelper, key: str) -> None:
+            key_list.append(key)
+
+        @cache(redis_helper, 10, after_cache_response_list=[cache_control, record_key])
+        async def demo() -> dict:
+            return {}
+
+        assert "cache-control" not in (await demo()).headers
+        fake_redis.reset_stats()
+        response: StarletteResponse = await demo()
+        assert response.headers["cache-control"] == "max-age=10"
+        assert len(key_list) == 1
+        # the ttl is read from the cache entry, only one round trip for the hit
+        assert fake_redis.round_trip_count == 1
+
+        # the ttl is read from backend if it is not given
+        await cache_control(response, redis_helper, key_list[0])
+        assert response.headers["cache-control"] == "max-age=10"
+        await redis_helper.close()
+
+    async def test_refresh_ahead(self, caplog: pytest.LogCaptureFixture) -> None:
+        clock: VirtualClock = VirtualClock(time.time())
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis(clock=clock))
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        @cache(redis_helper, 1, refresh_ahead_threshold=3, refresh_ahead_time=0.5, clock=clock)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        await demo()
+        # the hot key is recomputed in background `refresh_ahead_time` seconds before it expires
+        clock.advance(0.6)
+        for _ in range(3):
+            assert (await demo()).body == b'{"count":1}'
+        await asyncio.sleep(0.01)
+        assert call_count_dict["count"] == 2
+        assert (await demo()).body == b'{"count":2}'
+        assert call_count_dict["count"] == 2
+
+        # the cold key still expires
+        clock.advance(1.2)
+        assert call_count_dict["count"] == 2
+        assert (await demo()).body == b'{"count":3}'
+
+        # the error of redis in background is logged
+        clock.advance(0.6)
+        for _ in range(3):
+            await demo()
+        await redis_helper.close()
+        await asyncio.sleep(0.01)
+        assert "refresh ahead cache key" in caplog.text
+
+    async def test_warm_up(self) -> None:
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis())
+        call_count_dict: Dict[str, int] = {}
+
+        @cache(redis_helper, 60, vary=Vary(path_param_list=["uid"]), manifest_size=2)
+        async def user_info(request: Request) -> dict:
+            uid: str = request.path_params["uid"]
+            call_count_dict[uid] = call_count_dict.get(uid, 0) + 1
+            return {"uid": uid}
+
+        call_list: List[Any] = [
+            (user_info, (), {"request": gen_warm_up_request(f"/user/{uid}", path_params={"uid": uid})}) for uid in "123"
+        ]
+        assert await warm_up(call_list, concurrency=2, rate=100) == 3
+        assert call_count_dict == {"1": 1, "2": 1, "3": 1}
+        # the cache that has not expired is not recomputed
+        assert await warm_up(call_list) == 3
+        await user_info(request=gen_warm_up_request("/user/1", path_params={"uid": "1"}))
+        await user_info(request=gen_warm_up_request("/user/3", path_params={"uid": "3"}))
+        assert call_count_dict == {"1": 1, "2": 1, "3": 1}
+
+        # the most frequently called keys are warmed up after the backend is flushed
+        await redis_helper.delete_pattern("fast-tools:*")
+        assert await warm_up(gen_warm_up_manifest(user_info)) == 2
+        assert call_count_dict == {"1": 2, "2": 1, "3": 2}
+
+        with pytest.raises(ValueError):
+            gen_warm_up_manifest(warm_up)
+        await redis_helper.close()
+
+    async def test_model(self) -> None:
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis())
+        call_count_dict: Dict[str, int] = {"model": 0, "model_list": 0, "dataclass": 0}
+
+        class UserModel(BaseModel):
+            uid: int
+            user_name: str = Field(alias="userName")
+
+        @dataclass
+        class UserData:
+            uid: int
+            tag_list: List[str]
+            user: Optional[UserModel] = None
+
+        @cache(redis_helper, 60)
+        async def model() -> UserModel:
+            call_count_dict["model"] += 1
+            return UserModel(uid=1, userName="so1n")
+
+        @cache(redis_helper, 60)
+        async def model_list() -> List[UserModel]:
+            call_count_dict["model_list"] += 1
+            return [UserModel(uid=1, userName="so1n")]
+
+        @cache(redis_helper, 60)
+        async def data() -> UserData:
+            call_count_dict["dataclass"] += 1
+            return UserData(uid=1, tag_list=["a"], user=UserModel(uid=1, userName="so1n"))
+
+        for _ in range(3):
+            response: StarletteResponse = await model()
+            assert response.body == b'{"uid": 1, "userName": "so1n"}'
+            assert response.headers["content-type"] == "application/json"
+            assert (await model_list()).body == b'[{"uid": 1, "userName": "so1n"}]'
+            # the model nested in dataclass is also encoded with alias
+            assert (await data()).body == b'{"uid": 1, "tag_list": ["a"], "user": {"uid": 1, "userName": "so1n"}}'
+        assert call_count_dict == {"model": 1, "model_list": 1, "dataclass": 1}
+        await redis_helper.close()
+
+    async def test_metrics(self) -> None:
+        clock: VirtualClock = VirtualClock(time.time())
+        redis_helper: RedisHelper = self.gen_redis_helper(FakeRedis(clock=clock))
+        metrics: PrometheusCacheMetrics = PrometheusCacheMetrics(app_name="test", prefix="test")
+
+        @cache(redis_helper, 1, alias="metrics", stale_while_revalidate=10, metrics=metrics, clock=clock)
+        async def demo() -> dict:
+            return {"data": "a" * 100}
+
+        for _ in range(3):
+            await demo()
+        clock.advance(1.1)
+        await demo()
+
+        def get_value(name: str, **labels: str) -> Optional[float]:
+            return registry.get_sample_value(name, {"app_name": "test", "alias": "metrics", **labels})
+
+        assert get_value("test_cache_requests_total", result="hit") == 2
+        assert get_value("test_cache_requests_total", result="miss") == 1
+        assert get_value("test_cache_requests_total", result="stale") == 1
+        assert get_value("test_cache_lock_wait_time_count") == 1
+        assert get_value("test_cache_serialize_time_count") == 1
+        await asyncio.sleep(0.1)
+        # the stale data is recomputed in background
+        assert get_value("test_cache_compute_time_count") == 2
+        assert get_value("test_cache_payload_size_sum") == 2 * len(b'{"data":"' + b"a" * 100 + b'"}')
+        await redis_helper.close()
+
+    async def test_write_back(self) -> None:
+        event_list: List[str] = []
+
+        class SlowRedisHelper(RedisHelper):
+            async def set_dict(self, key: str, data: dict, timeout: Optional[int] = None) -> None:
+                event_list.append("set_dict")
+                await asyncio.sleep(0.2)
+                await super().set_dict(key, data, timeout)
+
+        redis_helper: RedisHelper = SlowRedisHelper()
+        redis_helper.init(FakeRedis().create_pool(encoding="utf-8"))
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        # two workers share one redis
+        demo_1: Callable = cache(redis_helper, 60, alias="demo", write_back=True)(demo)
+        demo_2: Callable = cache(redis_helper, 60, alias="demo")(demo)
+
+        start_timestamp: float = time.perf_counter()
+        assert (await demo_1()).body == b'{"count":1}'
+        # the response is returned before it is stored
+        assert time.perf_counter() - start_timestamp < 0.2
+        # and the entry is serialized after the response is rendered
+        event_list.append("response")
+        assert event_list == ["response"]
+        # the lock is held until the entry is stored, so the other worker does not recompute it
+        assert (await demo_2()).body == b'{"count":1}'
+        assert call_count_dict["count"] == 1
+
+        # the pending write is waited by `flush_write_back`
+        demo_3: Callable = cache(redis_helper, 60, alias="demo_3", write_back=True)(demo)
+        assert (await demo_3()).body == b'{"count":2}'
+        assert not [key async for key in redis_helper.scan_iter("fast-tools:demo_3:*")]
+        await flush_write_back(demo_3)
+        assert [key async for key in redis_helper.scan_iter("fast-tools:demo_3:*")]
+
+        # the request is cancelled during computation, the entry is still stored and the lock is released
+        async def slow_demo() -> dict:
+            await asyncio.sleep(0.1)
+            return await demo()
+
+        demo_4: Callable = cache(redis_helper, 60, alias="demo_4", write_back=True)(slow_demo)
+        future: asyncio.Future = asyncio.ensure_future(demo_4())
+        await asyncio.sleep(0.05)
+        future.cancel()
+        await asyncio.sleep(0.1)
+        assert (await asyncio.wait_for(demo_4(), 1)).body == b'{"count":3}'
+        assert call_count_dict["count"] == 3
+        await redis_helper.close()
+
+    async def test_circuit_breaker(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        circuit_breaker: CircuitBreaker = CircuitBreaker(min_call_num=1, open_time=0.1)
+        redis_helper: RedisHelper = RedisHelper(circuit_breaker=circuit_breaker)
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        @cache(redis_helper, 60)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        assert (await demo()).body == b'{"count":1}'
+        while not circuit_breaker.is_open:
+            circuit_breaker.on_failure()
+
+        # the circuit is open, func is called without reading or storing the cache
+        fake_redis.reset_stats()
+        assert (await demo()).body == b'{"count":2}'
+        assert fake_redis.round_trip_count == 0
+
+        # the probe call succeeds and closes the circuit
+        await asyncio.sleep(0.1)
+        assert (await demo()).body == b'{"count":1}'
+        assert circuit_breaker.state == CircuitBreaker.CLOSED
+
+        # the circuit is opened while func is called, the result of func is returned without storing it
+        @cache(redis_helper, 60)
+        async def open_demo() -> dict:
+            call_count_dict["count"] += 1
+            while not circuit_breaker.is_open:
+                circuit_breaker.on_failure()
+            return {"count": call_count_dict["count"]}
+
+        assert (await open_demo()).body == b'{"count":3}'
+        assert call_count_dict["count"] == 3
+        await redis_helper.close()
+
+    async def test_fail_open(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = RedisHelper()
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        call_count_dict: Dict[str, int] = {"count": 0, "stream": 0, "error": 0}
+
+        @cache(redis_helper, 60)
+        async def demo() -> dict:
+            call_count_dict["count"] += 1
+            return {"count": call_count_dict["count"]}
+
+        @cache(redis_helper, 60)
+        async def stream_demo() -> StreamingResponse:
+            call_count_dict["stream"] += 1
+
+            async def export() -> AsyncIterator[bytes]:
+                yield b"0,1,"
+
+            return StreamingResponse(export(), media_type="text/csv")
+
+        @cache(redis_helper, 60)
+        async def error_demo() -> dict:
+            call_count_dict["error"] += 1
+            raise aioredis.errors.RedisError("func error")
+
+        # the redis error raised by func is not taken as the error of backend
+        with pytest.raises(aioredis.errors.RedisError):
+            await error_demo()
+        assert call_count_dict["error"] == 1
+
+        # the error of redis does not break the call, func is called once without cache
+        await redis_helper.close()
+        assert (await demo()).body == b'{"count":1}'
+        assert (await demo()).body == b'{"count":2}'
+        _, _, body_list = await self.asgi_get(await stream_demo(), "/")
+        assert b"".join(body_list) == b"0,1,"
+        assert call_count_dict["stream"] == 1
+
+    async def test_stream(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = RedisHelper()
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        call_count_dict: Dict[str, int] = {"count": 0}
+
+        @cache(redis_helper, 60, tag_list=["export"], stream_chunk_size=4)
+        async def demo() -> StreamingResponse:
+            call_count_dict["count"] += 1
+
+            async def export() -> AsyncIterator[bytes]:
+                for i in range(10):
+                    yield f"{i},".encode()
+
+            return StreamingResponse(export(), media_type="text/csv")
+
+        # the response is sent to client by the chunks of func, and stored as the chunks of `stream_chunk_size`
+        fake_redis.reset_stats()
+        _, _, body_list = await self.asgi_get(await demo(), "/")
+        assert body_list[:3] == [b"0,", b"1,", b"2,"]
+        # the lock, 5 chunks and the entry
+        assert fake_redis.command_count["SET"] == 1 + 5 + 1
+
+        # the hit is replayed chunk by chunk
+        fake_redis.reset_stats()
+        status_code, headers, body_list = await self.asgi_get(await demo(), "/")
+        assert (status_code, headers["content-type"], headers["content-length"]) == (
+            200,
+            "text/csv; charset=utf-8",
+            "20",
+        )
+        assert body_list == [b"0,1,", b"2,3,", b"4,5,", b"6,7,", b"8,9,", b""]
+        assert fake_redis.command_count["GET"] == 1 + 5
+        assert call_count_dict["count"] == 1
+
+        # the chunks are deleted with the key and its chunk set
+        assert await invalidate_tags(redis_helper, "export") == 1 + 1 + 5
+        assert [key async for key in redis_helper.scan_iter("*:chunk*")] == []
+
+        # the request that misses while the key is being stored calls func without waiting
+        response: StarletteResponse = await demo()
+        await self.asgi_get(await demo(), "/")
+        await self.asgi_get(response, "/")
+        _, _, body_list = await self.asgi_get(await demo(), "/")
+        assert b"".join(body_list) == b"0,1,2,3,4,5,6,7,8,9,"
+        assert call_count_dict["count"] == 3
+        await redis_helper.close()
+
+    async def test_stream_chunk(self) -> None:
+        fake_redis: FakeRedis = FakeRedis()
+        redis_helper: RedisHelper = RedisHelper()
+        redis_helper.init(fake_redis.create_pool(encoding="utf-8"))
+        lock_ttl_list: List[int] = []
+
+        @cache(redis_helper, None, stream_chunk_size=4, stream_lock_timeout=600)
+        async def demo() -> StreamingResponse:
+            async def export() -> AsyncIterator[bytes]:
+                yield b"0,1,"
+                # the lock expires while the stream is sent
+                async for lock_key in redis_helper.scan_iter("*:lock"):
+                    lock_ttl_list.append(await redis_helper.execute("TTL", lock_key))
+                    await redis_helper.execute("DEL", lock_key)
+                yield b"2,3,"
+
+            return StreamingResponse(export(), media_type="text/csv")
+
+        # the lock of stream has its own timeout, and the release error does not break the response
+        _, _, body_list = await self.asgi_get(await demo(), "/")
+        assert b"".join(body_list) == b"0,1,2,3,"
+        assert 60 < lock_ttl_list[0] <= 600
+        old_chunk_key_list: List[str] = [key async for key in redis_helper.scan_iter("*:chunk:*")]
+        assert len(old_chunk_key_list) == 2
+        # the chunks of the entry which never expires never expire
+        assert [await redis_helper.execute("TTL", key) for key in old_chunk_key_list] == [-1, -1]
+
+        # the chunks of the old stream expire after the grace time when the key is recomputed
+        entry_key: str = [key async for key in redis_helper.scan_iter("*:chunk")][0][: -len(":chunk")]
+        await redis_helper.del_key(entry_key)
+        await self.asgi_get(await demo(), "/")
+        for key in old_chunk_key_list:
+            assert 0 < await redis_helper.execute("TTL", key) <= 60
+        chunk_key_list: List[str] = await redis_helper.execute("SMEMBERS", entry_key + ":chunk")
+        assert len(chunk_key_list) == 2 and not set(chunk_key_list) & set(old_chunk_key_list)
+        await redis_helper.close()
@@ -1,4 +1,6 @@
+import asyncio
 import uuid
+from typing import Dict
 
 import aioredis  # type: ignore
 import pytest
@@ -7,7 +9,7 @@ from requests import Response  # type: ignore
 from starlette.testclient import TestClient
 
 from example.context import app
-from fast_tools.context import ContextBaseModel, HeaderHelper
+from fast_tools.context import ContextBaseModel, HeaderHelper, WithContext, request_memoize
 
 from .conftest import AnyStringWith  # type: ignore
 
@@ -27,3 +29,39 @@ class TestContext:
                 request_id: str = HeaderHelper.i("X-Request-Id", default_func=lambda request: str(uuid.uuid4()))
 
         assert e.value.args[0] == "key:HeaderHelper:X-Request-Id already exists"
+
+    @pytest.mark.asyncio
+    async def test_request_memoize(self) -> None:
+        call_count_dict: Dict[str, int] = {"async": 0, "sync": 0}
+
+        @request_memoize
+        async def get_user(uid: int) -> dict:
+            call_count_dict["async"] += 1
+            await asyncio.sleep(0.01)
+            return {"uid": uid}
+
+        @request_memoize
+        def get_permission(uid: int, role: str = "user") -> str:
+            call_count_dict["sync"] += 1
+            return f"{uid}:{role}"
+
+        with WithContext():
+            # the concurrent calls share one call
+            assert await asyncio.gather(get_user(1), get_user(1), get_user(uid=1)) == [{"uid": 1}] * 3
+            assert await get_user(1) == {"uid": 1}
+            assert call_count_dict["async"] == 2
+            await get_user(2)
+            assert call_count_dict["async"] == 3
+
+            assert get_permission(1) == get_permission(1) == "1:user"
+            get_permission(1, role="admin")
+            assert call_count_dict["sync"] == 2
+
+        # the memoized results are reset with the request context
+        with WithContext():
+            await get_user(1)
+            assert call_count_dict["async"] == 4
+        # no request context
+        get_permission(1)
+        get_permission(1)
+        assert call_count_dict["sync"] == 4
@@ -1,4 +1,5 @@
 import asyncio
+import re
 from typing import Tuple
 
 from starlette.testclient import TestClient
@@ -41,3 +42,5 @@ class TestExporter:
         assert "_api_users_{user_id}_items_{item_id}" in server_body_str
         assert "/api/users/123/items/abc" not in server_body_str
         assert "/api/users/456/items/def" not in server_body_str
+        # the request time is sent as the timer in milliseconds
+        assert re.search(r"_api_users_login\.request_time\.:\d+\|ms", server_body_str)